@@ -0,0 +1,90 @@
+"""
+Benchmark the challenge record creation and deletion across many root domains with different concurrency limits.
+The Porkbun API is mocked with an artificial latency per request.
+
+Usage: python -m benchmarks.concurrency [--zones 20] [--latency 0.1] [--concurrency 1 4 16]
+"""
+
+import argparse
+import time
+from unittest import mock
+
+import responses
+
+from tests.helpers import create_achall, create_authenticator, split_challenge_domain
+
+API = "https://api.porkbun.com/api/json/v3"
+
+
+def _delayed(latency: float, body: str):
+    def callback(_):
+        time.sleep(latency)
+        return 200, {}, body
+
+    return callback
+
+
+def run(zones: int, latency: float, max_concurrency: int) -> float:
+    """
+    Perform and clean up one challenge per root domain against the mocked API.
+
+    :param zones: the number of root domains
+    :param latency: the latency in seconds of each API request
+    :param max_concurrency: the maximum number of root domains processed in parallel
+    :return: the wall time in seconds
+    """
+
+    domains = [f"zone{i}.example" for i in range(zones)]
+    achalls = [create_achall(domain) for domain in domains]
+
+    with (
+        responses.RequestsMock() as rsps,
+        mock.patch(
+            "certbot_dns_porkbun.cert.client.resolve_challenge_domain",
+            side_effect=split_challenge_domain,
+        ),
+    ):
+        for domain, achall in zip(domains, achalls):
+            validation = achall.validation(achall.account_key)
+            rsps.add_callback(
+                responses.POST,
+                f"{API}/dns/retrieveByNameType/{domain}/TXT/_acme-challenge",
+                callback=_delayed(
+                    latency,
+                    '{"status": "SUCCESS", "records": [{"id": "1", "name": "_acme-challenge", "type": "TXT", '
+                    f'"content": "{validation}", "ttl": "600", "prio": "0", "notes": ""}}]}}',
+                ),
+            )
+            rsps.add_callback(
+                responses.POST,
+                f"{API}/dns/delete/{domain}/1",
+                callback=_delayed(latency, '{"status": "SUCCESS"}'),
+            )
+
+        authenticator = create_authenticator(porkbun_max_concurrency=max_concurrency)
+
+        start = time.perf_counter()
+        authenticator.perform(achalls)
+        authenticator.cleanup(achalls)
+        return time.perf_counter() - start
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--zones", type=int, default=20)
+    parser.add_argument("--latency", type=float, default=0.1)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16])
+    args = parser.parse_args()
+
+    baseline = None
+    for max_concurrency in args.concurrency:
+        wall_time = run(args.zones, args.latency, max_concurrency)
+        baseline = baseline or wall_time
+        print(
+            f"zones={args.zones} latency={args.latency}s max-concurrency={max_concurrency}: "
+            f"{wall_time:.2f}s (speedup {baseline / wall_time:.1f}x)"
+        )
+
+
+if __name__ == "__main__":
+    main()
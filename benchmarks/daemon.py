@@ -0,0 +1,183 @@
+"""
+Benchmark the per certificate latency of cold process starts against the long-running daemon.
+
+Each certificate performs and cleans up one challenge against a local stand-in of the Porkbun API. A cold start runs
+the plugin in a fresh Python process per certificate, so it pays the interpreter startup, the plugin import, the
+credentials and a new API connection. With the daemon only the thin hook commands are started per certificate.
+
+Usage: python -m benchmarks.daemon [--certificates 10] [--latency 0.005]
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from unittest import mock
+
+from certbot_dns_porkbun import daemon
+from tests.helpers import split_challenge_domain
+from tests.porkbun_stub import FakePorkbunAPI
+
+HOOK_COMMAND = "from certbot_dns_porkbun.daemon import hook_main; hook_main()"
+
+
+def _patch_resolution():
+    return mock.patch(
+        "certbot_dns_porkbun.cert.client.resolve_challenge_domain_with_ttl",
+        side_effect=lambda domain, *_: (*split_challenge_domain(domain), 300),
+    )
+
+
+def _service_args(endpoint: str, directory: str) -> list[str]:
+    return [
+        "--socket",
+        os.path.join(directory, "daemon.sock"),
+        "--config-dir",
+        directory,
+        "--work-dir",
+        directory,
+        "--logs-dir",
+        directory,
+        "--dns-porkbun-key",
+        "key",
+        "--dns-porkbun-secret",
+        "secret",
+        "--dns-porkbun-api-endpoint",
+        endpoint,
+        "--dns-porkbun-propagation-seconds",
+        "0",
+        # the stand-in does not limit the requests, a shared rate limit would only throttle the daemon
+        "--dns-porkbun-rate-limit",
+        "0",
+    ]
+
+
+def cold_run(argv: list[str]) -> None:
+    """
+    Perform and clean up a single challenge in this process like a certbot run per certificate.
+
+    :param argv: the domain followed by the service arguments
+    """
+
+    domain, *service_argv = argv
+    with _patch_resolution():
+        authenticator = daemon.create_authenticator(
+            daemon.create_parser().parse_args(service_argv)
+        )
+        authenticator.start_service()
+        challenge = authenticator.perform_challenge(domain, "validation")
+        authenticator.wait_for_propagation([challenge])
+        authenticator.cleanup_challenge(domain, "validation")
+        authenticator.stop_service()
+
+
+def run_cold(certificates: int, endpoint: str, directory: str) -> list[float]:
+    """
+    Measure the latency of each certificate with a new process per certificate.
+
+    :return: the latencies in seconds
+    """
+
+    latencies = []
+    for i in range(certificates):
+        start = time.perf_counter()
+        subprocess.run(
+            [
+                sys.executable,
+                "-m",
+                "benchmarks.daemon",
+                "--cold-run",
+                f"cert{i}.example.com",
+            ]
+            + _service_args(endpoint, directory),
+            check=True,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+        )
+        latencies.append(time.perf_counter() - start)
+    return latencies
+
+
+def run_daemon(certificates: int, endpoint: str, directory: str) -> list[float]:
+    """
+    Measure the latency of each certificate with the hook commands of a running daemon.
+
+    :return: the latencies in seconds
+    """
+
+    args = daemon.create_parser().parse_args(_service_args(endpoint, directory))
+    authenticator = daemon.create_authenticator(args)
+    authenticator.start_service()
+    server = daemon.ChallengeServer(args.socket, daemon.ChallengeService(authenticator))
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+
+    latencies = []
+    try:
+        for i in range(certificates):
+            env = {
+                **os.environ,
+                "CERTBOT_DOMAIN": f"cert{i}.example.com",
+                "CERTBOT_VALIDATION": "validation",
+                "CERTBOT_REMAINING_CHALLENGES": "0",
+            }
+            start = time.perf_counter()
+            for action in ["auth", "cleanup"]:
+                subprocess.run(
+                    [
+                        sys.executable,
+                        "-c",
+                        HOOK_COMMAND,
+                        action,
+                        "--socket",
+                        args.socket,
+                    ],
+                    check=True,
+                    env=env,
+                )
+            latencies.append(time.perf_counter() - start)
+    finally:
+        server.shutdown()
+        server.server_close()
+        authenticator.stop_service()
+
+    return latencies
+
+
+def main() -> None:
+    if sys.argv[1:2] == ["--cold-run"]:
+        cold_run(sys.argv[2:])
+        return
+
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--certificates", type=int, default=10)
+    parser.add_argument(
+        "--latency",
+        type=float,
+        default=0.005,
+        help="latency in seconds of each API call",
+    )
+    args = parser.parse_args()
+
+    with (
+        FakePorkbunAPI(latency=args.latency) as api,
+        tempfile.TemporaryDirectory() as directory,
+        _patch_resolution(),
+    ):
+        print(f"{'mode':>8} {'mean':>9} {'median':>9} {'max':>9}")
+        for mode, run in [("cold", run_cold), ("daemon", run_daemon)]:
+            latencies = run(args.certificates, api.endpoint, directory)
+            print(
+                f"{mode:>8} {statistics.mean(latencies) * 1000:>7.1f}ms "
+                f"{statistics.median(latencies) * 1000:>7.1f}ms {max(latencies) * 1000:>7.1f}ms"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+"""
+Benchmark the import time of the plugin with python -X importtime.
+
+Certbot imports all installed plugins on every run, so the import time of the plugin is paid even if another
+authenticator is used. The modules certbot imports anyway are imported first, so that only the time of the modules
+imported additionally by the plugin is measured. Their import time is reported as baseline of the same interpreter.
+
+Usage: python -m benchmarks.import_time [--runs 5]
+"""
+
+import argparse
+import compileall
+import os
+import subprocess
+import sys
+from typing import NamedTuple
+
+import certbot_dns_porkbun
+
+PLUGIN_MODULE = "certbot_dns_porkbun.cert.client"
+
+# modules imported by certbot itself before the plugins are loaded
+CERTBOT_MODULES = [
+    "certbot.errors",
+    "certbot.display.util",
+    "certbot.plugins.dns_common",
+]
+
+# modules which must only be imported once a challenge is actually performed or cleaned up
+DEFERRED_MODULES = [
+    "aiohttp",
+    "asyncio",
+    "concurrent.futures",
+    "pkb_client",
+    "dns",
+    "tldextract",
+    "certbot_dns_porkbun.cert.accounts",
+    "certbot_dns_porkbun.cert.aio",
+    "certbot_dns_porkbun.cert.alias",
+    "certbot_dns_porkbun.cert.api",
+    "certbot_dns_porkbun.cert.journal",
+    "certbot_dns_porkbun.cert.metrics",
+    "certbot_dns_porkbun.cert.propagation",
+    "certbot_dns_porkbun.cert.profiling",
+    "certbot_dns_porkbun.cert.resolvers",
+]
+
+
+class ImportTime(NamedTuple):
+    seconds: float
+    baseline_seconds: float
+    imported: list[str]
+
+
+def measure(module: str = PLUGIN_MODULE) -> ImportTime:
+    """
+    Import the module in a fresh interpreter after the certbot modules.
+    The plugin is byte-compiled first like by an installation, otherwise the compilation of the sources is measured.
+
+    :param module: the module to import
+    :return: the cumulative import time of the module and of the certbot modules in seconds and the imported deferred
+        modules
+    """
+
+    compileall.compile_dir(os.path.dirname(certbot_dns_porkbun.__file__), quiet=1)
+    code = (
+        f"import sys; import {', '.join(CERTBOT_MODULES)}; import {module}; "
+        f"print(','.join(m for m in {DEFERRED_MODULES!r} if m in sys.modules))"
+    )
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+
+    cumulative = None
+    baseline = 0.0
+    for line in result.stderr.splitlines():
+        # import time: self [us] | cumulative | imported package, nested imports are indented
+        fields = line.removeprefix("import time:").split("|")
+        if len(fields) != 3 or fields[2].startswith("  "):
+            continue
+        if fields[2].strip() == module:
+            cumulative = int(fields[1]) / 1e6
+        elif fields[2].strip() in CERTBOT_MODULES:
+            baseline += int(fields[1]) / 1e6
+    if cumulative is None:
+        raise RuntimeError(f"Module {module} was already imported")
+
+    imported = result.stdout.strip()
+    return ImportTime(cumulative, baseline, imported.split(",") if imported else [])
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    results = [measure() for _ in range(args.runs)]
+    times = sorted(result.seconds for result in results)
+    baselines = sorted(result.baseline_seconds for result in results)
+    print(
+        f"{PLUGIN_MODULE}: min {times[0] * 1000:.1f}ms, median {times[len(times) // 2] * 1000:.1f}ms"
+    )
+    print(
+        f"certbot modules: min {baselines[0] * 1000:.1f}ms, median {baselines[len(baselines) // 2] * 1000:.1f}ms"
+    )
+    print(f"deferred modules imported: {', '.join(results[0].imported) or 'none'}")
+
+
+if __name__ == "__main__":
+    main()
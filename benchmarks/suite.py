@@ -0,0 +1,211 @@
+"""
+Reproducible benchmark suite of the authenticator perform and cleanup against a local stand-in of the Porkbun API.
+
+Each scenario performs and cleans up one challenge per domain, spread evenly over the given number of root domains,
+and reports the wall time, the number of API calls and the peak memory. The results can be stored as baseline and
+later runs compared against it to detect performance regressions.
+
+Usage:
+    python -m benchmarks.suite [--latency 0.005] [--error-rate 0] [--rate-limit 0] [--max-concurrency 4]
+                               [--save-baseline benchmarks/baseline.json] [--baseline benchmarks/baseline.json]
+"""
+
+import argparse
+import json
+import logging
+import sys
+import time
+import tracemalloc
+from unittest import mock
+
+from tests.helpers import create_achall, create_authenticator, split_challenge_domain
+from tests.porkbun_stub import FakePorkbunAPI
+
+DOMAIN_COUNTS = [1, 10, 100, 1000]
+
+ZONE_COUNTS = [1, 10, 100]
+
+# allowed relative increase of the wall time and peak memory compared to the baseline
+DEFAULT_TOLERANCE = 0.25
+
+
+def run_scenario(domains: int, zones: int, args: argparse.Namespace) -> dict:
+    """
+    Perform and clean up the challenges of a scenario against a fresh stand-in server.
+
+    :param domains: the number of challenged domains
+    :param zones: the number of root domains the domains are spread over
+    :param args: the parsed command line arguments
+    :return: the results of the scenario
+    """
+
+    achalls = [
+        create_achall(f"host{i}.zone{i % zones}.example", token=i.to_bytes(16, "big"))
+        for i in range(domains)
+    ]
+
+    with (
+        FakePorkbunAPI(
+            latency=args.latency,
+            error_rate=args.error_rate,
+            rate_limit=args.rate_limit,
+        ) as server,
+        mock.patch(
+            "certbot_dns_porkbun.cert.client.resolve_challenge_domain_with_ttl",
+            side_effect=lambda domain, *_: (*split_challenge_domain(domain), 300),
+        ),
+        mock.patch(
+            "certbot_dns_porkbun.cert.client.resolve_challenge_domain_async",
+            side_effect=lambda domain, *_: (*split_challenge_domain(domain), 300),
+        ),
+    ):
+        authenticator = create_authenticator(
+            porkbun_api_endpoint=server.endpoint,
+            porkbun_backend=args.backend,
+            porkbun_max_concurrency=args.max_concurrency,
+            porkbun_rate_limit=0,
+            porkbun_retry_backoff=0.05,
+        )
+
+        tracemalloc.start()
+        start = time.perf_counter()
+        authenticator.perform(achalls)
+        authenticator.cleanup(achalls)
+        wall_time = time.perf_counter() - start
+        _, peak_memory = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        counters = authenticator._metrics.summary()["counters"]
+
+    return {
+        "domains": domains,
+        "zones": zones,
+        "wall_time_seconds": round(wall_time, 4),
+        "api_calls": counters.get("api_calls", 0),
+        "api_retries": counters.get("api_retries", 0),
+        "peak_memory_bytes": peak_memory,
+    }
+
+
+def compare(results: list[dict], baseline: list[dict], tolerance: float) -> list[str]:
+    """
+    Compare the results with the baseline results.
+
+    :param results: the results of the current run
+    :param baseline: the stored baseline results
+    :param tolerance: the allowed relative increase of the wall time and peak memory
+    :return: the list of detected regressions
+    """
+
+    baseline_by_scenario = {(b["domains"], b["zones"]): b for b in baseline}
+    regressions = []
+    for result in results:
+        reference = baseline_by_scenario.get((result["domains"], result["zones"]))
+        if reference is None:
+            continue
+
+        scenario = f"{result['domains']} domains / {result['zones']} zones"
+        if result["api_calls"] > reference["api_calls"]:
+            regressions.append(
+                f"{scenario}: {result['api_calls']} API calls, baseline {reference['api_calls']}"
+            )
+        for key in ["wall_time_seconds", "peak_memory_bytes"]:
+            if result[key] > reference[key] * (1 + tolerance):
+                regressions.append(
+                    f"{scenario}: {key} {result[key]}, baseline {reference[key]}"
+                )
+
+    return regressions
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument(
+        "--latency",
+        type=float,
+        default=0.005,
+        help="latency in seconds of each API call",
+    )
+    parser.add_argument(
+        "--error-rate",
+        type=float,
+        default=0.0,
+        help="fraction of API calls failing with a server error",
+    )
+    parser.add_argument(
+        "--rate-limit",
+        type=int,
+        default=0,
+        help="API calls per second before the server throttles, 0 disables it",
+    )
+    parser.add_argument("--max-concurrency", type=int, default=4)
+    parser.add_argument(
+        "--backend",
+        choices=["threads", "asyncio"],
+        default="threads",
+        help="backend of the authenticator",
+    )
+    parser.add_argument(
+        "--domains", type=int, nargs="+", default=DOMAIN_COUNTS, help="domain counts"
+    )
+    parser.add_argument(
+        "--zones", type=int, nargs="+", default=ZONE_COUNTS, help="root domain counts"
+    )
+    parser.add_argument(
+        "--baseline", help="compare the results with this baseline file"
+    )
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE)
+    parser.add_argument("--save-baseline", help="store the results as baseline file")
+    args = parser.parse_args()
+
+    logging.disable(logging.WARNING)
+
+    # the plugin imports its dependencies on first use, run a scenario once to measure all scenarios warm
+    run_scenario(1, 1, args)
+
+    results = []
+    print(
+        f"{'domains':>8} {'zones':>6} {'wall time':>10} {'API calls':>10} {'retries':>8} {'peak memory':>12}"
+    )
+    for domains in args.domains:
+        for zones in args.zones:
+            if zones > domains:
+                continue
+            result = run_scenario(domains, zones, args)
+            results.append(result)
+            print(
+                f"{domains:>8} {zones:>6} {result['wall_time_seconds']:>9.3f}s {result['api_calls']:>10} "
+                f"{result['api_retries']:>8} {result['peak_memory_bytes'] / 1024:>10.0f}kB"
+            )
+
+    if args.save_baseline:
+        with open(args.save_baseline, "w") as f:
+            json.dump({"settings": _settings(args), "results": results}, f, indent=2)
+            f.write("\n")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if baseline["settings"] != _settings(args):
+            print(f"Warning: baseline settings differ: {baseline['settings']}")
+        regressions = compare(results, baseline["results"], args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            sys.exit(1)
+
+
+def _settings(args: argparse.Namespace) -> dict:
+    return {
+        "latency": args.latency,
+        "error_rate": args.error_rate,
+        "rate_limit": args.rate_limit,
+        "max_concurrency": args.max_concurrency,
+        "backend": args.backend,
+    }
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,534 @@
+"""
+Bulk issuance and renewal of many certificates in a single pass.
+
+Certbot orders one certificate per run, so renewing many certificates waits for the DNS propagation once per
+certificate. The bulk command orders all certificates with the ACME account of certbot, creates the TXT records of all
+challenges with one pass per zone, waits for their propagation once and then validates and finalizes each certificate:
+
+    certbot-dns-porkbun-bulk --dns-porkbun-credentials /etc/letsencrypt/porkbun.ini \\
+        -c example.com,www.example.com -c example.org --output-dir /etc/ssl/bulk
+
+The certificates and their private keys are written to a directory per certificate in the output directory. Unlike
+certbot, the bulk command does not create or update lineages: the certificates are not renewed by certbot renew and
+have to be ordered again by the bulk command, for example by a timer. If the challenges of a certificate can not be set, the certificates are validated in
+smaller batches, so that only the failing certificates fail. With --dns-porkbun-plan, the planned DNS changes and the estimated wall time are
+printed instead, without ordering any certificates or changing any records.
+"""
+
+import argparse
+import datetime
+import logging
+import os
+import sys
+from collections.abc import Iterator
+from typing import NamedTuple
+
+import josepy as jose
+from acme import challenges, messages
+from acme import client as acme_client
+from acme import crypto_util as acme_crypto_util
+from acme import errors as acme_errors
+from certbot import achallenges, errors
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import ec
+from requests import RequestException
+
+from certbot_dns_porkbun import __version__, daemon
+
+logger = logging.getLogger(__name__)
+
+# errors of the orders, the ACME server and its connection, which fail a single certificate, ValueError is raised for
+# domains which are not valid in a CSR
+_ACME_ERRORS = (
+    errors.Error,
+    acme_errors.Error,
+    jose.Error,
+    RequestException,
+    ValueError,
+)
+
+DEFAULT_SERVER = "https://acme-v02.api.letsencrypt.org/directory"
+
+DEFAULT_FINALIZE_TIMEOUT = 300
+
+# signing algorithms of the EC account keys by their key size, RSA keys use RS256
+EC_SIGNING_ALGORITHMS = {256: jose.ES256, 384: jose.ES384, 521: jose.ES512}
+
+
+class CertificateRequest(NamedTuple):
+    """
+    A certificate to order, named after its first domain like the certbot lineages. The name is unique among the
+    certificates of a run.
+    """
+
+    name: str
+    domains: list[str]
+
+
+class CertificateResult(NamedTuple):
+    """
+    The outcome of a certificate order with either the certificate and its key or the error.
+    """
+
+    name: str
+    fullchain_pem: str | None = None
+    private_key_pem: bytes | None = None
+    error: str | None = None
+
+
+class _Order(NamedTuple):
+    index: int
+    request: CertificateRequest
+    order: messages.OrderResource
+    private_key_pem: bytes
+    achalls: list
+
+
+class BulkRenewal:  # pylint: disable=too-few-public-methods
+    """
+    Order many certificates with a single perform and cleanup of the authenticator, so that the TXT records of all
+    challenges are created in one pass per zone and the propagation is waited for once.
+    """
+
+    def __init__(
+        self,
+        authenticator,
+        acme: acme_client.ClientV2,
+        account_key: jose.JWK,
+        finalize_timeout: float = DEFAULT_FINALIZE_TIMEOUT,
+    ) -> None:
+        """
+        Creates a new BulkRenewal object.
+
+        :param authenticator: the Authenticator performing the DNS-01 challenges
+        :param acme: the ACME client of the account
+        :param account_key: the key of the ACME account
+        :param finalize_timeout: the number of seconds to wait for the validation and the issuance of a certificate
+        """
+
+        self.authenticator = authenticator
+        self.acme = acme
+        self.account_key = account_key
+        self.finalize_timeout = finalize_timeout
+
+    def run(self, requests: list[CertificateRequest]) -> list[CertificateResult]:
+        """
+        Order the certificates. A failed certificate does not affect the others.
+
+        :param requests: the certificates to order
+        :return: the results in the same order as the requests
+        """
+
+        results: list[CertificateResult | None] = [None] * len(requests)
+        orders = []
+        for index, request in enumerate(requests):
+            try:
+                orders.append(self._new_order(index, request))
+            except _ACME_ERRORS as e:
+                logger.error("Could not order certificate %s: %s", request.name, e)
+                results[index] = CertificateResult(request.name, error=str(e))
+
+        for order, result in self._validate(orders):
+            results[order.index] = result
+        return results
+
+    def _validate(
+        self, orders: list[_Order]
+    ) -> Iterator[tuple[_Order, CertificateResult]]:
+        """
+        Validate the certificates with a single perform and cleanup of their challenges. If the challenges can not be
+        set, the orders are split in halves which are validated separately, so that a failing certificate costs a
+        few more propagation waits instead of failing all certificates.
+
+        :param orders: the orders of the certificates
+        :return: the results of the orders
+        """
+
+        if not orders:
+            return
+
+        achalls = [achall for order in orders for achall in order.achalls]
+        try:
+            responses = self.authenticator.perform(achalls) if achalls else []
+        except errors.PluginError as e:
+            self._cleanup(achalls)
+            if len(orders) == 1:
+                logger.error(
+                    "Could not set challenges of certificate %s: %s",
+                    orders[0].request.name,
+                    e,
+                )
+                yield orders[0], CertificateResult(orders[0].request.name, error=str(e))
+                return
+
+            logger.warning(
+                "Could not set challenges of %d certificates, validating them in halves: %s",
+                len(orders),
+                e,
+            )
+            half = len(orders) // 2
+            yield from self._validate(orders[:half])
+            yield from self._validate(orders[half:])
+            return
+
+        try:
+            # answer all challenges first, so that the CA validates the certificates in parallel
+            answered = []
+            start = 0
+            for order in orders:
+                end = start + len(order.achalls)
+                failure = self._answer(order, responses[start:end])
+                start = end
+                if failure is None:
+                    answered.append(order)
+                else:
+                    yield order, failure
+            for order in answered:
+                yield order, self._finalize(order)
+        finally:
+            self._cleanup(achalls)
+
+    def _cleanup(self, achalls: list) -> None:
+        """
+        Delete the TXT records of the challenges. A failed cleanup does not fail the certificates, the error is
+        only logged.
+
+        :param achalls: the annotated challenges
+        """
+
+        if not achalls:
+            return
+        try:
+            self.authenticator.cleanup(achalls)
+        except errors.PluginError as e:
+            logger.error("Could not clean up challenge TXT records: %s", e)
+
+    def _new_order(self, index: int, request: CertificateRequest) -> _Order:
+        """
+        Create the order of a certificate with a new private key and collect its pending DNS-01 challenges.
+
+        :param index: the position of the certificate in the requests
+        :param request: the certificate to order
+        :return: the order with the annotated challenges of its pending authorizations
+
+        :raise Error: if the order can not be created or an authorization has no DNS-01 challenge
+        """
+
+        private_key_pem = ec.generate_private_key(ec.SECP256R1()).private_bytes(
+            serialization.Encoding.PEM,
+            serialization.PrivateFormat.PKCS8,
+            serialization.NoEncryption(),
+        )
+        order = self.acme.new_order(
+            acme_crypto_util.make_csr(private_key_pem, request.domains)
+        )
+
+        achalls = []
+        for authorization in order.authorizations:
+            if authorization.body.status == messages.STATUS_VALID:
+                continue
+
+            challb = next(
+                (
+                    challb
+                    for challb in authorization.body.challenges
+                    if isinstance(challb.chall, challenges.DNS01)
+                ),
+                None,
+            )
+            if challb is None:
+                raise errors.Error(
+                    f"No DNS-01 challenge offered for {authorization.body.identifier.value}"
+                )
+            achalls.append(
+                annotate_challenge(
+                    challb, authorization.body.identifier, self.account_key
+                )
+            )
+
+        return _Order(index, request, order, private_key_pem, achalls)
+
+    def _answer(self, order: _Order, responses: list) -> CertificateResult | None:
+        """
+        Answer the challenges of a certificate.
+
+        :param order: the order of the certificate
+        :param responses: the challenge responses in the same order as the challenges of the order
+        :return: None if all challenges were answered, otherwise the failed result
+        """
+
+        try:
+            for achall, response in zip(order.achalls, responses):
+                self.acme.answer_challenge(achall.challb, response)
+        except _ACME_ERRORS as e:
+            logger.error(
+                "Could not answer challenges of certificate %s: %s",
+                order.request.name,
+                e,
+            )
+            return CertificateResult(order.request.name, error=str(e))
+        return None
+
+    def _finalize(self, order: _Order) -> CertificateResult:
+        """
+        Wait for the validation of a certificate and finalize its order.
+
+        :param order: the order of the certificate
+        :return: the result with the issued certificate or the error
+        """
+
+        deadline = datetime.datetime.now() + datetime.timedelta(
+            seconds=self.finalize_timeout
+        )
+        try:
+            finalized = self.acme.poll_and_finalize(order.order, deadline)
+        except _ACME_ERRORS as e:
+            logger.error("Certificate %s failed: %s", order.request.name, e)
+            return CertificateResult(order.request.name, error=str(e))
+
+        logger.info("Certificate %s issued", order.request.name)
+        return CertificateResult(
+            order.request.name, finalized.fullchain_pem, order.private_key_pem
+        )
+
+
+def annotate_challenge(
+    challb: messages.ChallengeBody,
+    identifier: messages.Identifier,
+    account_key: jose.JWK,
+) -> achallenges.KeyAuthorizationAnnotatedChallenge:
+    """
+    Annotate a challenge with its identifier and the account key.
+    Certbot versions before the identifier field only accept the domain of the challenge.
+
+    :param challb: the challenge body
+    :param identifier: the identifier of the authorization
+    :param account_key: the key of the account
+    :return: the annotated challenge
+    """
+
+    if "identifier" in achallenges.KeyAuthorizationAnnotatedChallenge.__slots__:
+        return achallenges.KeyAuthorizationAnnotatedChallenge(
+            challb=challb, identifier=identifier, account_key=account_key
+        )
+    return achallenges.KeyAuthorizationAnnotatedChallenge(
+        challb=challb, domain=identifier.value, account_key=account_key
+    )
+
+
+def save_certificate(output_dir: str, result: CertificateResult) -> None:
+    """
+    Write the certificate and its private key to the directory of the certificate, which is only accessible by the
+    owner.
+
+    :param output_dir: the directory containing a directory per certificate
+    :param result: the issued certificate
+    """
+
+    directory = os.path.join(output_dir, result.name)
+    os.makedirs(directory, mode=0o700, exist_ok=True)
+
+    key_path = os.path.join(directory, "privkey.pem")
+    with os.fdopen(
+        os.open(key_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600), "wb"
+    ) as f:
+        f.write(result.private_key_pem)
+
+    with open(os.path.join(directory, "fullchain.pem"), "w", encoding="utf-8") as f:
+        f.write(result.fullchain_pem)
+
+
+def plan_certificates(authenticator, requests: list[CertificateRequest]) -> None:
+    """
+    Print the planned DNS changes of the certificates without ordering them or changing any records. The values of
+    the challenges are not known without the orders, so that a new record is planned for each domain.
+
+    :param authenticator: the Authenticator planning the DNS-01 challenges
+    :param requests: the certificates to plan
+
+    :raise SystemExit: if domains or root domains could not be resolved or listed
+    """
+
+    try:
+        plan = authenticator.plan(
+            [domain for request in requests for domain in request.domains]
+        )
+    finally:
+        authenticator.stop_service()
+
+    print(plan.describe())
+    if plan.failures:
+        sys.exit("Planning failed for:\n" + "\n".join(plan.failures))
+
+
+def parse_certificates(
+    certificates: list[str], certificates_file: str | None = None
+) -> list[CertificateRequest]:
+    """
+    Parse the certificates of the command line and the certificates file.
+
+    :param certificates: comma separated domains of each certificate
+    :param certificates_file: optional file with the comma or whitespace separated domains of a certificate per line,
+                              empty lines and lines starting with # are ignored
+    :return: the certificates, named after their first domain without wildcard and with a -0001 suffix like the
+             certbot lineages if the name is already taken
+    """
+
+    lines = list(certificates)
+    if certificates_file is not None:
+        with open(certificates_file, encoding="utf-8") as f:
+            lines.extend(
+                line for line in f if line.strip() and not line.startswith("#")
+            )
+
+    requests = []
+    names = set()
+    for line in lines:
+        domains = line.replace(",", " ").split()
+        base_name = domains[0].removeprefix("*.")
+        name, suffix = base_name, 0
+        while name in names:
+            suffix += 1
+            name = f"{base_name}-{suffix:04d}"
+        names.add(name)
+        requests.append(CertificateRequest(name, domains))
+    return requests
+
+
+def find_accounts(
+    config, account_id: str | None = None
+) -> list[tuple[str, jose.JWK, messages.RegistrationResource]]:
+    """
+    Find the certbot accounts of the ACME server of the configuration in the accounts directory of certbot.
+
+    :param config: the certbot NamespaceConfig object with the config directory and the ACME server
+    :param account_id: optional ID of the account to find
+    :return: list of (ID, key, registration) tuples of the accounts
+    """
+
+    accounts = []
+    try:
+        account_ids = sorted(os.listdir(config.accounts_dir))
+    except FileNotFoundError:
+        return accounts
+
+    for found_id in account_ids:
+        if account_id is not None and found_id != account_id:
+            continue
+        directory = os.path.join(config.accounts_dir, found_id)
+        try:
+            with open(
+                os.path.join(directory, "private_key.json"), encoding="utf-8"
+            ) as f:
+                key = jose.JWK.json_loads(f.read())
+            with open(os.path.join(directory, "regr.json"), encoding="utf-8") as f:
+                regr = messages.RegistrationResource.json_loads(f.read())
+        except (OSError, jose.DeserializationError) as e:
+            logger.warning("Skipping certbot account %s: %s", found_id, e)
+            continue
+        accounts.append((found_id, key, regr))
+    return accounts
+
+
+def create_acme_client(
+    server: str, key: jose.JWK, regr: messages.RegistrationResource
+) -> acme_client.ClientV2:
+    """
+    Create the ACME client of an existing account.
+
+    :param server: the URL of the ACME directory
+    :param key: the key of the account
+    :param regr: the registration of the account
+    :return: the ClientV2 object
+
+    :raise Error: if the key type of the account is not supported
+    """
+
+    alg = jose.RS256
+    if key.typ == "EC":
+        if key.key.key_size not in EC_SIGNING_ALGORITHMS:
+            raise errors.Error(f"Unsupported account key size {key.key.key_size}")
+        alg = EC_SIGNING_ALGORITHMS[key.key.key_size]
+
+    network = acme_client.ClientNetwork(
+        key, alg=alg, account=regr, user_agent=f"certbot-dns-porkbun/{__version__}"
+    )
+    return acme_client.ClientV2(
+        acme_client.ClientV2.get_directory(server, network), network
+    )
+
+
+def main(argv: list[str] | None = None) -> None:
+    """
+    Order the certificates of the command line with the certbot account of the ACME server.
+
+    :param argv: the command line arguments, defaults to the arguments of the process
+    """
+
+    parser = argparse.ArgumentParser(
+        description="Issue or renew many certificates with a single DNS propagation wait.",
+    )
+    parser.add_argument(
+        "-c",
+        "--certificate",
+        action="append",
+        default=[],
+        help="comma separated domains of a certificate, can be repeated",
+    )
+    parser.add_argument(
+        "--certificates-file",
+        help="file with the comma or whitespace separated domains of a certificate per line",
+    )
+    parser.add_argument(
+        "--output-dir",
+        help="directory to write the certificates and private keys to, required unless the DNS changes are only "
+        "planned",
+    )
+    parser.add_argument("--server", default=DEFAULT_SERVER, help="ACME directory URL")
+    parser.add_argument(
+        "--account", help="ID of the certbot account, defaults to the only account"
+    )
+    parser.add_argument(
+        "--finalize-timeout",
+        type=float,
+        default=DEFAULT_FINALIZE_TIMEOUT,
+        help="seconds to wait for the validation and issuance of each certificate",
+    )
+    daemon.add_authenticator_arguments(parser)
+    args = parser.parse_args(argv)
+
+    daemon.configure_logging(args.verbose)
+
+    requests = parse_certificates(args.certificate, args.certificates_file)
+    if not requests:
+        parser.error("no certificates provided")
+
+    if args.dns_porkbun_plan:
+        plan_certificates(daemon.create_authenticator(args), requests)
+        return
+    if args.output_dir is None:
+        parser.error("the following arguments are required: --output-dir")
+
+    accounts = find_accounts(daemon.create_config(args), args.account)
+    if len(accounts) != 1:
+        sys.exit(
+            f"Found {len(accounts)} certbot accounts for {args.server}, register one with certbot or select one "
+            "with --account"
+        )
+
+    _, key, regr = accounts[0]
+    acme = create_acme_client(args.server, key, regr)
+    authenticator = daemon.create_authenticator(args)
+    results = BulkRenewal(authenticator, acme, key, args.finalize_timeout).run(requests)
+
+    failed = [result for result in results if result.error is not None]
+    for result in results:
+        if result.error is None:
+            save_certificate(args.output_dir, result)
+
+    logger.info(
+        "%d of %d certificates issued", len(results) - len(failed), len(results)
+    )
+    if failed:
+        failures = "\n".join(f"{result.name}: {result.error}" for result in failed)
+        sys.exit(f"Failed certificates:\n{failures}")
@@ -0,0 +1,182 @@
+"""
+Porkbun accounts of the credentials file and the routing of the root domains to them.
+
+Besides the key and secret of the default account, the credentials file can contain a section per additional account
+with the root domains it manages, either exact or as shell-style pattern:
+
+    dns_porkbun_key=<key of the default account>
+    dns_porkbun_secret=<secret of the default account>
+
+    [shop]
+    dns_porkbun_key=<key>
+    dns_porkbun_secret=<secret>
+    dns_porkbun_zones=example-shop.com, *.shop
+"""
+
+import fnmatch
+import os
+import threading
+from collections.abc import Callable
+from typing import NamedTuple
+
+from certbot import errors
+from certbot.plugins import dns_common
+
+DEFAULT_ACCOUNT = "default"
+
+# parsed credentials files by their path, reused as long as the file is not changed
+_loaded = {}
+_loaded_lock = threading.Lock()
+
+
+class Account(NamedTuple):
+    """
+    A Porkbun account with its API key and secret.
+    """
+
+    name: str
+    key: str
+    secret: str
+
+
+class AccountRouter:
+    """
+    Index of the accounts by the root domains they manage. Exact root domains are looked up directly, the patterns
+    are matched in the order of the credentials file and the result is cached per root domain. Root domains without
+    a matching account use the default account.
+    """
+
+    def __init__(
+        self, default: Account | None, routes: list[tuple[str, Account]]
+    ) -> None:
+        """
+        Creates a new AccountRouter object.
+
+        :param default: the account of all other root domains, None if they are not allowed
+        :param routes: the (root domain or pattern, account) tuples in their order of precedence
+        """
+
+        self.default = default
+        self.routes = routes
+        self._zones = {}
+        self._patterns = []
+        for zone, account in routes:
+            zone = zone.lower().rstrip(".")
+            if any(char in zone for char in "*?["):
+                self._patterns.append((zone, account))
+            else:
+                self._zones.setdefault(zone, account)
+        self._matches = {}
+
+    @property
+    def accounts(self) -> list[Account]:
+        """
+        All accounts, the default account first.
+        """
+
+        accounts = [] if self.default is None else [self.default]
+        for _, account in self.routes:
+            if account not in accounts:
+                accounts.append(account)
+        return accounts
+
+    def lookup(self, root_domain: str) -> Account:
+        """
+        Get the account managing a root domain.
+
+        :param root_domain: the root domain
+        :return: the Account object
+
+        :raise PluginError: if no account manages the root domain
+        """
+
+        zone = root_domain.lower().rstrip(".")
+        account = self._zones.get(zone) or self._matches.get(zone)
+        if account is None:
+            account = next(
+                (
+                    account
+                    for pattern, account in self._patterns
+                    if fnmatch.fnmatchcase(zone, pattern)
+                ),
+                self.default,
+            )
+            if account is None:
+                raise errors.PluginError(
+                    f"No Porkbun account configured for root domain {root_domain}"
+                )
+            self._matches[zone] = account
+
+        return account
+
+    def with_default(self, default: Account) -> "AccountRouter":
+        """
+        Get a copy of the router with another default account, e.g. the key and secret of the command line.
+
+        :param default: the new default account
+        :return: the AccountRouter object
+        """
+
+        return AccountRouter(default, self.routes)
+
+
+def load_accounts(path: str, mapper: Callable[[str], str]) -> AccountRouter:
+    """
+    Parse the accounts of a credentials file and warn about unsafe permissions of the file. The file is only parsed
+    and its permissions only checked again once its content, mode or owner changed, so that repeated runs in the same
+    process reuse the parsed accounts.
+
+    :param path: the path of the credentials file
+    :param mapper: maps the option names to the property names of the file, e.g. key to dns_porkbun_key
+    :return: the AccountRouter object
+
+    :raise PluginError: if the file can not be parsed or the key, secret or zones of an account are missing
+    """
+
+    stat = os.stat(path)
+    signature = (stat.st_mtime_ns, stat.st_size, stat.st_mode, stat.st_uid)
+    with _loaded_lock:
+        cached = _loaded.get(path)
+    if cached is not None and cached[0] == signature:
+        return cached[1]
+
+    # the credentials configuration checks the permissions of the file with dns_common.validate_file_permissions
+    # and warns if the file is accessible by other users
+    credentials = dns_common.CredentialsConfiguration(path, mapper)
+    sections = {
+        name: section
+        for name, section in credentials.confobj.items()
+        if isinstance(section, dict)
+    }
+
+    default = None
+    if not sections or credentials.conf("key") or credentials.conf("secret"):
+        credentials.require(
+            {"key": "Porkbun API key.", "secret": "Porkbun API key secret."}
+        )
+        default = Account(
+            DEFAULT_ACCOUNT, credentials.conf("key"), credentials.conf("secret")
+        )
+
+    routes = []
+    for name, section in sections.items():
+        missing = [
+            mapper(var)
+            for var in ("key", "secret", "zones")
+            if not section.get(mapper(var))
+        ]
+        if missing:
+            raise errors.PluginError(
+                f"Missing properties {', '.join(missing)} of account {name} in credentials configuration file {path}"
+            )
+
+        account = Account(name, section[mapper("key")], section[mapper("secret")])
+        zones = section[mapper("zones")]
+        if isinstance(zones, str):
+            zones = zones.split(",")
+        routes.extend((zone.strip(), account) for zone in zones if zone.strip())
+
+    router = AccountRouter(default, routes)
+    with _loaded_lock:
+        _loaded[path] = (signature, router)
+    return router
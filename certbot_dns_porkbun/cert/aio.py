@@ -0,0 +1,387 @@
+"""
+Asyncio transport of the Porkbun API and the DNS resolution, so that many API calls and DNS queries can be in flight
+at the same time on a single thread. The API calls need the optional aiohttp dependency, which is installed with the
+asyncio extra: pip install certbot_dns_porkbun[asyncio]
+"""
+
+import asyncio
+import json
+from collections.abc import Awaitable, Callable
+from typing import TYPE_CHECKING
+from urllib.parse import urljoin
+
+import dns.asyncresolver
+from certbot import errors
+from dns import resolver
+from pkb_client.client import API_ENDPOINT, DNSRecord, DNSRecordType, PKBClient
+
+try:
+    import aiohttp
+except ImportError:  # pragma: no cover
+    aiohttp = None
+
+from certbot_dns_porkbun import __version__
+from certbot_dns_porkbun.cert.api import (
+    DEFAULT_POOL_SIZE,
+    CircuitBreaker,
+    RetryablePKBClientException,
+    RetrySchedule,
+    TokenBucket,
+    create_record_request,
+    find_created_record_response,
+    get_records_path,
+    parse_records,
+    parse_response,
+    record_api_call,
+    recovery_of,
+)
+from certbot_dns_porkbun.cert.defaults import (
+    DEFAULT_CONNECT_TIMEOUT,
+    DEFAULT_MAX_RETRIES,
+    DEFAULT_RATE_LIMIT,
+    DEFAULT_READ_TIMEOUT,
+    DEFAULT_RETRY_BACKOFF,
+)
+from certbot_dns_porkbun.cert.metrics import Metrics
+from certbot_dns_porkbun.cert.resolvers import get_answer_resolution
+
+if TYPE_CHECKING:
+    from typing import Self
+
+
+class AsyncPorkbunClient:  # pylint: disable=too-many-instance-attributes
+    """
+    Asyncio client of the Porkbun API calls used by the plugin with the same rate limiting, retries and metrics as the
+    PooledPKBClient. The API calls are sent with aiohttp over a pool of keep-alive connections, so that subsequent calls
+    do not need a new TLS handshake, and through the proxy of the HTTPS_PROXY and NO_PROXY environment variables like
+    with requests. A call which failed after it was sent is never sent again by the transport, only retried like by
+    the PooledPKBClient. The client must only be used by the event loop it was first used in.
+    """
+
+    def __init__(  # pylint: disable=too-many-arguments,too-many-positional-arguments
+        self,
+        api_key: str,
+        secret_api_key: str,
+        api_endpoint: str = API_ENDPOINT,
+        pool_size: int = DEFAULT_POOL_SIZE,
+        rate_limit: float = DEFAULT_RATE_LIMIT,
+        max_retries: int = DEFAULT_MAX_RETRIES,
+        retry_backoff: float = DEFAULT_RETRY_BACKOFF,
+        metrics: Metrics | None = None,
+        connect_timeout: float = DEFAULT_CONNECT_TIMEOUT,
+        read_timeout: float = DEFAULT_READ_TIMEOUT,
+        circuit_breaker: CircuitBreaker | None = None,
+    ) -> None:
+        """
+        Creates a new AsyncPorkbunClient object.
+
+        :param api_key: the API key used for Porkbun API calls
+        :param secret_api_key: the API secret used for Porkbun API calls
+        :param api_endpoint: the endpoint of the Porkbun API
+        :param pool_size: the maximum number of connections and therefore of API calls in flight
+        :param rate_limit: the maximum number of API calls per second, 0 or less disables the rate limit
+        :param max_retries: the maximum number of retries of API calls failing with a temporary error
+        :param retry_backoff: the base delay in seconds of the exponential backoff between retries
+        :param metrics: optional metrics to record the duration and result of each API call
+        :param connect_timeout: the number of seconds to wait for a connection to the API
+        :param read_timeout: the number of seconds to wait for the response of an API call once it is sent
+        :param circuit_breaker: optional circuit breaker shared with other clients to fail fast during API outages
+
+        :raise PluginError: if aiohttp is not installed
+        """
+
+        if aiohttp is None:
+            raise errors.PluginError(
+                "The asyncio backend requires aiohttp, install it with: pip install certbot_dns_porkbun[asyncio]"
+            )
+
+        self.api_key = api_key
+        self.secret_api_key = secret_api_key
+        self.api_endpoint = api_endpoint
+        self.rate_limiter = TokenBucket(rate_limit)
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+        self.metrics = metrics
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.circuit_breaker = circuit_breaker
+        self.pool_size = max(1, pool_size)
+        # the session must be created by the event loop it is used in
+        self._session = None
+
+    async def __aenter__(self) -> "Self":
+        return self
+
+    async def __aexit__(self, *args) -> None:
+        await self.close()
+
+    async def close(self) -> None:
+        """
+        Close all pooled connections.
+        """
+
+        session, self._session = self._session, None
+        if session is not None:
+            await session.close()
+
+    async def ping(self, retry: bool = True) -> str:
+        """
+        Check the credentials with the ping API call.
+
+        :param retry: whether the API call is retried on temporary errors
+        :return: the IP address of the client as seen by the API
+        """
+
+        return (await self._post("ping", retry=retry)).get("yourIp", None)
+
+    async def create_dns_record(  # pylint: disable=too-many-arguments,too-many-positional-arguments
+        self,
+        domain: str,
+        record_type: DNSRecordType,
+        content: str,
+        name: str | None = None,
+        ttl: int = PKBClient.default_ttl,
+        prio: int | None = None,
+    ) -> str:
+        """
+        Create a DNS record like PKBClient.create_dns_record.
+
+        :return: the ID of the created record
+        """
+
+        async def find_created_record() -> dict | None:
+            if name:
+                records = await self.get_all_dns_records(domain, record_type, name)
+            else:
+                records = await self.get_dns_records(domain)
+            return find_created_record_response(
+                records, domain, record_type, content, name
+            )
+
+        response_json = await self._post(
+            f"dns/create/{domain}",
+            create_record_request(record_type, content, name, ttl, prio),
+            recover=find_created_record,
+        )
+        return str(response_json.get("id", None))
+
+    async def delete_dns_record(self, domain: str, record_id: str) -> bool:
+        """
+        Delete a DNS record by its ID like PKBClient.delete_dns_record.
+
+        :return: True if the record was deleted
+        """
+
+        await self._post(f"dns/delete/{domain}/{record_id}")
+        return True
+
+    async def get_dns_records(
+        self, domain: str, record_id: str | None = None
+    ) -> list[DNSRecord]:
+        """
+        Retrieve all DNS records of a domain or a single record by its ID like PKBClient.get_dns_records.
+
+        :return: the DNSRecord objects
+        """
+
+        return parse_records(await self._post(get_records_path(domain, record_id)))
+
+    async def get_all_dns_records(
+        self, domain: str, record_type: DNSRecordType, subdomain: str
+    ) -> list[DNSRecord]:
+        """
+        Retrieve the DNS records of a subdomain and type like PKBClient.get_all_dns_records.
+
+        :return: the DNSRecord objects
+        """
+
+        return parse_records(
+            await self._post(
+                f"dns/retrieveByNameType/{domain}/{record_type}/{subdomain}"
+            )
+        )
+
+    async def _post(
+        self,
+        path: str,
+        data: dict | None = None,
+        retry: bool = True,
+        recover: Callable[[], Awaitable[dict | None]] | None = None,
+    ) -> dict:
+        """
+        Send an authenticated API call, which is rate limited and retried with a jittered exponential backoff if it
+        fails with a temporary error.
+
+        :param path: the path of the API method relative to the API endpoint
+        :param data: additional request json fields besides the authentication
+        :param retry: whether the API call is retried on temporary errors
+        :param recover: for API calls which are not idempotent, returns the response of a failed attempt which was
+                        applied anyway or None, it is awaited before each retry of an attempt with unknown outcome
+        :return: the response json
+
+        :raise PKBClientException: if the API call was not successful
+        """
+
+        with record_api_call(self.metrics, path):
+            return await self._post_with_retries(path, data, retry, recover)
+
+    async def _post_with_retries(
+        self,
+        path: str,
+        data: dict | None,
+        retry: bool,
+        recover: Callable[[], Awaitable[dict | None]] | None,
+    ) -> dict:
+        retries = RetrySchedule.of_client(self, path, retry)
+        while True:
+            try:
+                with retries.attempt():
+                    return await self._post_once(path, data)
+            except RetryablePKBClientException as e:
+                await asyncio.sleep(retries.next_delay(e))
+                if recover is not None and e.outcome_unknown:
+                    with recovery_of(e):
+                        recovered = await recover()
+                    if recovered is not None:
+                        return recovered
+
+    async def _post_once(self, path: str, data: dict | None) -> dict:
+        """
+        Send a single authenticated API call after taking a token of the rate limiter.
+
+        :raise RetryablePKBClientException: if the API call failed with a temporary error
+        :raise PKBClientException: if the API call was not successful
+        """
+
+        body = json.dumps(
+            {
+                "apikey": self.api_key,
+                "secretapikey": self.secret_api_key,
+                **(data or {}),
+            }
+        ).encode()
+
+        await asyncio.sleep(self.rate_limiter.reserve())
+        try:
+            async with self._get_session().post(
+                urljoin(self.api_endpoint, path),
+                data=body,
+                headers={"Content-Type": "application/json"},
+            ) as response:
+                text = await response.text(errors="replace")
+        except aiohttp.ConnectionTimeoutError as e:
+            raise RetryablePKBClientException(
+                "Timeout",
+                f"No connection within {self.connect_timeout} seconds",
+                sent=False,
+            ) from e
+        except aiohttp.ServerTimeoutError as e:
+            raise RetryablePKBClientException(
+                "Timeout", f"No response within {self.read_timeout} seconds"
+            ) from e
+        except aiohttp.ClientConnectorError as e:
+            raise RetryablePKBClientException(
+                type(e).__name__, str(e), sent=False
+            ) from e
+        except aiohttp.ClientError as e:
+            raise RetryablePKBClientException(type(e).__name__, str(e)) from e
+
+        return parse_response(
+            response.status, text, response.headers.get("Retry-After")
+        )
+
+    def _get_session(self) -> "aiohttp.ClientSession":
+        """
+        Get the session with the connection pool, which is created on first use.
+
+        :return: the aiohttp ClientSession object
+        """
+
+        if self._session is None:
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=self.pool_size),
+                headers={"User-Agent": f"certbot-dns-porkbun/{__version__}"},
+                # waiting for a pooled connection is not limited, only the connection and the API call itself
+                timeout=aiohttp.ClientTimeout(
+                    sock_connect=self.connect_timeout, sock_read=self.read_timeout
+                ),
+                # use the proxy of the HTTPS_PROXY and NO_PROXY environment variables like requests
+                trust_env=True,
+            )
+        return self._session
+
+
+class AsyncRecursiveResolver:  # pylint: disable=too-few-public-methods
+    """
+    Resolve the canonical name of a domain with a recursive resolver like the RecursiveResolver, but with the asyncio
+    resolver of dnspython.
+    """
+
+    def __init__(self, nameservers: list[tuple[str, int]] | None = None) -> None:
+        """
+        Creates a new AsyncRecursiveResolver object.
+
+        :param nameservers: list of (address, port) tuples, None to use the resolvers configured on the host
+        """
+
+        self.resolver = None
+        if nameservers is not None:
+            self.resolver = dns.asyncresolver.Resolver(configure=False)
+            self.resolver.nameservers = [address for address, _ in nameservers]
+            self.resolver.nameserver_ports = dict(nameservers)
+
+    async def resolve_canonical_name(
+        self, name: str, _find_zone: Callable[[str], str] | None = None
+    ) -> tuple[str, float | None]:
+        """
+        Resolve the canonical name of a domain by following all CNAME and DNAME records.
+
+        :param name: the domain to resolve
+        :param _find_zone: unused, the recursive resolver finds the zones itself
+        :return: a tuple of the canonical name and the number of seconds the resolution is valid, None if the name
+                 does not exist
+        """
+
+        resolve = (
+            dns.asyncresolver.resolve
+            if self.resolver is None
+            else self.resolver.resolve
+        )
+        try:
+            answer = await resolve(name, raise_on_no_answer=False)
+        except resolver.NoAnswer:
+            return name, None
+        except resolver.NXDOMAIN as e:
+            return e.canonical_name.to_text(), None
+        return get_answer_resolution(answer)
+
+
+class ThreadedResolver:  # pylint: disable=too-few-public-methods
+    """
+    Run the canonical name resolution of a blocking resolver, e.g. the AuthoritativeResolver, in a worker thread.
+    """
+
+    def __init__(self, blocking_resolver) -> None:
+        """
+        Creates a new ThreadedResolver object.
+
+        :param blocking_resolver: the resolver with a blocking resolve_canonical_name method
+        """
+
+        self.resolver = blocking_resolver
+
+    async def resolve_canonical_name(
+        self, name: str, find_zone: Callable[[str], str]
+    ) -> tuple[str, float | None]:
+        """
+        Resolve the canonical name of a domain with the blocking resolver.
+
+        :param name: the domain to resolve
+        :param find_zone: function returning the zone of a name, e.g. the registered domain
+        :return: a tuple of the canonical name and the number of seconds the resolution is valid, None if the name
+                 has no records
+        """
+
+        return await asyncio.to_thread(
+            self.resolver.resolve_canonical_name, name, find_zone
+        )
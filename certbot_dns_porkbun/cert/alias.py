@@ -0,0 +1,34 @@
+"""
+Challenge alias mode, in which the challenge names of all domains are persistent CNAME records into a single validation
+zone, so that the challenge TXT records of a run are all written to, listed in and polled for in that zone:
+
+    _acme-challenge.www.example.com. CNAME www.example.com.acme.example.net.
+"""
+
+from typing import NamedTuple
+
+
+class ChallengeAlias(NamedTuple):
+    """
+    The CNAME record of a challenge name into the validation zone.
+    """
+
+    # fully qualified challenge name, e.g. _acme-challenge.www.example.com
+    challenge_name: str
+    # fully qualified name of the TXT record in the validation zone, e.g. www.example.com.acme.example.net
+    target: str
+
+
+def get_challenge_alias(challenge_name: str, alias_zone: str) -> ChallengeAlias:
+    """
+    Get the alias of a challenge name in the validation zone. The domain of the challenge name is prepended to the
+    validation zone, so that the TXT records of different domains do not share a name.
+
+    :param challenge_name: the fully qualified challenge name with the acme txt prefix
+    :param alias_zone: the validation zone, e.g. acme.example.net
+    :return: the ChallengeAlias object
+    """
+
+    challenge_name = challenge_name.lower().rstrip(".")
+    domain = challenge_name.split(".", 1)[1]
+    return ChallengeAlias(challenge_name, f"{domain}.{alias_zone.lower().strip('.')}")
@@ -0,0 +1,721 @@
+"""
+Porkbun API client reusing pooled keep-alive connections for all API calls.
+"""
+
+import json
+import logging
+import random
+import threading
+import time
+from collections.abc import Callable, Iterator
+from contextlib import contextmanager
+from typing import TYPE_CHECKING
+from urllib.parse import urljoin
+
+import requests
+from pkb_client.client import (
+    API_ENDPOINT,
+    DNSRecord,
+    DNSRecordType,
+    PKBClient,
+    PKBClientException,
+)
+from pkb_client.client.dns import DNS_RECORDS_WITH_PRIORITY
+from requests.adapters import HTTPAdapter
+
+from certbot_dns_porkbun.cert.defaults import (
+    DEFAULT_CIRCUIT_BREAKER_RESET,
+    DEFAULT_CIRCUIT_BREAKER_THRESHOLD,
+    DEFAULT_CONNECT_TIMEOUT,
+    DEFAULT_MAX_RETRIES,
+    DEFAULT_RATE_LIMIT,
+    DEFAULT_READ_TIMEOUT,
+    DEFAULT_RETRY_BACKOFF,
+)
+from certbot_dns_porkbun.cert.metrics import Metrics
+
+if TYPE_CHECKING:
+    from typing import Self
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_POOL_SIZE = 4
+
+MAX_RETRY_BACKOFF = 60.0
+
+
+class RetryablePKBClientException(PKBClientException):
+    """
+    Exception for API calls which failed temporarily, e.g. because of rate limiting or server errors, and may succeed
+    if they are retried.
+    """
+
+    def __init__(  # pylint: disable=too-many-arguments,too-many-positional-arguments
+        self,
+        status,
+        message,
+        retry_after: float | None = None,
+        throttled: bool = False,
+        sent: bool = True,
+    ):
+        super().__init__(status, message)
+        self.retry_after = retry_after
+        # the API answered, but rejected the call because of its rate limit
+        self.throttled = throttled
+        # the call may have been applied by the API, e.g. if it failed with a server error or its response was lost
+        self.outcome_unknown = sent and not throttled
+
+
+class CircuitOpenError(PKBClientException):
+    """
+    Exception for API calls which are not sent, because the circuit breaker is open after too many consecutive
+    failed API calls.
+    """
+
+    def __init__(self, failures: int, last_error: Exception | None):
+        super().__init__(
+            "ERROR",
+            f"Porkbun API unavailable, {failures} consecutive API calls failed, last error: {last_error}",
+        )
+
+
+class CircuitBreaker:
+    """
+    Thread-safe circuit breaker shared by all API calls of a run. It opens after the configured number of
+    consecutive API calls failed with a temporary error, e.g. a timeout or a server error, so that the remaining calls
+    fail immediately instead of waiting for their timeouts and retries. Once the reset time passed, a single call is
+    let through to probe the API, which closes the breaker again if it succeeds.
+    """
+
+    def __init__(
+        self,
+        failure_threshold: int = DEFAULT_CIRCUIT_BREAKER_THRESHOLD,
+        reset_seconds: float = DEFAULT_CIRCUIT_BREAKER_RESET,
+    ) -> None:
+        """
+        Creates a new CircuitBreaker object.
+
+        :param failure_threshold: the number of consecutive failures opening the breaker, 0 or less disables it
+        :param reset_seconds: the number of seconds after which an open breaker lets a probing call through
+        """
+
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.failures = 0
+        self.last_error = None
+        self._opened = None
+        self._probing = False
+        self._lock = threading.Lock()
+
+    @property
+    def is_open(self) -> bool:
+        """
+        Whether the breaker is open, i.e. API calls are rejected until the reset time passed.
+        """
+
+        with self._lock:
+            return self._opened is not None
+
+    def allow(self) -> None:
+        """
+        Check whether an API call may be sent.
+
+        :raise CircuitOpenError: if the breaker is open and the call is not the one probing the API
+        """
+
+        with self._lock:
+            if self._opened is None:
+                return
+            reset = time.monotonic() - self._opened >= self.reset_seconds
+            if reset and not self._probing:
+                self._probing = True
+                return
+            failures, last_error = self.failures, self.last_error
+        raise CircuitOpenError(failures, last_error)
+
+    def record_success(self) -> None:
+        """
+        Record an API call which reached the API, also if the API rejected it.
+        """
+
+        with self._lock:
+            if self._opened is not None:
+                logger.info("Porkbun API circuit breaker closed")
+            self.failures = 0
+            self._opened = None
+            self._probing = False
+
+    def record_failure(self, error: Exception) -> None:
+        """
+        Record an API call which failed with a temporary error.
+
+        :param error: the error of the API call
+        """
+
+        with self._lock:
+            self.failures += 1
+            self.last_error = error
+            if self.failure_threshold <= 0:
+                return
+            if self._opened is None and self.failures < self.failure_threshold:
+                return
+            if self._opened is None:
+                logger.error(
+                    "Porkbun API circuit breaker opened after %d consecutive failed API calls: %s",
+                    self.failures,
+                    error,
+                )
+            self._opened = time.monotonic()
+            self._probing = False
+
+
+class TokenBucket:  # pylint: disable=too-few-public-methods
+    """
+    Thread-safe token bucket limiting the rate of API calls.
+    Each call takes one token, tokens are refilled with the configured rate up to the capacity.
+    """
+
+    def __init__(self, rate: float, capacity: float | None = None) -> None:
+        """
+        Creates a new TokenBucket object.
+
+        :param rate: the number of tokens refilled per second, 0 or less disables the rate limit
+        :param capacity: the maximum number of tokens which can be taken at once, defaults to the rate
+        """
+
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(1.0, rate)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> float:
+        """
+        Take a token and wait until it is available.
+
+        :return: the number of seconds waited
+        """
+
+        wait = self.reserve()
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+    def reserve(self) -> float:
+        """
+        Take a token without waiting for it, e.g. to wait for it with asyncio instead.
+
+        :return: the number of seconds until the token is available
+        """
+
+        if self.rate <= 0:
+            return 0.0
+
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(
+                self.capacity, self._tokens + (now - self._updated) * self.rate
+            )
+            self._updated = now
+            # reserve the token, so that concurrent callers queue up behind each other
+            self._tokens -= 1
+            return -self._tokens / self.rate if self._tokens < 0 else 0.0
+
+
+class PooledPKBClient(PKBClient):
+    """
+    PKBClient variant which sends all API calls used by the plugin through a single HTTP session.
+    The session keeps a pool of keep-alive connections, so that subsequent and concurrent API calls do not need a new
+    TLS handshake.
+    """
+
+    def __init__(  # pylint: disable=too-many-arguments,too-many-positional-arguments
+        self,
+        api_key: str,
+        secret_api_key: str,
+        api_endpoint: str = API_ENDPOINT,
+        pool_size: int = DEFAULT_POOL_SIZE,
+        rate_limit: float = DEFAULT_RATE_LIMIT,
+        max_retries: int = DEFAULT_MAX_RETRIES,
+        retry_backoff: float = DEFAULT_RETRY_BACKOFF,
+        metrics: Metrics | None = None,
+        connect_timeout: float = DEFAULT_CONNECT_TIMEOUT,
+        read_timeout: float = DEFAULT_READ_TIMEOUT,
+        circuit_breaker: CircuitBreaker | None = None,
+    ) -> None:
+        """
+        Creates a new PooledPKBClient object.
+
+        :param api_key: the API key used for Porkbun API calls
+        :param secret_api_key: the API secret used for Porkbun API calls
+        :param api_endpoint: the endpoint of the Porkbun API
+        :param pool_size: the maximum number of pooled connections, should match the number of concurrent API calls
+        :param rate_limit: the maximum number of API calls per second, 0 or less disables the rate limit
+        :param max_retries: the maximum number of retries of API calls failing with a temporary error
+        :param retry_backoff: the base delay in seconds of the exponential backoff between retries
+        :param metrics: optional metrics to record the duration and result of each API call
+        :param connect_timeout: the number of seconds to wait for a connection to the API
+        :param read_timeout: the number of seconds to wait for the response data of an API call
+        :param circuit_breaker: optional circuit breaker shared with other clients to fail fast during API outages
+        """
+
+        super().__init__(api_key, secret_api_key, api_endpoint=api_endpoint)
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max(1, pool_size))
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+        self.rate_limiter = TokenBucket(rate_limit)
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+        self.metrics = metrics
+        self.timeout = (connect_timeout, read_timeout)
+        self.circuit_breaker = circuit_breaker
+
+    def __enter__(self) -> "Self":
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+    def close(self) -> None:
+        """
+        Close all pooled connections.
+        """
+
+        self.session.close()
+
+    def _post(
+        self,
+        path: str,
+        data: dict | None = None,
+        retry: bool = True,
+        recover: Callable[[], dict | None] | None = None,
+    ) -> dict:
+        """
+        Send an authenticated API call over the pooled session.
+        The call is rate limited and retried with a jittered exponential backoff if it fails with a temporary error.
+
+        :param path: the path of the API method relative to the API endpoint
+        :param data: additional request json fields besides the authentication
+        :param retry: whether the API call is retried on temporary errors
+        :param recover: for API calls which are not idempotent, returns the response of a failed attempt which was
+                        applied anyway or None, it is called before each retry of an attempt with unknown outcome
+        :return: the response json
+
+        :raise PKBClientException: if the API call was not successful
+        """
+
+        with record_api_call(self.metrics, path):
+            return self._post_with_retries(path, data, retry, recover)
+
+    def _post_with_retries(
+        self,
+        path: str,
+        data: dict | None = None,
+        retry: bool = True,
+        recover: Callable[[], dict | None] | None = None,
+    ) -> dict:
+        """
+        Send an authenticated API call and retry it with a jittered exponential backoff on temporary errors.
+
+        :param path: the path of the API method relative to the API endpoint
+        :param data: additional request json fields besides the authentication
+        :param retry: whether the API call is retried on temporary errors
+        :param recover: returns the response of a failed attempt which was applied anyway, see _post
+        :return: the response json
+
+        :raise PKBClientException: if the API call was not successful
+        """
+
+        retries = RetrySchedule.of_client(self, path, retry)
+        while True:
+            try:
+                with retries.attempt():
+                    return self._post_once(path, data)
+            except RetryablePKBClientException as e:
+                time.sleep(retries.next_delay(e))
+                if recover is not None and e.outcome_unknown:
+                    with recovery_of(e):
+                        recovered = recover()
+                    if recovered is not None:
+                        return recovered
+
+    def _post_once(self, path: str, data: dict | None = None) -> dict:
+        """
+        Send a single authenticated API call over the pooled session after taking a token of the rate limiter.
+
+        :param path: the path of the API method relative to the API endpoint
+        :param data: additional request json fields besides the authentication
+        :return: the response json
+
+        :raise RetryablePKBClientException: if the API call failed with a temporary error
+        :raise PKBClientException: if the API call was not successful
+        """
+
+        url = urljoin(self.api_endpoint, path)
+        req_json = {**self._get_auth_request_json(), **(data or {})}
+
+        self.rate_limiter.acquire()
+        try:
+            r = self.session.post(url=url, json=req_json, timeout=self.timeout)
+        except requests.ConnectTimeout as e:
+            raise RetryablePKBClientException(
+                type(e).__name__, str(e), sent=False
+            ) from e
+        except (requests.ConnectionError, requests.Timeout) as e:
+            raise RetryablePKBClientException(type(e).__name__, str(e)) from e
+
+        return parse_response(r.status_code, r.text, r.headers.get("Retry-After"))
+
+    def ping(self, retry: bool = True) -> str:
+        return self._post("ping", retry=retry).get("yourIp", None)
+
+    def create_dns_record(  # pylint: disable=too-many-arguments,too-many-positional-arguments
+        self,
+        domain: str,
+        record_type: DNSRecordType,
+        content: str,
+        name: str | None = None,
+        ttl: int = PKBClient.default_ttl,
+        prio: int | None = None,
+    ) -> str:
+        def find_created_record() -> dict | None:
+            if name:
+                records = self.get_all_dns_records(domain, record_type, name)
+            else:
+                records = self.get_dns_records(domain)
+            return find_created_record_response(
+                records, domain, record_type, content, name
+            )
+
+        response_json = self._post(
+            f"dns/create/{domain}",
+            create_record_request(record_type, content, name, ttl, prio),
+            recover=find_created_record,
+        )
+        return str(response_json.get("id", None))
+
+    def delete_dns_record(self, domain: str, record_id: str) -> bool:
+        self._post(f"dns/delete/{domain}/{record_id}")
+        return True
+
+    def get_dns_records(self, domain, record_id: str | None = None) -> list[DNSRecord]:
+        return parse_records(self._post(get_records_path(domain, record_id)))
+
+    def get_all_dns_records(
+        self, domain: str, record_type: DNSRecordType, subdomain: str
+    ) -> list[DNSRecord]:
+        return parse_records(
+            self._post(f"dns/retrieveByNameType/{domain}/{record_type}/{subdomain}")
+        )
+
+
+@contextmanager
+def record_api_call(metrics: Metrics | None, path: str) -> Iterator[None]:
+    """
+    Record the duration and result of the enclosed API call including all its retries.
+
+    :param metrics: the metrics to record the API call in, None to not record it
+    :param path: the path of the API method relative to the API endpoint, e.g. dns/create/example.com
+    """
+
+    if metrics is None:
+        yield
+        return
+
+    parts = path.split("/")
+    if parts[0] == "dns" and len(parts) > 2:
+        method, zone = "/".join(parts[:2]), parts[2]
+    else:
+        method, zone = parts[0], None
+
+    start = time.perf_counter()
+    error = True
+    try:
+        yield
+        error = False
+    finally:
+        metrics.record_api_call(method, zone, time.perf_counter() - start, error)
+
+
+class RetrySchedule:  # pylint: disable=too-few-public-methods
+    """
+    Jittered exponential backoff between the retries of a single API call failing with temporary errors.
+    """
+
+    def __init__(  # pylint: disable=too-many-arguments,too-many-positional-arguments
+        self,
+        path: str,
+        max_retries: int,
+        retry_backoff: float,
+        metrics: Metrics | None = None,
+        circuit_breaker: CircuitBreaker | None = None,
+    ) -> None:
+        """
+        Creates a new RetrySchedule object.
+
+        :param path: the path of the API method relative to the API endpoint
+        :param max_retries: the maximum number of retries
+        :param retry_backoff: the base delay in seconds of the exponential backoff
+        :param metrics: optional metrics to count the retries in
+        :param circuit_breaker: optional circuit breaker to check before each attempt and to record its result in
+        """
+
+        self.path = path
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+        self.metrics = metrics
+        self.circuit_breaker = circuit_breaker
+        self.retries = 0
+
+    @classmethod
+    def of_client(cls, client, path: str, retry: bool = True) -> "RetrySchedule":
+        """
+        Create the retry schedule of an API call with the retry options and the circuit breaker of a client.
+
+        :param client: the PooledPKBClient or AsyncPorkbunClient object
+        :param path: the path of the API method relative to the API endpoint
+        :param retry: whether the API call is retried on temporary errors
+        :return: the RetrySchedule object
+        """
+
+        return cls(
+            path,
+            client.max_retries if retry else 0,
+            client.retry_backoff,
+            client.metrics,
+            client.circuit_breaker,
+        )
+
+    @contextmanager
+    def attempt(self) -> Iterator[None]:
+        """
+        Check the circuit breaker before the enclosed attempt of the API call and record its result afterwards.
+        Temporary errors count as failures, all other results show that the API is available.
+
+        :raise CircuitOpenError: if the circuit breaker is open
+        """
+
+        if self.circuit_breaker is None:
+            yield
+            return
+
+        try:
+            self.circuit_breaker.allow()
+        except CircuitOpenError:
+            if self.metrics is not None:
+                self.metrics.count("api_circuit_rejected")
+            raise
+
+        try:
+            yield
+        except RetryablePKBClientException as e:
+            if e.throttled:
+                self.circuit_breaker.record_success()
+            else:
+                self.circuit_breaker.record_failure(e)
+            raise
+        except PKBClientException:
+            self.circuit_breaker.record_success()
+            raise
+        self.circuit_breaker.record_success()
+
+    def next_delay(self, error: RetryablePKBClientException) -> float:
+        """
+        Get the delay before the next retry of the API call and log the retry.
+
+        :param error: the temporary error of the last attempt
+        :return: the delay in seconds, at least the seconds requested by the Retry-After header
+
+        :raise RetryablePKBClientException: the error if all retries are used up
+        :raise CircuitOpenError: if the circuit breaker opened, so that the call is not retried
+        """
+
+        if self.retries >= self.max_retries:
+            raise error
+        if self.circuit_breaker is not None and self.circuit_breaker.is_open:
+            if self.metrics is not None:
+                self.metrics.count("api_circuit_rejected")
+            raise CircuitOpenError(
+                self.circuit_breaker.failures, self.circuit_breaker.last_error
+            ) from error
+
+        delay = min(MAX_RETRY_BACKOFF, self.retry_backoff * 2**self.retries)
+        delay = random.uniform(delay / 2, delay)
+        if error.retry_after is not None:
+            delay = max(delay, error.retry_after)
+
+        self.retries += 1
+        if self.metrics is not None:
+            self.metrics.count("api_retries")
+        logger.warning(
+            "Porkbun API call %s failed with %s, retry %d of %d in %.1f seconds",
+            self.path,
+            error,
+            self.retries,
+            self.max_retries,
+            delay,
+        )
+        return delay
+
+
+@contextmanager
+def recovery_of(error: RetryablePKBClientException) -> Iterator[None]:
+    """
+    Raise the error of a failed API call instead of the error of the enclosed check whether it was applied anyway,
+    because the API call must not be retried if its outcome is still unknown.
+
+    :param error: the error of the failed API call
+
+    :raise RetryablePKBClientException: the error if the check failed
+    """
+
+    try:
+        yield
+    except PKBClientException as e:
+        logger.warning(
+            "Porkbun API call failed with %s and could not be checked, it is not retried: %s",
+            error,
+            e,
+        )
+        raise error from e
+
+
+def find_created_record_response(  # pylint: disable=too-many-arguments,too-many-positional-arguments
+    records: list[DNSRecord],
+    domain: str,
+    record_type: DNSRecordType,
+    content: str,
+    name: str | None,
+) -> dict | None:
+    """
+    Find the record of a create API call which failed with an unknown outcome, so that it is not created twice.
+
+    :param records: the records of the domain or of the name and type of the record
+    :param domain: the domain of the record
+    :param record_type: the type of the record
+    :param content: the content of the record
+    :param name: the subdomain of the record, None for the root domain
+    :return: the response json of the create API call with the ID of the record or None if it was not created
+    """
+
+    fqdn = f"{name}.{domain}" if name else domain
+    for record in records:
+        if (record.type, record.name, record.content) == (record_type, fqdn, content):
+            logger.info(
+                "Porkbun API call dns/create/%s was applied despite its error, found record %s",
+                domain,
+                record.id,
+            )
+            return {"status": "SUCCESS", "id": record.id}
+    return None
+
+
+def parse_response(status_code: int, text: str, retry_after: str | None) -> dict:
+    """
+    Parse the response of an API call and raise its error.
+
+    :param status_code: the HTTP status code
+    :param text: the response body
+    :param retry_after: the value of the Retry-After header, None if not available
+    :return: the response json
+
+    :raise RetryablePKBClientException: if the API call failed with a temporary error
+    :raise PKBClientException: if the API call was not successful
+    """
+
+    try:
+        response_json = json.loads(text)
+    except ValueError:
+        response_json = {}
+
+    # the API can also report errors with the status field of a successful response
+    if status_code != 200 or response_json.get("status") == "ERROR":
+        status = response_json.get("status", f"HTTP {status_code}")
+        message = response_json.get("message", "Unknown message")
+        if status_code == 429 or status_code >= 500:
+            raise RetryablePKBClientException(
+                status,
+                message,
+                _parse_retry_after(retry_after),
+                throttled=status_code == 429,
+            )
+        raise PKBClientException(status, message)
+
+    return response_json
+
+
+def create_record_request(
+    record_type: DNSRecordType,
+    content: str,
+    name: str | None = None,
+    ttl: int = PKBClient.default_ttl,
+    prio: int | None = None,
+) -> dict:
+    """
+    Validate the fields of a new DNS record and build the request json of the create API call.
+
+    :param record_type: the type of the record
+    :param content: the content of the record
+    :param name: the subdomain of the record, None for the root domain
+    :param ttl: the TTL of the record in seconds
+    :param prio: the priority of the record, only supported by some record types
+    :return: the request json without the authentication
+
+    :raise ValueError: if the TTL or the priority is invalid
+    """
+
+    if ttl > 86400 or ttl < PKBClient.default_ttl:
+        raise ValueError(f"ttl must be between {PKBClient.default_ttl} and 86400")
+
+    if prio is not None and record_type not in DNS_RECORDS_WITH_PRIORITY:
+        raise ValueError(f"Priority can only be set for {DNS_RECORDS_WITH_PRIORITY}")
+
+    return {
+        "name": name,
+        "type": record_type.value,
+        "content": content,
+        "ttl": ttl,
+        "prio": prio,
+    }
+
+
+def get_records_path(domain: str, record_id: str | None = None) -> str:
+    """
+    Get the path of the API call retrieving all records of a domain or a single record by its ID.
+
+    :param domain: the domain of the records
+    :param record_id: the ID of a single record, None for all records
+    :return: the path relative to the API endpoint
+    """
+
+    if record_id is None:
+        return f"dns/retrieve/{domain}"
+    return f"dns/retrieve/{domain}/{record_id}"
+
+
+def parse_records(response_json: dict) -> list[DNSRecord]:
+    """
+    Parse the records of a retrieve API call.
+
+    :param response_json: the response json
+    :return: the DNSRecord objects
+    """
+
+    return [DNSRecord.from_dict(record) for record in response_json.get("records", [])]
+
+
+def _parse_retry_after(value: str | None) -> float | None:
+    """
+    Parse the seconds of a Retry-After header, HTTP dates are not supported.
+
+    :param value: the value of the Retry-After header
+    :return: the number of seconds or None if not available
+    """
+
+    try:
+        return max(0.0, float(value))
+    except (TypeError, ValueError):
+        return None
@@ -1,52 +1,564 @@
+# pylint: disable=too-many-lines
 """
 The certbot Authenticator implementation for Porkbun domains.
+
+Certbot imports all installed plugins on every run, also if another authenticator is used. Therefore, the Porkbun API
+client, dnspython, tldextract, asyncio, the thread pool and the optional features are only imported once they are
+actually needed.
 """
 
+from __future__ import annotations
+
+import functools
 import logging
+import os
+import threading
+import time
+from collections import deque
+from collections.abc import Callable, Iterable, Iterator
+from typing import TYPE_CHECKING, NamedTuple
 
-from pkb_client.client import PKBClient, DNSRecordType
-from dns import resolver
-from tldextract import tldextract
 from certbot import errors
+from certbot.display import util as display_util
 from certbot.plugins import dns_common
 
+from certbot_dns_porkbun.cert.defaults import (
+    DEFAULT_CIRCUIT_BREAKER_RESET,
+    DEFAULT_CIRCUIT_BREAKER_THRESHOLD,
+    DEFAULT_CONNECT_TIMEOUT,
+    DEFAULT_MAX_RETRIES,
+    DEFAULT_RATE_LIMIT,
+    DEFAULT_READ_TIMEOUT,
+    DEFAULT_RETRY_BACKOFF,
+)
+
+if TYPE_CHECKING:
+    from concurrent.futures import Future
+
+    from pkb_client.client import DNSRecord, PKBClient
+    from tldextract import tldextract
+
+    from certbot_dns_porkbun.cert.accounts import Account
+    from certbot_dns_porkbun.cert.aio import (
+        AsyncPorkbunClient,
+        AsyncRecursiveResolver,
+        ThreadedResolver,
+    )
+    from certbot_dns_porkbun.cert.alias import ChallengeAlias
+    from certbot_dns_porkbun.cert.journal import JournalEntry, RecordJournal
+    from certbot_dns_porkbun.cert.plan import Plan, ZonePlan
+    from certbot_dns_porkbun.cert.propagation import PropagationTracker
+    from certbot_dns_porkbun.cert.resolvers import (
+        AuthoritativeResolver,
+        RecursiveResolver,
+    )
+
+
+logger = logging.getLogger(__name__)
 
 DEFAULT_PROPAGATION_SECONDS = 600
 
+DEFAULT_PROPAGATION_POLL_INTERVAL = 10
+
+DEFAULT_MAX_CONCURRENCY = 4
+
+DEFAULT_NEGATIVE_RESOLUTION_TTL = 60
+
+# TTL of the challenge TXT records, Porkbun raises lower TTLs to its minimum
+DEFAULT_RECORD_TTL = 300
+
+# range of the TTLs accepted by the Porkbun API
+MIN_RECORD_TTL = 300
+
+MAX_RECORD_TTL = 86400
+
+PORKBUN_MIN_TTL = 600
+
 ACME_TXT_PREFIX = "_acme-challenge"
 
+RESOLVER_SYSTEM = "system"
+
+RESOLVER_AUTHORITATIVE = "authoritative"
+
+BACKEND_THREADS = "threads"
+
+BACKEND_ASYNCIO = "asyncio"
+
+
+@functools.cache
+def get_domain_extractor(cache_dir: str | None = None) -> tldextract.TLDExtract:
+    """
+    Get the TLDExtract instance to split domains into root domain and subdomain.
+    The instance only uses the public suffix list snapshot bundled with tldextract and never fetches the list over the
+    network. It is created once per process and cache directory.
+
+    :param cache_dir: optional directory to persist the parsed public suffix list across processes
+    :return: the TLDExtract instance
+    """
+
+    from tldextract import tldextract  # pylint: disable=import-outside-toplevel
+
+    return tldextract.TLDExtract(cache_dir=cache_dir, suffix_list_urls=())
+
+
+@functools.lru_cache(maxsize=4096)
+def split_domain(fqdn: str, cache_dir: str | None = None) -> tuple[str, str]:
+    """
+    Split a fully qualified domain name into the root domain and the subdomain.
+    The results are memoized, so that repeated lookups of the same name only cost a dict lookup.
+
+    :param fqdn: the fully qualified domain name to split
+    :param cache_dir: optional directory to persist the parsed public suffix list across processes
+    :return: a tuple of the root domain and subdomain
+    """
+
+    extract_result = get_domain_extractor(cache_dir)(fqdn)
+    return f"{extract_result.domain}.{extract_result.suffix}", extract_result.subdomain
+
 
-def resolve_challenge_domain(domain) -> tuple[str, str]:
+class ChallengeResolution(NamedTuple):
+    """
+    The resolution of the challenge name of a single domain by resolve_challenge_domains.
+    """
+
+    domain: str
+    # the challenge name with the acme txt prefix
+    challenge_name: str
+    # the root domain and subdomain the challenge TXT record is written to, None if the resolution failed
+    root_domain: str | None
+    name: str | None
+    # the number of seconds the resolution is valid
+    ttl: float | None
+    # whether the challenge name is delegated to another name by CNAME or DNAME records
+    delegated: bool
+    # the duration of the lookup in seconds, the lookup is shared by the domains with the same challenge name
+    seconds: float
+    # whether the lookup of an earlier domain with the same challenge name was reused
+    cached: bool
+    error: Exception | None
+
+
+def resolve_challenge_domains(
+    domains: Iterable[str],
+    suffix_cache_dir: str | None = None,
+    dns_resolver: RecursiveResolver | AuthoritativeResolver | None = None,
+    max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+) -> Iterator[ChallengeResolution]:
+    """
+    Resolve the challenge root domains and subdomains of a stream of domains like resolve_challenge_domain_with_ttl.
+    At most max_concurrency lookups run in parallel and the domains with the same challenge name, e.g. example.com and
+    *.example.com, share a single lookup. The results are yielded in the order of the domains as soon as they are
+    available, so that the domains are only read ahead of the results by a few times max_concurrency.
+
+    :param domains: the domains to resolve
+    :param suffix_cache_dir: optional directory to persist the parsed public suffix list across processes
+    :param dns_resolver: the resolver to follow the CNAME and DNAME records with, defaults to the resolvers
+                         configured on the host
+    :param max_concurrency: the maximum number of lookups in parallel
+    :return: the ChallengeResolution objects in the order of the domains, failed lookups have an error instead of
+             raising it
+    """
+
+    def lookup(
+        domain: str,
+    ) -> tuple[tuple[str, str, float] | None, float, Exception | None]:
+        start = time.perf_counter()
+        try:
+            resolution = resolve_challenge_domain_with_ttl(
+                domain, suffix_cache_dir, dns_resolver
+            )
+        except Exception as e:  # pylint: disable=broad-exception-caught
+            # the error is reported with the domain, the other domains are still resolved
+            logger.debug(
+                "Challenge name of %s could not be resolved", domain, exc_info=True
+            )
+            return None, time.perf_counter() - start, e
+        return resolution, time.perf_counter() - start, None
+
+    def result(domain: str, lookup_future: Future, cached: bool) -> ChallengeResolution:
+        challenge_name = _get_challenge_name(domain)
+        resolution, seconds, error = lookup_future.result()
+        root_domain, name, ttl = resolution or (None, None, None)
+        fqdn = f"{name}.{root_domain}" if name else root_domain
+        return ChallengeResolution(
+            domain,
+            challenge_name,
+            root_domain,
+            name,
+            ttl,
+            resolution is not None and fqdn != challenge_name,
+            seconds,
+            cached,
+            error,
+        )
+
+    from concurrent.futures import ThreadPoolExecutor  # pylint: disable=import-outside-toplevel
+
+    workers = max(1, max_concurrency)
+    lookups = {}
+    window = deque()
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for domain in domains:
+            challenge_name = _get_challenge_name(domain)
+            cached = challenge_name in lookups
+            if not cached:
+                lookups[challenge_name] = executor.submit(lookup, domain)
+            window.append((domain, lookups[challenge_name], cached))
+            while len(window) > 2 * workers or (window and window[0][1].done()):
+                yield result(*window.popleft())
+
+        while window:
+            yield result(*window.popleft())
+
+
+def resolve_challenge_domain(
+    domain, suffix_cache_dir: str | None = None
+) -> tuple[str, str]:
     """
     Resolve the challenge root domain and subdomain from the provided domain.
     It follows CNAME and DNAME records to find the canonical name.
 
     :param domain: the domain to get the challenge root domain and subdomain from
+    :param suffix_cache_dir: optional directory to persist the parsed public suffix list across processes
     :return: a tuple of the root domain and subdomain
     """
 
-    domain = domain.replace("*", "")
-    domain = f"{ACME_TXT_PREFIX}.{domain}"
+    root_domain, name, _ = resolve_challenge_domain_with_ttl(domain, suffix_cache_dir)
+    return root_domain, name
+
+
+def resolve_challenge_domain_with_ttl(
+    domain,
+    suffix_cache_dir: str | None = None,
+    dns_resolver: RecursiveResolver | AuthoritativeResolver | None = None,
+) -> tuple[str, str, float]:
+    """
+    Resolve the challenge root domain and subdomain from the provided domain like resolve_challenge_domain.
+    Additionally, the number of seconds the resolution is valid is returned, which is the minimum TTL of the
+    followed CNAME and DNAME records or the negative caching TTL if the name does not exist.
+
+    :param domain: the domain to get the challenge root domain and subdomain from
+    :param suffix_cache_dir: optional directory to persist the parsed public suffix list across processes
+    :param dns_resolver: the resolver to follow the CNAME and DNAME records with, defaults to the resolvers
+                         configured on the host
+    :return: a tuple of the root domain, subdomain and the TTL in seconds
+    """
+
+    # pylint: disable=import-outside-toplevel
+    from certbot_dns_porkbun.cert.resolvers import RecursiveResolver
+
+    if dns_resolver is None:
+        dns_resolver = RecursiveResolver()
+
+    domain = _get_challenge_name(domain)
+
+    # follow all CNAME and DNAME records
+    canonical_name, ttl = dns_resolver.resolve_canonical_name(
+        domain, lambda name: split_domain(name, suffix_cache_dir)[0]
+    )
+    return _split_canonical_name(domain, canonical_name, ttl, suffix_cache_dir)
+
+
+async def resolve_challenge_domain_async(
+    domain,
+    suffix_cache_dir: str | None = None,
+    dns_resolver: AsyncRecursiveResolver | ThreadedResolver | None = None,
+) -> tuple[str, str, float]:
+    """
+    Resolve the challenge root domain, subdomain and the TTL of the resolution like resolve_challenge_domain_with_ttl
+    with an asyncio resolver.
+
+    :param domain: the domain to get the challenge root domain and subdomain from
+    :param suffix_cache_dir: optional directory to persist the parsed public suffix list across processes
+    :param dns_resolver: the resolver to follow the CNAME and DNAME records with, defaults to the resolvers
+                         configured on the host
+    :return: a tuple of the root domain, subdomain and the TTL in seconds
+    """
+
+    # pylint: disable=import-outside-toplevel
+    from certbot_dns_porkbun.cert.aio import AsyncRecursiveResolver
+
+    if dns_resolver is None:
+        dns_resolver = AsyncRecursiveResolver()
+
+    domain = _get_challenge_name(domain)
+
+    # follow all CNAME and DNAME records
+    canonical_name, ttl = await dns_resolver.resolve_canonical_name(
+        domain, lambda name: split_domain(name, suffix_cache_dir)[0]
+    )
+    return _split_canonical_name(domain, canonical_name, ttl, suffix_cache_dir)
+
+
+def _get_challenge_name(domain: str) -> str:
+    """
+    Get the name of the challenge TXT record of a domain.
+
+    :param domain: the domain of the challenge, optionally a wildcard domain
+    :return: the name with the acme txt prefix
+    """
+
+    domain = domain.replace("*", "").lstrip(".")
+    return f"{ACME_TXT_PREFIX}.{domain}"
+
+
+def _split_canonical_name(
+    domain: str,
+    canonical_name: str,
+    ttl: float | None,
+    suffix_cache_dir: str | None,
+) -> tuple[str, str, float]:
+    """
+    Split the resolved canonical name of a challenge name into the root domain and subdomain.
+
+    :param domain: the challenge name
+    :param canonical_name: the canonical name of the challenge name
+    :param ttl: the number of seconds the resolution is valid, None if the name does not exist
+    :param suffix_cache_dir: optional directory to persist the parsed public suffix list across processes
+    :return: a tuple of the root domain, subdomain and the TTL in seconds
+    """
 
-    try:
-        # follow all CNAME and DNAME records
-        canonical_name = resolver.canonical_name(domain)
-        logging.info(
+    if ttl is None:
+        ttl = DEFAULT_NEGATIVE_RESOLUTION_TTL
+    elif canonical_name.rstrip(".") != domain:
+        logger.info(
             "Resolved domain '%s' to '%s' via CNAME/DNAME record",
             domain,
             canonical_name,
         )
-    except (resolver.NoAnswer, resolver.NXDOMAIN):
-        canonical_name = domain
 
-    extract_result = tldextract.extract(canonical_name.to_text())
-    root_domain = f"{extract_result.domain}.{extract_result.suffix}"
-    name = extract_result.subdomain
+    return *split_domain(canonical_name, suffix_cache_dir), ttl
 
-    return root_domain, name
 
+class ResolutionCache:
+    """
+    Thread-safe cache of challenge domain resolutions which expire after the TTL of the DNS answers.
+    """
+
+    def __init__(self) -> None:
+        self._entries = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, domain: str, allow_expired: bool = False) -> tuple[str, str] | None:
+        """
+        Get the cached resolution of a domain.
+
+        :param domain: the resolved domain
+        :param allow_expired: also return the resolution if its TTL is expired
+        :return: a tuple of the root domain and subdomain or None if not cached
+        """
+
+        with self._lock:
+            entry = self._entries.get(domain)
+            if entry is not None and (allow_expired or entry[1] > time.monotonic()):
+                self.hits += 1
+                return entry[0]
+
+            self.misses += 1
+            return None
+
+    def put(self, domain: str, resolution: tuple[str, str], ttl: float) -> None:
+        """
+        Cache the resolution of a domain.
+
+        :param domain: the resolved domain
+        :param resolution: a tuple of the root domain and subdomain
+        :param ttl: the number of seconds the resolution is valid
+        """
+
+        with self._lock:
+            self._entries[domain] = (resolution, time.monotonic() + ttl)
+
+    def evict_expired(self) -> None:
+        """
+        Remove the expired resolutions and reset the hit and miss counters, e.g. after a session of the daemon, so
+        that the cache does not grow with every domain served.
+        """
+
+        now = time.monotonic()
+        with self._lock:
+            self._entries = {
+                domain: entry
+                for domain, entry in self._entries.items()
+                if entry[1] > now
+            }
+            self.hits = 0
+            self.misses = 0
+
+
+class ChallengeRecord(NamedTuple):
+    """
+    A single challenge TXT record with the domain it validates.
+    """
+
+    domain: str
+    root_domain: str
+    name: str
+    validation: str
+
+
+class _ZoneBatch(NamedTuple):
+    root_domain: str
+    challenges: list[ChallengeRecord]
+    # position of the first challenge of the batch to keep the order of the challenges in error messages
+    index: int
+
+
+class _ZoneBatcher:
+    """
+    Collect the resolved challenges of a pipelined perform into batches per root domain, so that the existing TXT
+    records of each root domain are still only retrieved once. The batch of a root domain is released as soon as all
+    challenges of domains below it are resolved. Challenges delegated by CNAME records to other root domains can only
+    be released once all challenges are resolved.
+    """
+
+    def __init__(self, unresolved: dict[str, int]) -> None:
+        """
+        Creates a new _ZoneBatcher object.
+
+        :param unresolved: mapping of the root domains of the challenge domains to their number of challenges
+        """
+
+        self._unresolved = dict(unresolved)
+        self._batches = {}
+        self._lock = threading.Lock()
+
+    def add(self, item: tuple[int, str, ChallengeRecord]) -> list[_ZoneBatch]:
+        """
+        Add a resolved challenge.
+
+        :param item: a tuple of the position of the challenge, the root domain of its domain and the challenge record
+        :return: the batches which are complete
+        """
+
+        index, domain_root, challenge = item
+        ready = []
+        with self._lock:
+            self._unresolved[domain_root] -= 1
+            self._batches.setdefault(challenge.root_domain, []).append(
+                (index, challenge)
+            )
+            for root_domain in dict.fromkeys([domain_root, challenge.root_domain]):
+                if self._unresolved.get(root_domain) == 0:
+                    del self._unresolved[root_domain]
+                    if root_domain in self._batches:
+                        ready.append(
+                            self._release(root_domain, self._batches.pop(root_domain))
+                        )
+        return ready
+
+    def flush(self) -> list[_ZoneBatch]:
+        """
+        Release the remaining batches once all challenges are resolved or failed.
+
+        :return: the remaining batches in the order of their first challenge
+        """
+
+        with self._lock:
+            batches = [
+                self._release(root_domain, batch)
+                for root_domain, batch in self._batches.items()
+            ]
+            self._batches.clear()
+        return sorted(batches, key=lambda batch: batch.index)
+
+    @staticmethod
+    def _release(
+        root_domain: str, batch: list[tuple[int, ChallengeRecord]]
+    ) -> _ZoneBatch:
+        batch.sort(key=lambda item: item[0])
+        return _ZoneBatch(
+            root_domain, [challenge for _, challenge in batch], batch[0][0]
+        )
+
+
+def _get_record_subdomain(record: DNSRecord, root_domain: str) -> str:
+    """
+    Get the subdomain of a DNS record relative to its root domain.
+
+    :param record: the DNS record
+    :param root_domain: the root domain of the DNS record
+    :return: the subdomain, empty string for the root domain itself
+    """
+
+    if record.name == root_domain:
+        return ""
+    if record.name.endswith(f".{root_domain}"):
+        return record.name[: -len(root_domain) - 1]
+    return record.name
+
+
+def _select_challenge_records(
+    records: list[DNSRecord], root_domain: str, names: set[str]
+) -> list[tuple[str, DNSRecord]]:
+    """
+    Select the TXT records of the challenge names from all records of a root domain.
+
+    :param records: the records of the root domain
+    :param root_domain: the root domain
+    :param names: the subdomains of the challenges
+    :return: list of (subdomain, record) tuples of the TXT records of the challenge names
+    """
+
+    from pkb_client.client import DNSRecordType  # pylint: disable=import-outside-toplevel
+
+    selected = []
+    for record in records:
+        name = _get_record_subdomain(record, root_domain)
+        if record.type == DNSRecordType.TXT and name in names:
+            selected.append((name, record))
+    return selected
+
+
+def _get_achall_domain(achall) -> str:
+    """
+    Get the domain of an annotated challenge.
+    Older certbot versions only provide the domain attribute instead of the identifier.
+
+    :param achall: the annotated challenge
+    :return: the domain of the challenge
+    """
+
+    identifier = getattr(achall, "identifier", None)
+    if identifier is not None:
+        return identifier.value
+    return achall.domain
+
+
+def _profiled(phase: str) -> Callable:
+    """
+    Profile a method of the authenticator taking the annotated challenges or a single domain as first argument if a
+    profile directory is configured.
+
+    :param phase: the name of the profiled phase in the file names of the profile
+    :return: the decorator
+    """
+
+    def decorator(method: Callable) -> Callable:
+        @functools.wraps(method)
+        def wrapper(self, target, *args, **kwargs):
+            directory = self.conf("profile")
+            if not directory:
+                return method(self, target, *args, **kwargs)
+
+            # pylint: disable=import-outside-toplevel
+            from certbot_dns_porkbun.cert import profiling
+
+            if isinstance(target, str):
+                domains = [target]
+            else:
+                domains = [_get_achall_domain(achall) for achall in target]
+            with profiling.profile(directory, phase, domains):
+                return method(self, target, *args, **kwargs)
+
+        return wrapper
+
+    return decorator
 
-class Authenticator(dns_common.DNSAuthenticator):
+
+class Authenticator(dns_common.DNSAuthenticator):  # pylint: disable=too-many-instance-attributes
     """
     Authenticator class to handle a DNS-01 challenge for Porkbun domains.
     """
@@ -54,8 +566,33 @@ class Authenticator(dns_common.DNSAuthenticator):
     description = "Obtain certificates using a DNS TXT record for Porkbun domains"
 
     def __init__(self, *args, **kwargs) -> None:
+        from certbot_dns_porkbun.cert.metrics import Metrics  # pylint: disable=import-outside-toplevel
+
         super().__init__(*args, **kwargs)
-        self.credentials = None
+        # Porkbun accounts of the credentials and the root domains they manage
+        self._accounts = None
+        # timings of the phases of the current run
+        self._metrics = Metrics()
+        # challenge domain resolutions shared by perform and cleanup
+        self._resolution_cache = ResolutionCache()
+        # Porkbun API clients by account name shared by all API calls of the account, created on first use
+        self._clients = {}
+        self._client_lock = threading.Lock()
+        # circuit breaker shared by the API clients of all accounts, created on first use
+        self._circuit_breaker = None
+        # challenge names whose alias CNAME records were created by this run
+        self._provisioned_aliases = set()
+        self._alias_lock = threading.Lock()
+        # journal of the created challenge records, loaded on first use if enabled
+        self._journal = None
+        # resolvers of the challenge domains and the nameservers of the zones, created on first use
+        self._dns_resolver = None
+        self._authoritative_resolver = None
+        self._resolver_lock = threading.Lock()
+        # event loop, API client and resolver of the asyncio backend, created on first use
+        self._event_loop = None
+        self._async_clients = {}
+        self._async_resolver = None
 
     @classmethod
     def add_parser_arguments(
@@ -67,12 +604,187 @@ class Authenticator(dns_common.DNSAuthenticator):
         :param add: method handling the argument adding to the cli
         """
 
-        super(Authenticator, cls).add_parser_arguments(
+        super().add_parser_arguments(
             add, default_propagation_seconds=default_propagation_seconds
         )
         add("credentials", help="Porkbun credentials INI file.")
         add("key", help="Porkbun API key (overwrites credentials file)")
         add("secret", help="Porkbun API key secret (overwrites credentials file)")
+        add(
+            "propagation-check",
+            action="store_true",
+            default=False,
+            help="Poll the authoritative nameservers until the challenge TXT records are served instead of always "
+            "waiting the full propagation time. The propagation seconds are then used as upper bound.",
+        )
+        add(
+            "propagation-poll-interval",
+            type=int,
+            default=DEFAULT_PROPAGATION_POLL_INTERVAL,
+            help="The number of seconds between two propagation checks.",
+        )
+        add(
+            "propagation-quorum",
+            type=int,
+            default=0,
+            help="The number of nameservers which must serve the challenge TXT records, 0 means all nameservers.",
+        )
+        add(
+            "propagation-nameservers",
+            default=None,
+            help="Comma separated list of nameserver addresses (address[:port]) to check for the challenge TXT "
+            "records instead of the authoritative nameservers of the domain.",
+        )
+        add(
+            "api-endpoint",
+            default=None,
+            help="The endpoint of the Porkbun API.",
+        )
+        add(
+            "suffix-cache-dir",
+            default=None,
+            help="Directory to persist the parsed public suffix list across runs. The public suffix list snapshot "
+            "bundled with tldextract is used and never fetched over the network.",
+        )
+        add(
+            "rate-limit",
+            type=float,
+            default=DEFAULT_RATE_LIMIT,
+            help="The maximum number of Porkbun API calls per second, 0 disables the rate limit.",
+        )
+        add(
+            "max-retries",
+            type=int,
+            default=DEFAULT_MAX_RETRIES,
+            help="The maximum number of retries of Porkbun API calls failing because of rate limiting, server errors "
+            "or timeouts.",
+        )
+        add(
+            "retry-backoff",
+            type=float,
+            default=DEFAULT_RETRY_BACKOFF,
+            help="The base delay in seconds of the exponential backoff between retries of Porkbun API calls.",
+        )
+        add(
+            "connect-timeout",
+            type=float,
+            default=DEFAULT_CONNECT_TIMEOUT,
+            help="The number of seconds to wait for a connection to the Porkbun API.",
+        )
+        add(
+            "read-timeout",
+            type=float,
+            default=DEFAULT_READ_TIMEOUT,
+            help="The number of seconds to wait for the response of a Porkbun API call.",
+        )
+        add(
+            "circuit-breaker-threshold",
+            type=int,
+            default=DEFAULT_CIRCUIT_BREAKER_THRESHOLD,
+            help="The number of consecutive Porkbun API calls failing with a timeout, connection or server error "
+            "after which all remaining API calls of the run fail immediately, 0 disables the circuit breaker.",
+        )
+        add(
+            "circuit-breaker-reset",
+            type=float,
+            default=DEFAULT_CIRCUIT_BREAKER_RESET,
+            help="The number of seconds after which an open circuit breaker lets a single Porkbun API call through to "
+            "check whether the API is available again.",
+        )
+        add(
+            "health-check",
+            action="store_true",
+            default=False,
+            help="Check that the Porkbun API is available with a single ping API call per account before any records "
+            "are changed, so that the run fails fast during an API outage.",
+        )
+        add(
+            "metrics-json",
+            default=None,
+            help="Path of a JSON file to write the timings of the authenticator phases and the API call counts to.",
+        )
+        add(
+            "metrics-prometheus",
+            default=None,
+            help="Path of a file to write the timings of the authenticator phases and the API call counts to in the "
+            "Prometheus text format, e.g. for the textfile collector of the node exporter.",
+        )
+        add(
+            "max-concurrency",
+            type=int,
+            default=DEFAULT_MAX_CONCURRENCY,
+            help="The maximum number of root domains for which the TXT records are created or deleted in parallel.",
+        )
+        add(
+            "resolver",
+            default=RESOLVER_SYSTEM,
+            help="The resolver to follow the CNAME records of the challenge domains with: 'system' for the resolvers "
+            "configured on the host, 'authoritative' to query the authoritative nameservers of the zones directly or "
+            "a comma separated list of resolver addresses (address[:port]).",
+        )
+        add(
+            "backend",
+            default=BACKEND_THREADS,
+            choices=[BACKEND_THREADS, BACKEND_ASYNCIO],
+            help="The backend performing the API calls and DNS queries: 'threads' for a pool of max-concurrency "
+            "threads or 'asyncio' for a single thread with an event loop, which keeps max-concurrency API calls and "
+            "DNS queries in flight at the same time.",
+        )
+        add(
+            "ttl",
+            type=int,
+            default=DEFAULT_RECORD_TTL,
+            help=f"The TTL in seconds of the challenge TXT records between {MIN_RECORD_TTL} and {MAX_RECORD_TTL}. Porkbun "
+            f"raises TTLs below {PORKBUN_MIN_TTL} seconds to its minimum.",
+        )
+        add(
+            "prune-stale-records",
+            action="store_true",
+            default=False,
+            help="Delete TXT records of the challenge names whose values are not needed by the current run, e.g. "
+            "left behind by interrupted runs, while creating the new records. Do not use if other clients create "
+            "challenge records for the same names at the same time. The records are listed even if the journal is "
+            "enabled.",
+        )
+        add(
+            "journal",
+            action="store_true",
+            default=False,
+            help="Record the created TXT records in a journal in the certbot work directory. The records are then "
+            "created without listing the existing records first and deleted by their ID. Records left behind by "
+            "interrupted runs are deleted at the start of the next run.",
+        )
+        add(
+            "challenge-alias",
+            default=None,
+            help="The validation zone to create all challenge TXT records in, e.g. acme.example.net. The challenge "
+            "name of each domain must be a CNAME record to <domain>.<validation zone>, e.g. "
+            "_acme-challenge.www.example.com to www.example.com.acme.example.net. Challenge names without the CNAME "
+            "record are reported and their TXT records are created in the zone of the domain.",
+        )
+        add(
+            "provision-aliases",
+            action="store_true",
+            default=False,
+            help="Create the missing CNAME records of the challenge names into the validation zone of "
+            "challenge-alias. The CNAME records are kept after the cleanup, so that later runs only write to the "
+            "validation zone.",
+        )
+        add(
+            "profile",
+            default=None,
+            help="Directory to write a profile of each perform and cleanup to: the cProfile statistics, the collapsed "
+            "stacks for flame graphs and a report of the time and the allocated memory by package. Profiling slows "
+            "down the run considerably.",
+        )
+        add(
+            "plan",
+            action="store_true",
+            default=False,
+            help="Only resolve the challenge domains and list the existing TXT records, then report the records "
+            "which would be created and deleted per root domain and the estimated wall time of the run. No records "
+            "are changed and the run fails, so that the challenges are not validated.",
+        )
 
     def more_info(self) -> str:
         """
@@ -84,111 +796,2030 @@ class Authenticator(dns_common.DNSAuthenticator):
 
         return "This plugin configures a DNS TXT record to respond to a DNS-01 challenge using the Porkbun DNS API."
 
-    def _setup_credentials(self) -> None:
+    @_profiled("perform")
+    def perform(self, achalls: list) -> list:
         """
-        Setup Porkbun key and secret from credentials file.
+        Perform the DNS-01 challenges and wait for the DNS changes to propagate.
+        The challenges are grouped by their root domain, so that the existing TXT records of each root domain are
+        only retrieved once.
+
+        :param achalls: the annotated DNS-01 challenges to perform
+        :return: the challenge responses in the same order as the challenges
+
+        :raise PluginError: if a TXT record can not be set or something goes wrong
         """
 
-        # If both cli params are provided we do not need a credentials file
-        if self.conf("key") and self.conf("secret"):
-            return
+        if self.conf("plan"):
+            plan = self.plan(
+                [_get_achall_domain(achall) for achall in achalls],
+                [achall.validation(achall.account_key) for achall in achalls],
+            )
+            display_util.notify(plan.describe())
+            raise errors.PluginError(
+                f"Planned the DNS changes only because of --{self.option_name('plan')}, no TXT records were changed"
+            )
 
-        self._configure_file(
-            "credentials", "Absolute path to Porkbun credentials INI file"
-        )
-        dns_common.validate_file_permissions(self.conf("credentials"))
-        self.credentials = self._configure_credentials(
-            "credentials",
-            "Porkbun credentials INI file",
-            {
-                "key": "Porkbun API key.",
-                "secret": "Porkbun API key secret.",
-            },
-        )
+        with self._metrics.timer("perform"):
+            self._setup_credentials()
+            self._check_api_health()
 
-    def _perform(self, domain: str, validation_name: str, validation: str) -> None:
+            self._attempt_cleanup = True
+            self._warn_short_propagation_seconds()
+            self._sweep_journal()
+
+            tracker, untracked = None, []
+            if self._uses_asyncio():
+                challenges = self._run_async(
+                    self._perform_async(achalls, self._get_pruned_values(achalls))
+                )
+            else:
+                tracker = self._create_propagation_tracker()
+                try:
+                    challenges, untracked = self._perform_pipelined(
+                        achalls, tracker, self._get_pruned_values(achalls)
+                    )
+                except Exception:
+                    if tracker is not None:
+                        tracker.cancel()
+                    raise
+            responses = [achall.response(achall.account_key) for achall in achalls]
+
+        if tracker is None:
+            self.wait_for_propagation(challenges)
+        else:
+            self._wait_for_tracker(tracker, untracked)
+
+        return responses
+
+    @_profiled("cleanup")
+    def cleanup(self, achalls: list) -> None:
         """
-        Add the validation DNS TXT record to the provided Porkbun domain.
-        Moreover, it resolves the canonical name (CNAME) for the provided domain with the acme txt prefix.
+        Delete the TXT records of the DNS-01 challenges.
+        The challenges are grouped by their root domain, so that the existing TXT records of each root domain are
+        only retrieved once.
 
-        :param domain: the Porkbun domain for which a TXT record will be created
-        :param validation_name: the value to validate the dns challenge
+        :param achalls: the annotated DNS-01 challenges to clean up
+
+        :raise PluginError: if a TXT record can not be deleted or something goes wrong
+        """
+
+        try:
+            if self._attempt_cleanup:
+                self._get_journal()
+                with self._metrics.timer("cleanup"):
+                    if self._uses_asyncio():
+                        self._run_async(self._cleanup_async(achalls))
+                    else:
+                        self._run_per_zone(
+                            self._cleanup_zone,
+                            self._group_challenges(achalls, allow_expired=True),
+                        )
+        finally:
+            logger.debug(
+                "Challenge domain resolution cache: %d hits, %d misses",
+                self._resolution_cache.hits,
+                self._resolution_cache.misses,
+            )
+            self._close_porkbun_client()
+            self._export_metrics()
+
+    def start_service(self) -> None:
+        """
+        Prepare the authenticator to perform and clean up single challenges in a long-running service.
+        The credentials are read once and the records left behind by interrupted runs are deleted.
+        """
+
+        self._setup_credentials()
+        self._check_api_health()
+        self._attempt_cleanup = True
+        self._warn_short_propagation_seconds()
+        self._sweep_journal()
+
+    @_profiled("perform")
+    def perform_challenge(self, domain: str, validation: str) -> ChallengeRecord:
+        """
+        Create the TXT record of a single challenge without waiting for the propagation.
+        The Porkbun API connections, the domain resolutions and the nameservers of the zones are kept for the
+        subsequent challenges.
+
+        :param domain: the domain of the challenge
         :param validation: the value for the TXT record
+        :return: the created challenge record to wait for its propagation
 
         :raise PluginError: if the TXT record can not be set or something goes wrong
         """
 
-        client = self._get_porkbun_client()
+        with self._metrics.timer("perform"):
+            root_domain, name = self._resolve_challenge_domain(domain, provision=True)
+            challenge = ChallengeRecord(domain, root_domain, name, validation)
+            self._perform_zone(root_domain, [challenge])
 
-        propagation_seconds = self.conf("propagation_seconds")
-        if propagation_seconds < 600:
-            logging.warning(
-                "The propagation time is less than Porkbun DNS TTL minimum of 600 seconds. Subsequent "
-                "challenges for same domain may fail. Try increasing the propagation time if you encounter "
-                "issues."
-            )
+        return challenge
+
+    @_profiled("cleanup")
+    def cleanup_challenge(self, domain: str, validation: str) -> None:
+        """
+        Delete the TXT record of a single challenge.
 
-        root_domain, name = resolve_challenge_domain(domain)
+        :param domain: the domain of the challenge
+        :param validation: the value of the TXT record
 
-        # check if there is already a dns challenge record for the domain
-        challenge_dns_records = client.get_all_dns_records(
-            domain=root_domain, record_type=DNSRecordType.TXT, subdomain=name
-        )
-        if any(record.content == validation for record in challenge_dns_records):
-            logging.warning(
-                "Challenge TXT record already exists for domain %s with value %s. Skipping record creation.",
-                domain,
-                validation,
-            )
-        else:
-            try:
-                client.create_dns_record(
-                    root_domain, DNSRecordType.TXT, validation, name=name
-                )
-            except Exception as e:
-                raise errors.PluginError(e)
+        :raise PluginError: if the TXT record can not be deleted or something goes wrong
+        """
 
-    def _cleanup(self, domain: str, validation_name: str, validation: str) -> None:
+        with self._metrics.timer("cleanup"):
+            self._cleanup(domain, "", validation)
+
+    def finish_session(self) -> None:
+        """
+        Export the metrics of the service since the previous session and start new metrics. Expired domain resolutions
+        are evicted, so that the metrics and the cache of a long-running service do not grow with every certificate.
         """
-        Delete the TXT record of the provided Porkbun domain.
 
-        :param domain: the Porkbun domain for which the TXT record will be deleted
-        :param validation_name: the value to validate the dns challenge
-        :param validation: the value for the TXT record
+        self._export_metrics()
+        self._metrics.reset()
+        self._resolution_cache.evict_expired()
 
-        :raise PluginError:  if the TXT record can not be deleted or something goes wrong
+    def stop_service(self) -> None:
+        """
+        Close the Porkbun API connections and export the metrics of the service.
         """
 
-        # get the record id with the TXT record
-        root_domain, name = resolve_challenge_domain(domain)
+        self._close_porkbun_client()
+        self._export_metrics()
 
-        challenge_dns_records = self._get_porkbun_client().get_all_dns_records(
-            domain=root_domain, record_type=DNSRecordType.TXT, subdomain=name
-        )
+    def plan(  # pylint: disable=too-many-locals
+        self, domains: list[str], validations: list[str | None] | None = None
+    ) -> Plan:
+        """
+        Plan the DNS changes of challenges without changing any records. The challenge domains are resolved and the
+        existing TXT records are listed like perform does, then the records which would be created and deleted are
+        determined per root domain and the wall time of the run is estimated with the measured API latency.
+
+        :param domains: the domains of the challenges
+        :param validations: the values of the challenges in the same order, None if they are not known yet, e.g.
+                            before the certificates are ordered
+        :return: the Plan object, domains and root domains which could not be resolved or listed are reported as
+                 failures
+        """
+
+        # pylint: disable=import-outside-toplevel
+        from concurrent.futures import ThreadPoolExecutor
 
-        record_id = None
-        for record in challenge_dns_records:
-            if record.content == validation:
-                record_id = record.id
-                break
+        from certbot_dns_porkbun.cert import plan
 
-        if record_id is None:
-            logging.warning(
-                "No challenge TXT record found for domain %s with value %s",
-                domain,
-                validation,
+        self._setup_credentials()
+        if validations is None:
+            validations = [None] * len(domains)
+        keep = None
+        if self.conf("prune-stale-records"):
+            keep = {validation for validation in validations if validation is not None}
+
+        workers = max(1, self.conf("max-concurrency"))
+        failures = []
+        challenges_by_zone = {}
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            resolutions = [
+                executor.submit(self._resolve_challenge_domain, domain)
+                for domain in domains
+            ]
+        resolve_seconds = time.perf_counter() - start
+        for domain, validation, future in zip(domains, validations, resolutions):
+            try:
+                root_domain, name = future.result()
+            except Exception as e:  # pylint: disable=broad-exception-caught
+                logger.debug("Planning %s failed", domain, exc_info=True)
+                failures.append(f"{domain}: {e}")
+                continue
+            challenges_by_zone.setdefault(root_domain, []).append(
+                ChallengeRecord(domain, root_domain, name, validation)
             )
-        elif not self._get_porkbun_client().delete_dns_record(root_domain, record_id):
-            raise errors.PluginError(f"TXT for domain {root_domain} was not deleted")
 
-    def _get_porkbun_client(self) -> PKBClient:
+        journal = self._get_journal()
+        orphaned = journal.entries_by_zone() if journal is not None else {}
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = {
+                root_domain: executor.submit(
+                    self._plan_zone,
+                    root_domain,
+                    challenges_by_zone.get(root_domain, []),
+                    orphaned.get(root_domain, []),
+                    keep,
+                )
+                for root_domain in [*challenges_by_zone, *orphaned]
+            }
+
+        zones = []
+        for root_domain, future in futures.items():
+            try:
+                zones.append(future.result())
+            except Exception as e:  # pylint: disable=broad-exception-caught
+                logger.debug(
+                    "Planning root domain %s failed", root_domain, exc_info=True
+                )
+                failures.append(f"{root_domain}: {e}")
+
+        return plan.Plan(zones, failures, *self._estimate_plan(zones, resolve_seconds))
+
+    def _plan_zone(  # pylint: disable=too-many-locals
+        self,
+        root_domain: str,
+        challenges: list[ChallengeRecord],
+        orphaned: list[JournalEntry],
+        keep: set[str] | None,
+    ) -> ZonePlan:
         """
-        Create a new PKBClient with the provided API key and secret.
+        Plan the DNS changes of a single root domain like _perform_zone and _cleanup_zone would make them.
 
-        :return: the created PKBClient object
+        :param root_domain: the Porkbun domain of the challenges
+        :param challenges: the challenge records of the root domain
+        :param orphaned: the journal entries of the root domain left behind by interrupted runs
+        :param keep: the values of all challenges of the run if stale records are deleted, otherwise None
+        :return: the ZonePlan object
+
+        :raise PluginError: if the existing TXT records can not be retrieved
         """
 
-        key = self.conf("key") or self.credentials.conf("key")
-        secret = self.conf("secret") or self.credentials.conf("secret")
+        from certbot_dns_porkbun.cert import plan  # pylint: disable=import-outside-toplevel
 
-        return PKBClient(key, secret)
+        # with the journal, the records are created without listing and deleted by their ID, unless stale records
+        # are deleted
+        records = []
+        listed = bool(challenges) and self._lists_existing_records(
+            self._get_journal(), keep
+        )
+        if listed:
+            records = self._get_challenge_dns_records(
+                self._get_porkbun_client(root_domain), root_domain, challenges
+            )
+        existing_values = {(name, record.content) for name, record in records}
+
+        creates, existing = [], []
+        seen = set(existing_values)
+        for challenge in challenges:
+            key = (challenge.name, challenge.validation)
+            if challenge.validation is not None and key in seen:
+                existing.append(challenge)
+                continue
+            seen.add(key)
+            creates.append(challenge)
+
+        stale = self._select_stale_records(records, keep)
+
+        # the cleanup deletes the created records and the existing records of the challenges once
+        deleted = {
+            (challenge.name, challenge.validation)
+            for challenge in existing
+            if (challenge.name, challenge.validation) in existing_values
+        }
+
+        return plan.ZonePlan(
+            root_domain,
+            creates,
+            existing,
+            stale,
+            orphaned,
+            lists=int(listed),
+            cleanup_lists=int(listed),
+            cleanup_deletes=len(creates) + len(deleted),
+        )
+
+    def _estimate_plan(  # pylint: disable=too-many-locals
+        self, zones: list[ZonePlan], resolve_seconds: float
+    ) -> tuple[dict[str, float], str]:
+        """
+        Estimate the wall time of the phases of a planned run with the latency of the API calls made while planning
+        and the configured concurrency, rate limit, backend and propagation time.
+
+        :param zones: the plans of the root domains
+        :param resolve_seconds: the measured seconds to resolve the challenge domains
+        :return: a tuple of the estimated seconds per phase and the description of the settings
+        """
+
+        # pylint: disable=import-outside-toplevel
+        from pkb_client.client import PKBClientException
+
+        from certbot_dns_porkbun.cert import plan
+
+        api_timings = [
+            timing
+            for phase, timing in self._metrics.summary()["phases"].items()
+            if phase.startswith("api:")
+        ]
+        if not api_timings and zones:
+            try:
+                self._get_porkbun_client(zones[0].root_domain).ping()
+            except PKBClientException as e:
+                raise errors.PluginError(e) from e
+            api_timings = [self._metrics.summary()["phases"]["api:ping"]]
+        latency = 0.0
+        if api_timings:
+            latency = sum(timing["seconds"] for timing in api_timings) / sum(
+                timing["count"] for timing in api_timings
+            )
+
+        concurrency = max(1, self.conf("max-concurrency"))
+        rate_limit = self.conf("rate-limit")
+        asyncio_backend = self._uses_asyncio()
+
+        def estimate(zone_steps: list[list[int]], concurrent: bool) -> float:
+            return plan.estimate_api_seconds(
+                zone_steps,
+                latency,
+                concurrency,
+                rate_limit,
+                concurrent_steps=concurrent,
+                connections=concurrency if concurrent else 0,
+            )
+
+        estimates = {
+            "resolve": resolve_seconds,
+            # the journal is always swept by the thread pool
+            "sweep": estimate([[len(zone.orphaned)] for zone in zones], False),
+            "perform": estimate(
+                [zone.perform_steps for zone in zones], asyncio_backend
+            ),
+            "propagation": float(self.conf("propagation-seconds")),
+            "cleanup": estimate(
+                [zone.cleanup_steps for zone in zones], asyncio_backend
+            ),
+        }
+
+        rate = (
+            f"{rate_limit:g} API calls per second"
+            if rate_limit > 0
+            else "no rate limit"
+        )
+        propagation = "at most " if self.conf("propagation-check") else ""
+        settings = (
+            f"{concurrency} concurrent root domains, {rate}, {latency:.3f}s per API call, "
+            f"{propagation}{self.conf('propagation-seconds')}s propagation and the "
+            f"{self.conf('backend')} backend"
+        )
+        return estimates, settings
+
+    def _export_metrics(self) -> None:
+        """
+        Write the metrics of the run to the configured JSON and Prometheus textfile paths.
+        Failures are only logged, because the metrics must not break the certificate issuance.
+        """
+
+        self._metrics.set_counter("resolution_cache_hits", self._resolution_cache.hits)
+        self._metrics.set_counter(
+            "resolution_cache_misses", self._resolution_cache.misses
+        )
+
+        summary = self._metrics.summary()
+        logger.debug(
+            "Porkbun authenticator phase timings: %s",
+            ", ".join(
+                f"{phase} {timing['seconds']:.3f}s ({timing['count']}x)"
+                for phase, timing in summary["phases"].items()
+            ),
+        )
+
+        for option, write in (
+            ("metrics-json", self._metrics.write_json),
+            ("metrics-prometheus", self._metrics.write_prometheus),
+        ):
+            path = self.conf(option)
+            if not path:
+                continue
+            try:
+                write(path)
+            except OSError as e:
+                logger.warning("Could not write the metrics to %s: %s", path, e)
+
+    def _run_per_zone(
+        self,
+        action: Callable[[str, list], None],
+        challenges_by_zone: dict[str, list],
+    ) -> None:
+        """
+        Run an action for the challenges of each root domain with at most max-concurrency root domains in parallel.
+        All root domains are processed even if the action fails for some of them.
+
+        :param action: the action to run with the root domain and its challenge records or journal entries
+        :param challenges_by_zone: mapping of the root domains to their challenge records or journal entries
+
+        :raise PluginError: with the errors of all failed root domains in the order of the root domains
+        """
+
+        from concurrent.futures import ThreadPoolExecutor  # pylint: disable=import-outside-toplevel
+
+        max_workers = max(1, min(self.conf("max-concurrency"), len(challenges_by_zone)))
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = {
+                root_domain: executor.submit(
+                    self._timed_zone_action, action, root_domain, challenges
+                )
+                for root_domain, challenges in challenges_by_zone.items()
+            }
+
+        failures = []
+        for root_domain, future in futures.items():
+            try:
+                future.result()
+            except Exception as e:  # pylint: disable=broad-exception-caught
+                # the other root domains are still processed, so that all records are cleaned up
+                logger.debug("Root domain %s failed", root_domain, exc_info=True)
+                failures.append(f"{root_domain}: {e}")
+
+        if failures:
+            raise errors.PluginError(
+                "Challenge TXT records failed for root domains:\n" + "\n".join(failures)
+            )
+
+    def _timed_zone_action(
+        self,
+        action: Callable[..., None],
+        root_domain: str,
+        challenges: list,
+        **kwargs,
+    ) -> None:
+        """
+        Run an action for the challenges of a root domain and record its duration for the root domain.
+
+        :param action: the action to run with the root domain and its challenge records or journal entries
+        :param root_domain: the root domain
+        :param challenges: the challenge records or journal entries of the root domain
+        :param kwargs: additional keyword arguments of the action
+        """
+
+        with self._metrics.timer(action.__name__.lstrip("_"), zone=root_domain):
+            action(root_domain, challenges, **kwargs)
+
+    def _perform_pipelined(  # pylint: disable=too-many-locals
+        self,
+        achalls: list,
+        tracker: PropagationTracker | None,
+        keep: set[str] | None = None,
+    ) -> tuple[list[ChallengeRecord], list[ChallengeRecord]]:
+        """
+        Resolve the challenge domains, create the TXT records per root domain and start their propagation checks in
+        a pipeline, so that the records of the first root domains are created and checked while the remaining
+        domains are still resolved. At most max-concurrency domains are resolved and root domains processed in
+        parallel.
+
+        :param achalls: the annotated DNS-01 challenges to perform
+        :param tracker: the tracker to start the propagation checks with, None without propagation check
+        :param keep: the values of all challenges of the run if stale records are deleted, otherwise None
+        :return: a tuple of all created challenge records and those whose propagation could not be tracked
+
+        :raise PluginError: with the errors of all failed domains and root domains in the order of the challenges
+        """
+
+        # pylint: disable=import-outside-toplevel
+        from certbot_dns_porkbun.cert import pipeline
+
+        suffix_cache_dir = self.conf("suffix-cache-dir")
+        domain_roots = [
+            split_domain(
+                _get_achall_domain(achall).replace("*", "").lstrip("."),
+                suffix_cache_dir,
+            )[0]
+            for achall in achalls
+        ]
+        unresolved = {}
+        for domain_root in domain_roots:
+            unresolved[domain_root] = unresolved.get(domain_root, 0) + 1
+        batcher = _ZoneBatcher(unresolved)
+
+        def resolve(item: tuple[int, object]) -> list[tuple[int, str, ChallengeRecord]]:
+            index, achall = item
+            domain = _get_achall_domain(achall)
+            root_domain, name = self._resolve_challenge_domain(domain, provision=True)
+            validation = achall.validation(achall.account_key)
+            return [
+                (
+                    index,
+                    domain_roots[index],
+                    ChallengeRecord(domain, root_domain, name, validation),
+                )
+            ]
+
+        def write(batch: _ZoneBatch) -> list[_ZoneBatch]:
+            self._timed_zone_action(
+                self._perform_zone, batch.root_domain, batch.challenges, keep=keep
+            )
+            return [batch]
+
+        untracked = []
+
+        def track(batch: _ZoneBatch) -> list[_ZoneBatch]:
+            if not self._track_propagation(tracker, batch.challenges):
+                untracked.extend(batch.challenges)
+            return [batch]
+
+        workers = max(1, min(self.conf("max-concurrency"), len(achalls)))
+        stages = [
+            pipeline.Stage("resolve", resolve, workers),
+            pipeline.Stage("batch", batcher.add, flush=batcher.flush),
+            pipeline.Stage("write", write, workers),
+        ]
+        if tracker is not None:
+            stages.append(pipeline.Stage("track", track))
+
+        try:
+            batches = pipeline.run_pipeline(enumerate(achalls), stages)
+        except pipeline.PipelineError as e:
+            failures = []
+            for failure in e.failures:
+                if failure.stage == "resolve":
+                    index, achall = failure.item
+                    label = _get_achall_domain(achall)
+                else:
+                    index, label = failure.item.index, failure.item.root_domain
+                failures.append((index, f"{label}: {failure.error}"))
+            messages = "\n".join(message for _, message in sorted(failures))
+            raise errors.PluginError(
+                f"Challenge TXT records failed for root domains:\n{messages}"
+            ) from e
+
+        challenges = [
+            challenge
+            for batch in sorted(batches, key=lambda batch: batch.index)
+            for challenge in batch.challenges
+        ]
+        return challenges, untracked
+
+    def _create_propagation_tracker(self) -> PropagationTracker | None:
+        """
+        Create the tracker polling the nameservers for the created records if the propagation check is enabled.
+
+        :return: the PropagationTracker object or None without propagation check
+        """
+
+        if not self.conf("propagation-check"):
+            return None
+
+        from certbot_dns_porkbun.cert import (  # pylint: disable=import-outside-toplevel
+            propagation,
+        )
+
+        return propagation.PropagationTracker(
+            self.conf("propagation-poll-interval"), self.conf("propagation-quorum")
+        )
+
+    def _track_propagation(
+        self, tracker: PropagationTracker, challenges: list[ChallengeRecord]
+    ) -> bool:
+        """
+        Start the propagation checks of created challenge records.
+
+        :param tracker: the tracker polling the nameservers
+        :param challenges: the created challenge records of a root domain
+        :return: False if the nameservers to check could not be determined
+        """
+
+        expected = {}
+        for challenge in challenges:
+            name, root_domain = challenge.name, challenge.root_domain
+            fqdn = f"{name}.{root_domain}" if name else root_domain
+            expected.setdefault(fqdn, set()).add(challenge.validation)
+
+        try:
+            nameservers = self._get_propagation_nameservers(challenges[0].root_domain)
+        except errors.PluginError as e:
+            logger.warning(
+                "Could not determine the nameservers to check the propagation: %s", e
+            )
+            return False
+
+        for fqdn, values in expected.items():
+            tracker.add(fqdn, values, nameservers, self.conf("propagation-seconds"))
+        return True
+
+    def _wait_for_tracker(
+        self, tracker: PropagationTracker, untracked: list[ChallengeRecord]
+    ) -> None:
+        """
+        Wait until the tracked challenge records are propagated. If the propagation of some records could not be
+        tracked, the full propagation time is waited.
+
+        :param tracker: the tracker polling the nameservers
+        :param untracked: the challenge records whose propagation could not be tracked
+        """
+
+        with self._metrics.timer("propagation"):
+            propagation_seconds = self.conf("propagation-seconds")
+            if untracked:
+                tracker.cancel()
+                display_util.notify(
+                    f"Waiting {propagation_seconds} seconds for DNS changes to propagate"
+                )
+                time.sleep(propagation_seconds)
+                return
+
+            display_util.notify(
+                f"Waiting up to {propagation_seconds} seconds for DNS changes to propagate"
+            )
+            tracker.wait()
+
+    def _group_challenges(
+        self, achalls: list, allow_expired: bool = False
+    ) -> dict[str, list[ChallengeRecord]]:
+        """
+        Resolve the challenge root domain of the annotated challenges and group them by it.
+
+        :param achalls: the annotated DNS-01 challenges
+        :param allow_expired: use cached resolutions even if their TTL is expired
+        :return: mapping of the root domains to their challenge records in the order of the challenges
+        """
+
+        challenges_by_zone = {}
+        for achall in achalls:
+            domain = _get_achall_domain(achall)
+            root_domain, name = self._resolve_challenge_domain(domain, allow_expired)
+            challenges_by_zone.setdefault(root_domain, []).append(
+                ChallengeRecord(
+                    domain, root_domain, name, achall.validation(achall.account_key)
+                )
+            )
+
+        return challenges_by_zone
+
+    def wait_for_propagation(self, challenges: list[ChallengeRecord]) -> None:
+        """
+        Wait until the TXT records of the provided challenges are propagated.
+        Without the propagation check, the full propagation time is waited. Otherwise, the nameservers are polled
+        until they serve all records, at most for the propagation time.
+
+        :param challenges: the challenge records to wait for
+        """
+
+        with self._metrics.timer("propagation"):
+            propagation_seconds = self.conf("propagation-seconds")
+
+            if self.conf("propagation-check") and challenges:
+                from certbot_dns_porkbun.cert import (  # pylint: disable=import-outside-toplevel
+                    propagation,
+                )
+
+                expected = {}
+                nameservers = {}
+                try:
+                    for challenge in challenges:
+                        name, root_domain = challenge.name, challenge.root_domain
+                        fqdn = f"{name}.{root_domain}" if name else root_domain
+                        expected.setdefault(fqdn, set()).add(challenge.validation)
+                        if fqdn not in nameservers:
+                            nameservers[fqdn] = self._get_propagation_nameservers(
+                                root_domain
+                            )
+                except errors.PluginError as e:
+                    logger.warning(
+                        "Could not determine the nameservers to check the propagation: %s",
+                        e,
+                    )
+                else:
+                    display_util.notify(
+                        f"Waiting up to {propagation_seconds} seconds for DNS changes to propagate"
+                    )
+                    propagation.wait_for_propagation(
+                        expected,
+                        nameservers,
+                        timeout=propagation_seconds,
+                        interval=self.conf("propagation-poll-interval"),
+                        quorum=self.conf("propagation-quorum"),
+                    )
+                    return
+
+            display_util.notify(
+                f"Waiting {propagation_seconds} seconds for DNS changes to propagate"
+            )
+            time.sleep(propagation_seconds)
+
+    def _get_propagation_nameservers(self, root_domain: str) -> list[tuple[str, int]]:
+        """
+        Get the nameservers which are checked for the propagation of the challenge records of a root domain.
+
+        :param root_domain: the root domain of the challenge records
+        :return: a list of (address, port) tuples
+
+        :raise PluginError: if the configured nameservers are invalid or the nameservers of the zone can not be resolved
+        """
+
+        # pylint: disable=import-outside-toplevel
+        import dns.exception
+
+        from certbot_dns_porkbun.cert import propagation
+
+        if self.conf("propagation-nameservers"):
+            return propagation.parse_nameservers(self.conf("propagation-nameservers"))
+
+        try:
+            return self._get_authoritative_resolver().zone_nameservers(root_domain)
+        except (dns.exception.DNSException, OSError) as e:
+            raise errors.PluginError(
+                f"Nameservers of {root_domain} could not be resolved: {e}"
+            ) from e
+
+    def _setup_credentials(self) -> None:
+        """
+        Setup the Porkbun accounts from the cli parameters and the credentials file. The key and secret of the cli
+        overwrite the default account of the credentials file.
+
+        :raise PluginError: if the TTL is out of range, the credentials file is invalid or the key or secret of the
+                            default account is missing
+        """
+
+        # pylint: disable=import-outside-toplevel
+        from certbot_dns_porkbun.cert.accounts import (
+            DEFAULT_ACCOUNT,
+            Account,
+            AccountRouter,
+            load_accounts,
+        )
+
+        ttl = self.conf("ttl")
+        if not MIN_RECORD_TTL <= ttl <= MAX_RECORD_TTL:
+            raise errors.PluginError(
+                f"The TTL of the challenge TXT records must be between {MIN_RECORD_TTL} and {MAX_RECORD_TTL} "
+                f"seconds, not {ttl}"
+            )
+
+        key, secret = self.conf("key"), self.conf("secret")
+
+        # If both cli params are provided we do not need a credentials file
+        if key and secret:
+            self._accounts = AccountRouter(Account(DEFAULT_ACCOUNT, key, secret), [])
+            return
+
+        self._configure_file(
+            "credentials", "Absolute path to Porkbun credentials INI file"
+        )
+        accounts = load_accounts(self.conf("credentials"), self.dest)
+        if key or secret:
+            default = accounts.default
+            key = key or (default.key if default else None)
+            secret = secret or (default.secret if default else None)
+            if not key or not secret:
+                raise errors.PluginError(
+                    "Missing Porkbun API key or secret of the default account"
+                )
+            accounts = accounts.with_default(Account(DEFAULT_ACCOUNT, key, secret))
+        self._accounts = accounts
+
+    def _perform(self, domain: str, validation_name: str, validation: str) -> None:
+        """
+        Add the validation DNS TXT record to the provided Porkbun domain.
+        Moreover, it resolves the canonical name (CNAME) for the provided domain with the acme txt prefix.
+
+        :param domain: the Porkbun domain for which a TXT record will be created
+        :param validation_name: the value to validate the dns challenge
+        :param validation: the value for the TXT record
+
+        :raise PluginError: if the TXT record can not be set or something goes wrong
+        """
+
+        self._warn_short_propagation_seconds()
+
+        root_domain, name = self._resolve_challenge_domain(domain, provision=True)
+        self._perform_zone(
+            root_domain, [ChallengeRecord(domain, root_domain, name, validation)]
+        )
+
+    def _cleanup(self, domain: str, validation_name: str, validation: str) -> None:
+        """
+        Delete the TXT record of the provided Porkbun domain.
+
+        :param domain: the Porkbun domain for which the TXT record will be deleted
+        :param validation_name: the value to validate the dns challenge
+        :param validation: the value for the TXT record
+
+        :raise PluginError:  if the TXT record can not be deleted or something goes wrong
+        """
+
+        root_domain, name = self._resolve_challenge_domain(domain, allow_expired=True)
+        self._cleanup_zone(
+            root_domain, [ChallengeRecord(domain, root_domain, name, validation)]
+        )
+
+    def _resolve_challenge_domain(
+        self, domain: str, allow_expired: bool = False, provision: bool = False
+    ) -> tuple[str, str]:
+        """
+        Resolve the challenge root domain and subdomain of the provided domain with the configured options.
+        The resolution is cached for the TTL of the DNS answers.
+
+        :param domain: the domain to get the challenge root domain and subdomain from
+        :param allow_expired: use a cached resolution even if its TTL is expired, so that the cleanup targets the
+                              same records as the perform
+        :param provision: create the missing alias CNAME record of the challenge name if enabled
+        :return: a tuple of the root domain and subdomain
+        """
+
+        resolution = self._resolution_cache.get(domain, allow_expired)
+        if resolution is None:
+            with self._metrics.timer("resolve", domain=domain):
+                root_domain, name, ttl = resolve_challenge_domain_with_ttl(
+                    domain,
+                    self.conf("suffix-cache-dir"),
+                    self._get_dns_resolver(),
+                )
+            resolution, alias = self._route_to_alias(
+                domain, (root_domain, name), provision
+            )
+            if alias is not None:
+                self._provision_alias(alias)
+            self._resolution_cache.put(domain, resolution, ttl)
+
+        return resolution
+
+    def _route_to_alias(
+        self, domain: str, resolution: tuple[str, str], provision: bool
+    ) -> tuple[tuple[str, str], ChallengeAlias | None]:
+        """
+        Check the CNAME record of a challenge name into the validation zone in the challenge alias mode. Challenge
+        names without CNAME record are routed to the validation zone if the missing CNAME records are provisioned,
+        otherwise they are reported and keep their own zone.
+
+        :param domain: the domain of the challenge
+        :param resolution: the resolved root domain and subdomain of the challenge name
+        :param provision: whether the missing CNAME record may be created
+        :return: a tuple of the root domain and subdomain to create the TXT record in and the alias to provision or
+                 None
+        """
+
+        from certbot_dns_porkbun.cert.alias import get_challenge_alias  # pylint: disable=import-outside-toplevel
+
+        alias_zone = self.conf("challenge-alias")
+        if not alias_zone:
+            return resolution, None
+
+        alias = get_challenge_alias(_get_challenge_name(domain), alias_zone)
+        root_domain, name = resolution
+        fqdn = f"{name}.{root_domain}" if name else root_domain
+        if fqdn == alias.target:
+            return resolution, None
+
+        if fqdn != alias.challenge_name:
+            logger.warning(
+                "Challenge name %s is an alias of %s instead of %s in the validation zone, the TXT record is "
+                "created there",
+                alias.challenge_name,
+                fqdn,
+                alias.target,
+            )
+            return resolution, None
+
+        if not (provision and self.conf("provision-aliases")):
+            logger.warning(
+                "Challenge name %s has no CNAME record to %s in the validation zone, the TXT record is created in "
+                "the zone of the domain. Create the CNAME record or use --%s to create it.",
+                alias.challenge_name,
+                alias.target,
+                self.option_name("provision-aliases"),
+            )
+            return resolution, None
+
+        return split_domain(alias.target, self.conf("suffix-cache-dir")), alias
+
+    def _provision_alias(self, alias: ChallengeAlias) -> None:
+        """
+        Create the CNAME record of a challenge name into the validation zone once per run.
+
+        :param alias: the alias of the challenge name
+
+        :raise PluginError: if the CNAME record can not be created
+        """
+
+        from pkb_client.client import (  # pylint: disable=import-outside-toplevel
+            DNSRecordType,
+            PKBClientException,
+        )
+
+        claimed = self._claim_alias(alias)
+        if claimed is None:
+            return
+        root_domain, name = claimed
+        try:
+            self._get_porkbun_client(root_domain).create_dns_record(
+                root_domain, DNSRecordType.CNAME, alias.target, name=name
+            )
+        except PKBClientException as e:
+            self._report_alias_provisioning(alias, e)
+        else:
+            self._report_alias_provisioning(alias)
+
+    def _claim_alias(self, alias: ChallengeAlias) -> tuple[str, str] | None:
+        """
+        Claim the creation of the CNAME record of a challenge name before its API call, so that concurrent
+        challenges of the same name, e.g. example.com and *.example.com, do not create the record twice.
+
+        :param alias: the alias of the challenge name
+        :return: the root domain and subdomain of the challenge name or None if the record is already claimed
+        """
+
+        with self._alias_lock:
+            if alias.challenge_name in self._provisioned_aliases:
+                return None
+            self._provisioned_aliases.add(alias.challenge_name)
+        return split_domain(alias.challenge_name, self.conf("suffix-cache-dir"))
+
+    def _report_alias_provisioning(
+        self, alias: ChallengeAlias, error: Exception | None = None
+    ) -> None:
+        """
+        Log the creation of the CNAME record of a challenge name or release its claim if it could not be created, so
+        that a later challenge retries it.
+
+        :param alias: the alias of the challenge name
+        :param error: the error if the CNAME record could not be created
+
+        :raise PluginError: if the CNAME record could not be created
+        """
+
+        if error is not None:
+            with self._alias_lock:
+                self._provisioned_aliases.discard(alias.challenge_name)
+            raise errors.PluginError(
+                f"Challenge alias CNAME record {alias.challenge_name} could not be created: {error}"
+            ) from error
+
+        logger.info(
+            "Created challenge alias CNAME record %s to %s",
+            alias.challenge_name,
+            alias.target,
+        )
+
+    def _perform_zone(
+        self,
+        root_domain: str,
+        challenges: list[ChallengeRecord],
+        keep: set[str] | None = None,
+    ) -> None:
+        """
+        Add the missing validation DNS TXT records of a single root domain.
+
+        :param root_domain: the Porkbun domain in which the TXT records will be created
+        :param challenges: the challenge records of the root domain
+        :param keep: the values of all challenges of the run, other TXT records of the challenge names are deleted
+                     as stale after the records are created. None keeps all existing records.
+
+        :raise PluginError: if a TXT record can not be set or something goes wrong
+        """
+
+        from pkb_client.client import (  # pylint: disable=import-outside-toplevel
+            DNSRecordType,
+            PKBClientException,
+        )
+
+        client = self._get_porkbun_client(root_domain)
+        journal = self._get_journal()
+
+        records = []
+        if self._lists_existing_records(journal, keep):
+            records = self._get_challenge_dns_records(client, root_domain, challenges)
+        pending = self._select_missing_challenges(challenges, records)
+
+        record_ids = []
+        try:
+            for challenge in pending:
+                record_ids.append(
+                    client.create_dns_record(
+                        root_domain,
+                        DNSRecordType.TXT,
+                        challenge.validation,
+                        name=challenge.name,
+                        ttl=self.conf("ttl"),
+                    )
+                )
+        except PKBClientException as e:
+            raise errors.PluginError(e) from e
+        finally:
+            self._journal_created_records(journal, root_domain, pending, record_ids)
+
+        for record in self._select_stale_records(records, keep):
+            try:
+                client.delete_dns_record(root_domain, record.id)
+            except PKBClientException as e:
+                self._report_stale_record_deletion(record, e)
+            else:
+                self._report_stale_record_deletion(record)
+
+    @staticmethod
+    def _lists_existing_records(
+        journal: RecordJournal | None, keep: set[str] | None
+    ) -> bool:
+        """
+        Check whether the existing TXT records of the challenge names are listed before the records are created.
+        With the journal, no challenge records of previous runs are left after the sweep, only the stale records of
+        other clients need to be listed.
+
+        :param journal: the journal of the created records, None if the journal is disabled
+        :param keep: the values of all challenges of the run if stale records are deleted, otherwise None
+        :return: True if the existing records are listed
+        """
+
+        return journal is None or keep is not None
+
+    @staticmethod
+    def _select_missing_challenges(
+        challenges: list[ChallengeRecord], records: list[tuple[str, DNSRecord]]
+    ) -> list[ChallengeRecord]:
+        """
+        Select the challenges whose TXT records do not exist yet, each (subdomain, content) tuple once.
+
+        :param challenges: the challenge records of the root domain
+        :param records: list of (subdomain, record) tuples of the existing TXT records of the challenge names
+        :return: the challenge records to create in the order of the challenges
+        """
+
+        existing = {(name, record.content) for name, record in records}
+        missing = []
+        for challenge in challenges:
+            if (challenge.name, challenge.validation) in existing:
+                logger.warning(
+                    "Challenge TXT record already exists for domain %s with value %s. Skipping record creation.",
+                    challenge.domain,
+                    challenge.validation,
+                )
+                continue
+            existing.add((challenge.name, challenge.validation))
+            missing.append(challenge)
+        return missing
+
+    @staticmethod
+    def _journal_created_records(
+        journal: RecordJournal | None,
+        root_domain: str,
+        challenges: list[ChallengeRecord],
+        results: list,
+    ) -> Exception | None:
+        """
+        Add the created TXT records of a root domain to the journal and save it.
+
+        :param journal: the journal of the created records, None if the journal is disabled
+        :param root_domain: the Porkbun domain of the records
+        :param challenges: the challenge records in the order of the results
+        :param results: the IDs of the created records or the errors of the failed API calls
+        :return: the first error of the results or None
+        """
+
+        error = None
+        for challenge, result in zip(challenges, results):
+            if isinstance(result, Exception):
+                error = error or result
+            elif journal is not None:
+                journal.add(result, root_domain, challenge.name, challenge.validation)
+        if journal is not None:
+            journal.save()
+        return error
+
+    @staticmethod
+    def _select_stale_records(
+        records: list[tuple[str, DNSRecord]], keep: set[str] | None
+    ) -> list[DNSRecord]:
+        """
+        Select the existing TXT records whose values are not needed by the current run, so that the TXT record sets
+        stay small. Failed deletions are only logged, because the stale records do not prevent the validation.
+
+        :param records: list of (subdomain, record) tuples of the existing TXT records of the challenge names
+        :param keep: the values of all challenges of the run if stale records are deleted, otherwise None
+        :return: the stale records to delete, empty if stale records are kept
+        """
+
+        if keep is None:
+            return []
+        return [record for _, record in records if record.content not in keep]
+
+    def _report_stale_record_deletion(
+        self, record: DNSRecord, error: Exception | None = None
+    ) -> None:
+        """
+        Log the deletion of a stale challenge TXT record and count it if it was deleted.
+
+        :param record: the stale record
+        :param error: the error if the record could not be deleted
+        """
+
+        if error is not None:
+            logger.warning(
+                "Could not delete stale challenge TXT record %s with value %s: %s",
+                record.name,
+                record.content,
+                error,
+            )
+            return
+
+        logger.info(
+            "Deleted stale challenge TXT record %s with value %s",
+            record.name,
+            record.content,
+        )
+        self._metrics.count("stale_records_deleted")
+
+    def _get_pruned_values(self, achalls: list) -> set[str] | None:
+        """
+        Get the values of the challenges of the run which are kept if stale records are deleted.
+
+        :param achalls: the annotated DNS-01 challenges of the run
+        :return: the values of all challenges or None if stale records are kept
+        """
+
+        if not self.conf("prune-stale-records"):
+            return None
+        return {achall.validation(achall.account_key) for achall in achalls}
+
+    def _cleanup_zone(
+        self, root_domain: str, challenges: list[ChallengeRecord]
+    ) -> None:
+        """
+        Delete the validation DNS TXT records of a single root domain.
+
+        :param root_domain: the Porkbun domain in which the TXT records will be deleted
+        :param challenges: the challenge records of the root domain
+
+        :raise PluginError: if a TXT record can not be deleted or something goes wrong
+        """
+
+        from pkb_client.client import PKBClientException  # pylint: disable=import-outside-toplevel
+
+        client = self._get_porkbun_client(root_domain)
+        journal = self._get_journal()
+
+        entries, unjournaled = self._find_journal_entries(
+            journal, root_domain, challenges
+        )
+        records = (
+            self._get_challenge_dns_records(client, root_domain, unjournaled)
+            if unjournaled
+            else []
+        )
+        deletions = self._collect_deletions(challenges, entries, records)
+
+        # delete all records of the root domain even if single deletions fail
+        results = []
+        for _, record_id in deletions:
+            try:
+                results.append(client.delete_dns_record(root_domain, record_id))
+            except PKBClientException as e:
+                results.append(e)
+
+        failures = self._journal_deleted_records(
+            journal, root_domain, entries, deletions, results
+        )
+        if failures:
+            raise errors.PluginError("\n".join(failures))
+
+    @staticmethod
+    def _collect_deletions(
+        challenges: list[ChallengeRecord],
+        entries: dict[tuple[str, str], JournalEntry],
+        records: list[tuple[str, DNSRecord]],
+    ) -> list[tuple[tuple[str, str], str]]:
+        """
+        Collect the IDs of the challenge records to delete. A create API call retried after a lost response may have
+        left duplicates of a record, so all IDs with the same subdomain and content are collected.
+
+        :param challenges: the challenge records of the root domain
+        :param entries: the journal entries of the created records by their (subdomain, content) tuples
+        :param records: list of (subdomain, record) tuples of the listed TXT records of the challenge names
+        :return: list of the (subdomain, content) tuples and IDs of the records to delete
+        """
+
+        record_ids = {key: [entry.record_id] for key, entry in entries.items()}
+        for name, record in records:
+            ids = record_ids.setdefault((name, record.content), [])
+            if record.id not in ids:
+                ids.append(record.id)
+
+        deletions = []
+        for challenge in challenges:
+            key = (challenge.name, challenge.validation)
+            ids = record_ids.pop(key, None)
+            if not ids:
+                logger.warning(
+                    "No challenge TXT record found for domain %s with value %s",
+                    challenge.domain,
+                    challenge.validation,
+                )
+                continue
+            deletions.extend((key, record_id) for record_id in ids)
+        return deletions
+
+    @staticmethod
+    def _journal_deleted_records(
+        journal: RecordJournal | None,
+        root_domain: str,
+        entries: dict[tuple[str, str], JournalEntry],
+        deletions: list[tuple[tuple[str, str], str]],
+        results: list,
+    ) -> list[str]:
+        """
+        Remove the journal entries of the deleted TXT records of a root domain and save the journal. Entries of
+        challenges with a failed deletion are kept for the sweep of the next run.
+
+        :param journal: the journal of the created records, None if the journal is disabled
+        :param root_domain: the Porkbun domain of the records
+        :param entries: the journal entries of the created records by their (subdomain, content) tuples
+        :param deletions: list of the (subdomain, content) tuples and IDs of the deleted records
+        :param results: the results of the delete API calls or their errors in the order of the deletions
+        :return: the errors of the failed deletions
+        """
+
+        failures = []
+        failed = set()
+        for (key, _), result in zip(deletions, results):
+            if isinstance(result, Exception):
+                failures.append(str(result))
+                failed.add(key)
+            elif not result:
+                failures.append(f"TXT for domain {root_domain} was not deleted")
+                failed.add(key)
+
+        if journal is not None:
+            for key, entry in entries.items():
+                if key not in failed:
+                    journal.remove(entry)
+            journal.save()
+        return failures
+
+    @staticmethod
+    def _find_journal_entries(
+        journal: RecordJournal | None,
+        root_domain: str,
+        challenges: list[ChallengeRecord],
+    ) -> tuple[dict[tuple[str, str], JournalEntry], list[ChallengeRecord]]:
+        """
+        Find the journal entries of the challenge records of a root domain. The records of the journal are deleted
+        by their ID, only the other records need to be listed.
+
+        :param journal: the journal of the created records, None if the journal is disabled
+        :param root_domain: the Porkbun domain of the challenges
+        :param challenges: the challenge records of the root domain
+        :return: a tuple of the journal entries of the created records by their (subdomain, content) tuples and the
+                 challenge records without journal entry
+        """
+
+        entries = {}
+        unjournaled = []
+        for challenge in challenges:
+            entry = (
+                journal.find(root_domain, challenge.name, challenge.validation)
+                if journal is not None
+                else None
+            )
+            if entry is None:
+                unjournaled.append(challenge)
+            else:
+                entries[(challenge.name, challenge.validation)] = entry
+        return entries, unjournaled
+
+    def _sweep_journal(self) -> None:
+        """
+        Delete the challenge TXT records which are left in the journal by interrupted previous runs.
+        Failures are only logged, because the records of the current run can still be created.
+        """
+
+        journal = self._get_journal()
+        if not journal:
+            return
+
+        entries_by_zone = journal.entries_by_zone()
+        logger.info(
+            "Deleting %d orphaned challenge TXT records of previous runs",
+            len(journal),
+        )
+        try:
+            with self._metrics.timer("sweep"):
+                self._run_per_zone(self._sweep_zone, entries_by_zone)
+        except errors.PluginError as e:
+            logger.warning("Could not delete all orphaned challenge TXT records: %s", e)
+
+    def _sweep_zone(self, root_domain: str, entries: list[JournalEntry]) -> None:
+        """
+        Delete the orphaned challenge TXT records of a single root domain by their ID.
+        Records which can not be deleted are kept in the journal for the next run, unless they no longer exist.
+
+        :param root_domain: the Porkbun domain of the orphaned TXT records
+        :param entries: the journal entries of the orphaned TXT records
+
+        :raise PluginError: if a TXT record can not be deleted because of a temporary error
+        """
+
+        # pylint: disable=import-outside-toplevel
+        from pkb_client.client import PKBClientException
+
+        from certbot_dns_porkbun.cert.api import (
+            CircuitOpenError,
+            RetryablePKBClientException,
+        )
+
+        client = self._get_porkbun_client(root_domain)
+        journal = self._get_journal()
+
+        failures = []
+        for entry in entries:
+            try:
+                client.delete_dns_record(root_domain, entry.record_id)
+            except (RetryablePKBClientException, CircuitOpenError) as e:
+                failures.append(str(e))
+                continue
+            except PKBClientException as e:
+                if not self._is_record_deleted(client, root_domain, entry.record_id):
+                    logger.warning(
+                        "Orphaned challenge TXT record %s of %s could not be deleted, it is kept in the journal: %s",
+                        entry.record_id,
+                        root_domain,
+                        e,
+                    )
+                    continue
+                logger.debug(
+                    "Orphaned challenge TXT record %s of %s was already deleted: %s",
+                    entry.record_id,
+                    root_domain,
+                    e,
+                )
+            journal.remove(entry)
+
+        journal.save()
+
+        if failures:
+            raise errors.PluginError("\n".join(failures))
+
+    @staticmethod
+    def _is_record_deleted(client: PKBClient, root_domain: str, record_id: str) -> bool:
+        """
+        Check whether a record which could not be deleted no longer exists, e.g. because it was deleted manually.
+
+        :param client: the Porkbun API client
+        :param root_domain: the Porkbun domain of the record
+        :param record_id: the ID of the record
+        :return: True if the record does not exist, False if it exists or the check failed
+        """
+
+        from pkb_client.client import PKBClientException  # pylint: disable=import-outside-toplevel
+
+        try:
+            return not client.get_dns_records(root_domain, record_id)
+        except PKBClientException:
+            return False
+
+    @staticmethod
+    def _get_challenge_dns_records(
+        client: PKBClient, root_domain: str, challenges: list[ChallengeRecord]
+    ) -> list[tuple[str, DNSRecord]]:
+        """
+        Retrieve the existing TXT records of the challenge names with a single API call.
+        A single challenge name is retrieved by name and type, multiple names by retrieving all records of the
+        root domain.
+
+        :param client: the Porkbun API client
+        :param root_domain: the Porkbun domain of the challenges
+        :param challenges: the challenge records of the root domain
+        :return: list of (subdomain, record) tuples of the TXT records of the challenge names
+        """
+
+        from pkb_client.client import (  # pylint: disable=import-outside-toplevel
+            DNSRecordType,
+            PKBClientException,
+        )
+
+        names = {challenge.name for challenge in challenges}
+        try:
+            if len(names) == 1:
+                records = client.get_all_dns_records(
+                    domain=root_domain,
+                    record_type=DNSRecordType.TXT,
+                    subdomain=next(iter(names)),
+                )
+            else:
+                records = client.get_dns_records(root_domain)
+        except PKBClientException as e:
+            raise errors.PluginError(e) from e
+        return _select_challenge_records(records, root_domain, names)
+
+    def _uses_asyncio(self) -> bool:
+        """
+        Check whether the asyncio backend is selected.
+
+        :return: True for the asyncio backend, False for the thread pool
+        """
+
+        return self.conf("backend") == BACKEND_ASYNCIO
+
+    def _run_async(self, coroutine):
+        """
+        Run a coroutine of the asyncio backend on the event loop of the run. The event loop is created on first use
+        and shared by perform and cleanup, so that the API connections are kept between them.
+
+        :param coroutine: the coroutine to run
+        :return: the result of the coroutine
+        """
+
+        import asyncio  # pylint: disable=import-outside-toplevel
+
+        if self._event_loop is None:
+            self._event_loop = asyncio.new_event_loop()
+        return self._event_loop.run_until_complete(coroutine)
+
+    async def _perform_async(  # pylint: disable=too-many-locals
+        self, achalls: list, keep: set[str] | None = None
+    ) -> list[ChallengeRecord]:
+        """
+        Resolve the challenge domains and create the TXT records per root domain with the asyncio backend like
+        _perform_pipelined. All domains are resolved before the records are created, each with at most
+        max-concurrency DNS queries and API calls in flight.
+
+        :param achalls: the annotated DNS-01 challenges to perform
+        :param keep: the values of all challenges of the run if stale records are deleted, otherwise None
+        :return: the created challenge records in the order of the challenges
+
+        :raise PluginError: with the errors of all failed domains and root domains in the order of the challenges
+        """
+
+        import asyncio  # pylint: disable=import-outside-toplevel
+
+        semaphore = asyncio.Semaphore(max(1, self.conf("max-concurrency")))
+
+        async def resolve(achall) -> ChallengeRecord:
+            domain = _get_achall_domain(achall)
+            async with semaphore:
+                root_domain, name = await self._resolve_challenge_domain_async(
+                    domain, provision=True
+                )
+            return ChallengeRecord(
+                domain, root_domain, name, achall.validation(achall.account_key)
+            )
+
+        async def write(root_domain: str, challenges: list[ChallengeRecord]) -> None:
+            async with semaphore:
+                with self._metrics.timer("perform_zone", zone=root_domain):
+                    await self._perform_zone_async(root_domain, challenges, keep)
+
+        failures = []
+        created = []
+        challenges_by_zone = {}
+        # position of the first challenge of each root domain to keep the order of the challenges in error messages
+        indexes = {}
+        results = await asyncio.gather(
+            *(resolve(achall) for achall in achalls), return_exceptions=True
+        )
+        for index, (achall, result) in enumerate(zip(achalls, results)):
+            if isinstance(result, Exception):
+                failures.append((index, f"{_get_achall_domain(achall)}: {result}"))
+                continue
+            created.append(result)
+            challenges_by_zone.setdefault(result.root_domain, []).append(result)
+            indexes.setdefault(result.root_domain, index)
+
+        results = await asyncio.gather(
+            *(
+                write(root_domain, challenges)
+                for root_domain, challenges in challenges_by_zone.items()
+            ),
+            return_exceptions=True,
+        )
+        for root_domain, result in zip(challenges_by_zone, results):
+            if isinstance(result, Exception):
+                failures.append((indexes[root_domain], f"{root_domain}: {result}"))
+
+        if failures:
+            messages = "\n".join(message for _, message in sorted(failures))
+            raise errors.PluginError(
+                f"Challenge TXT records failed for root domains:\n{messages}"
+            )
+
+        return created
+
+    async def _cleanup_async(self, achalls: list) -> None:
+        """
+        Delete the TXT records of the DNS-01 challenges per root domain with the asyncio backend.
+
+        :param achalls: the annotated DNS-01 challenges to clean up
+
+        :raise PluginError: with the errors of all failed root domains in the order of the root domains
+        """
+
+        import asyncio  # pylint: disable=import-outside-toplevel
+
+        semaphore = asyncio.Semaphore(max(1, self.conf("max-concurrency")))
+
+        async def resolve(achall) -> ChallengeRecord:
+            domain = _get_achall_domain(achall)
+            async with semaphore:
+                root_domain, name = await self._resolve_challenge_domain_async(
+                    domain, allow_expired=True
+                )
+            return ChallengeRecord(
+                domain, root_domain, name, achall.validation(achall.account_key)
+            )
+
+        async def delete(root_domain: str, challenges: list[ChallengeRecord]) -> None:
+            async with semaphore:
+                with self._metrics.timer("cleanup_zone", zone=root_domain):
+                    await self._cleanup_zone_async(root_domain, challenges)
+
+        challenges_by_zone = {}
+        for challenge in await asyncio.gather(*(resolve(achall) for achall in achalls)):
+            challenges_by_zone.setdefault(challenge.root_domain, []).append(challenge)
+
+        results = await asyncio.gather(
+            *(
+                delete(root_domain, challenges)
+                for root_domain, challenges in challenges_by_zone.items()
+            ),
+            return_exceptions=True,
+        )
+        failures = [
+            f"{root_domain}: {result}"
+            for root_domain, result in zip(challenges_by_zone, results)
+            if isinstance(result, Exception)
+        ]
+        if failures:
+            raise errors.PluginError(
+                "Challenge TXT records failed for root domains:\n" + "\n".join(failures)
+            )
+
+    async def _perform_zone_async(  # pylint: disable=too-many-locals
+        self,
+        root_domain: str,
+        challenges: list[ChallengeRecord],
+        keep: set[str] | None = None,
+    ) -> None:
+        """
+        Add the missing validation DNS TXT records of a single root domain like _perform_zone, but create and delete
+        the records concurrently.
+
+        :param root_domain: the Porkbun domain in which the TXT records will be created
+        :param challenges: the challenge records of the root domain
+        :param keep: the values of all challenges of the run, other TXT records of the challenge names are deleted
+                     as stale after the records are created. None keeps all existing records.
+
+        :raise PluginError: if a TXT record can not be set or something goes wrong
+        """
+
+        # pylint: disable=import-outside-toplevel
+        import asyncio
+
+        from pkb_client.client import DNSRecordType
+
+        client = self._get_async_porkbun_client(root_domain)
+        journal = self._get_journal()
+
+        records = []
+        if self._lists_existing_records(journal, keep):
+            records = await self._get_challenge_dns_records_async(
+                client, root_domain, challenges
+            )
+        pending = self._select_missing_challenges(challenges, records)
+
+        ttl = self.conf("ttl")
+        results = await asyncio.gather(
+            *(
+                client.create_dns_record(
+                    root_domain,
+                    DNSRecordType.TXT,
+                    challenge.validation,
+                    name=challenge.name,
+                    ttl=ttl,
+                )
+                for challenge in pending
+            ),
+            return_exceptions=True,
+        )
+        error = self._journal_created_records(journal, root_domain, pending, results)
+        if error is not None:
+            raise errors.PluginError(error) from error
+
+        stale = self._select_stale_records(records, keep)
+        results = await asyncio.gather(
+            *(client.delete_dns_record(root_domain, record.id) for record in stale),
+            return_exceptions=True,
+        )
+        for record, result in zip(stale, results):
+            self._report_stale_record_deletion(
+                record, result if isinstance(result, Exception) else None
+            )
+
+    async def _cleanup_zone_async(
+        self, root_domain: str, challenges: list[ChallengeRecord]
+    ) -> None:
+        """
+        Delete the validation DNS TXT records of a single root domain like _cleanup_zone, but delete the records
+        concurrently.
+
+        :param root_domain: the Porkbun domain in which the TXT records will be deleted
+        :param challenges: the challenge records of the root domain
+
+        :raise PluginError: if a TXT record can not be deleted or something goes wrong
+        """
+
+        import asyncio  # pylint: disable=import-outside-toplevel
+
+        client = self._get_async_porkbun_client(root_domain)
+        journal = self._get_journal()
+
+        entries, unjournaled = self._find_journal_entries(
+            journal, root_domain, challenges
+        )
+        records = (
+            await self._get_challenge_dns_records_async(
+                client, root_domain, unjournaled
+            )
+            if unjournaled
+            else []
+        )
+        deletions = self._collect_deletions(challenges, entries, records)
+
+        # delete all records of the root domain even if single deletions fail
+        results = await asyncio.gather(
+            *(
+                client.delete_dns_record(root_domain, record_id)
+                for _, record_id in deletions
+            ),
+            return_exceptions=True,
+        )
+
+        failures = self._journal_deleted_records(
+            journal, root_domain, entries, deletions, results
+        )
+        if failures:
+            raise errors.PluginError("\n".join(failures))
+
+    @staticmethod
+    async def _get_challenge_dns_records_async(
+        client: AsyncPorkbunClient,
+        root_domain: str,
+        challenges: list[ChallengeRecord],
+    ) -> list[tuple[str, DNSRecord]]:
+        """
+        Retrieve the existing TXT records of the challenge names with a single API call like
+        _get_challenge_dns_records.
+
+        :param client: the asyncio Porkbun API client
+        :param root_domain: the Porkbun domain of the challenges
+        :param challenges: the challenge records of the root domain
+        :return: list of (subdomain, record) tuples of the TXT records of the challenge names
+        """
+
+        from pkb_client.client import (  # pylint: disable=import-outside-toplevel
+            DNSRecordType,
+            PKBClientException,
+        )
+
+        names = {challenge.name for challenge in challenges}
+        try:
+            if len(names) == 1:
+                records = await client.get_all_dns_records(
+                    domain=root_domain,
+                    record_type=DNSRecordType.TXT,
+                    subdomain=next(iter(names)),
+                )
+            else:
+                records = await client.get_dns_records(root_domain)
+        except PKBClientException as e:
+            raise errors.PluginError(e) from e
+        return _select_challenge_records(records, root_domain, names)
+
+    async def _resolve_challenge_domain_async(
+        self, domain: str, allow_expired: bool = False, provision: bool = False
+    ) -> tuple[str, str]:
+        """
+        Resolve the challenge root domain and subdomain of the provided domain with the asyncio resolver like
+        _resolve_challenge_domain. The resolutions are cached in the same cache.
+
+        :param domain: the domain to get the challenge root domain and subdomain from
+        :param allow_expired: use a cached resolution even if its TTL is expired
+        :param provision: create the missing alias CNAME record of the challenge name if enabled
+        :return: a tuple of the root domain and subdomain
+        """
+
+        resolution = self._resolution_cache.get(domain, allow_expired)
+        if resolution is None:
+            with self._metrics.timer("resolve", domain=domain):
+                root_domain, name, ttl = await resolve_challenge_domain_async(
+                    domain,
+                    self.conf("suffix-cache-dir"),
+                    self._get_async_dns_resolver(),
+                )
+            resolution, alias = self._route_to_alias(
+                domain, (root_domain, name), provision
+            )
+            if alias is not None:
+                await self._provision_alias_async(alias)
+            self._resolution_cache.put(domain, resolution, ttl)
+
+        return resolution
+
+    async def _provision_alias_async(self, alias: ChallengeAlias) -> None:
+        """
+        Create the CNAME record of a challenge name into the validation zone once per run like _provision_alias with
+        the asyncio client.
+
+        :param alias: the alias of the challenge name
+
+        :raise PluginError: if the CNAME record can not be created
+        """
+
+        from pkb_client.client import (  # pylint: disable=import-outside-toplevel
+            DNSRecordType,
+            PKBClientException,
+        )
+
+        claimed = self._claim_alias(alias)
+        if claimed is None:
+            return
+        root_domain, name = claimed
+        try:
+            await self._get_async_porkbun_client(root_domain).create_dns_record(
+                root_domain, DNSRecordType.CNAME, alias.target, name=name
+            )
+        except PKBClientException as e:
+            self._report_alias_provisioning(alias, e)
+        else:
+            self._report_alias_provisioning(alias)
+
+    def _get_async_porkbun_client(self, root_domain: str) -> AsyncPorkbunClient:
+        """
+        Get the asyncio Porkbun API client of the account managing a root domain, which is created on first use and
+        closed together with the event loop of the run.
+
+        :param root_domain: the root domain of the API calls
+        :return: the AsyncPorkbunClient object
+
+        :raise PluginError: if no account manages the root domain
+        """
+
+        return self._get_async_account_client(self._get_account(root_domain))
+
+    def _get_async_account_client(self, account: Account) -> AsyncPorkbunClient:
+        """
+        Get the asyncio Porkbun API client of an account, which is created on first use.
+
+        :param account: the Porkbun account
+        :return: the AsyncPorkbunClient object
+        """
+
+        # pylint: disable=import-outside-toplevel
+        from certbot_dns_porkbun.cert.aio import AsyncPorkbunClient
+
+        if account.name not in self._async_clients:
+            self._async_clients[account.name] = AsyncPorkbunClient(
+                **self._get_client_options(account)
+            )
+        return self._async_clients[account.name]
+
+    def _check_api_health(self) -> None:
+        """
+        Check that the Porkbun API is available for all accounts with a single ping API call each if the health
+        check is enabled. The pings are not retried and count for the circuit breaker like all other API calls.
+
+        :raise PluginError: if the ping API call of an account fails
+        """
+
+        # pylint: disable=import-outside-toplevel
+        from pkb_client.client import PKBClientException
+
+        if not self.conf("health-check"):
+            return
+
+        for account in self._accounts.accounts:
+            try:
+                if self._uses_asyncio():
+                    client = self._get_async_account_client(account)
+                    self._run_async(client.ping(retry=False))
+                else:
+                    self._get_account_client(account).ping(retry=False)
+            except PKBClientException as e:
+                raise errors.PluginError(
+                    f"Porkbun API health check failed for account {account.name}: {e}"
+                ) from e
+
+    def _get_async_dns_resolver(
+        self,
+    ) -> AsyncRecursiveResolver | ThreadedResolver | None:
+        """
+        Get the configured resolver of the asyncio backend to follow the CNAME records of the challenge domains with.
+        The authoritative resolver is blocking and runs in a worker thread.
+
+        :return: the resolver or None to use the resolvers configured on the host
+        """
+
+        # pylint: disable=import-outside-toplevel
+        from certbot_dns_porkbun.cert import aio, propagation
+
+        selection = self.conf("resolver")
+        if selection == RESOLVER_SYSTEM:
+            return None
+        if selection == RESOLVER_AUTHORITATIVE:
+            return aio.ThreadedResolver(self._get_authoritative_resolver())
+
+        if self._async_resolver is None:
+            self._async_resolver = aio.AsyncRecursiveResolver(
+                propagation.parse_nameservers(selection)
+            )
+        return self._async_resolver
+
+    def _warn_short_propagation_seconds(self) -> None:
+        """
+        Warn if the propagation time is shorter than the TTL of the challenge records, which is at least the minimum
+        TTL of Porkbun.
+        """
+
+        propagation_seconds = self.conf("propagation_seconds")
+        ttl = max(self.conf("ttl"), PORKBUN_MIN_TTL)
+        if propagation_seconds < ttl:
+            logger.warning(
+                "The propagation time is less than the DNS TTL of %d seconds of the challenge records (Porkbun "
+                "minimum is %d seconds). Subsequent challenges for same domain may fail. Try increasing the "
+                "propagation time if you encounter issues.",
+                ttl,
+                PORKBUN_MIN_TTL,
+            )
+
+    def _get_porkbun_client(self, root_domain: str) -> PKBClient:
+        """
+        Get the Porkbun API client of the account managing a root domain.
+        The client of each account is created on first use and then shared by all API calls of the account, so that
+        the pooled connections are reused. Each account has its own connections and rate limit, so that the API calls
+        of different accounts do not wait for each other.
+
+        :param root_domain: the root domain of the API calls
+        :return: the PKBClient object
+
+        :raise PluginError: if no account manages the root domain
+        """
+
+        return self._get_account_client(self._get_account(root_domain))
+
+    def _get_account_client(self, account: Account) -> PKBClient:
+        """
+        Get the Porkbun API client of an account, which is created on first use.
+
+        :param account: the Porkbun account
+        :return: the PKBClient object
+        """
+
+        from certbot_dns_porkbun.cert.api import PooledPKBClient  # pylint: disable=import-outside-toplevel
+
+        with self._client_lock:
+            if account.name not in self._clients:
+                self._clients[account.name] = PooledPKBClient(
+                    **self._get_client_options(account)
+                )
+
+            return self._clients[account.name]
+
+    def _get_account(self, root_domain: str) -> Account:
+        """
+        Get the Porkbun account managing a root domain, the accounts are set up on first use if the credentials were
+        not set up yet, e.g. by the cleanup of a separate process.
+
+        :param root_domain: the root domain
+        :return: the Account object
+
+        :raise PluginError: if no account manages the root domain
+        """
+
+        if self._accounts is None:
+            self._setup_credentials()
+        return self._accounts.lookup(root_domain)
+
+    def _get_client_options(self, account: Account) -> dict:
+        """
+        Get the credentials and options of the Porkbun API clients of the backends.
+
+        :param account: the Porkbun account of the client
+        :return: the keyword arguments of the PooledPKBClient and AsyncPorkbunClient
+        """
+
+        from pkb_client.client import API_ENDPOINT  # pylint: disable=import-outside-toplevel
+
+        return {
+            "api_key": account.key,
+            "secret_api_key": account.secret,
+            "api_endpoint": self.conf("api-endpoint") or API_ENDPOINT,
+            "pool_size": self.conf("max-concurrency"),
+            "rate_limit": self.conf("rate-limit"),
+            "max_retries": self.conf("max-retries"),
+            "retry_backoff": self.conf("retry-backoff"),
+            "metrics": self._metrics,
+            "connect_timeout": self.conf("connect-timeout"),
+            "read_timeout": self.conf("read-timeout"),
+            "circuit_breaker": self._get_circuit_breaker(),
+        }
+
+    def _get_circuit_breaker(self):
+        """
+        Get the circuit breaker shared by the Porkbun API clients of all accounts and backends, so that an API outage
+        is detected by the consecutive failures of all API calls of the run. It is created on first use, which is
+        guarded by the client lock of the caller, and reset when the clients are closed.
+
+        :return: the CircuitBreaker object
+        """
+
+        from certbot_dns_porkbun.cert.api import CircuitBreaker  # pylint: disable=import-outside-toplevel
+
+        if self._circuit_breaker is None:
+            self._circuit_breaker = CircuitBreaker(
+                self.conf("circuit-breaker-threshold"),
+                self.conf("circuit-breaker-reset"),
+            )
+        return self._circuit_breaker
+
+    def _get_journal(self) -> RecordJournal | None:
+        """
+        Get the journal of the created challenge records, which is loaded from the certbot work directory on first
+        use.
+
+        :return: the RecordJournal object or None if the journal is disabled
+        """
+
+        # pylint: disable=import-outside-toplevel
+        from certbot_dns_porkbun.cert.journal import JOURNAL_FILENAME, RecordJournal
+
+        if self._journal is None and self.conf("journal"):
+            self._journal = RecordJournal(
+                os.path.join(self.config.work_dir, JOURNAL_FILENAME)
+            )
+
+        return self._journal
+
+    def _get_dns_resolver(
+        self,
+    ) -> RecursiveResolver | AuthoritativeResolver | None:
+        """
+        Get the configured resolver to follow the CNAME records of the challenge domains with.
+
+        :return: the resolver or None to use the resolvers configured on the host
+        """
+
+        # pylint: disable=import-outside-toplevel
+        from certbot_dns_porkbun.cert.resolvers import RecursiveResolver
+
+        selection = self.conf("resolver")
+        if selection == RESOLVER_SYSTEM:
+            return None
+        if selection == RESOLVER_AUTHORITATIVE:
+            return self._get_authoritative_resolver()
+
+        with self._resolver_lock:
+            if self._dns_resolver is None:
+                self._dns_resolver = RecursiveResolver(
+                    self._create_recursive_resolver()
+                )
+            return self._dns_resolver
+
+    def _get_authoritative_resolver(self) -> AuthoritativeResolver:
+        """
+        Get the resolver querying the authoritative nameservers of the zones directly. It caches the nameservers of
+        the zones and is shared by the domain resolution and the propagation check.
+
+        :return: the AuthoritativeResolver object
+        """
+
+        # pylint: disable=import-outside-toplevel
+        from certbot_dns_porkbun.cert.resolvers import AuthoritativeResolver
+
+        with self._resolver_lock:
+            if self._authoritative_resolver is None:
+                self._authoritative_resolver = AuthoritativeResolver(
+                    self._create_recursive_resolver()
+                )
+            return self._authoritative_resolver
+
+    def _create_recursive_resolver(self):
+        """
+        Create the recursive resolver of the configured resolver addresses.
+
+        :return: the dnspython Resolver object or None to use the resolvers configured on the host
+        """
+
+        # pylint: disable=import-outside-toplevel
+        from certbot_dns_porkbun.cert import propagation, resolvers
+
+        selection = self.conf("resolver")
+        if selection in (RESOLVER_SYSTEM, RESOLVER_AUTHORITATIVE):
+            return None
+
+        return resolvers.create_recursive_resolver(
+            propagation.parse_nameservers(selection)
+        )
+
+    def _close_porkbun_client(self) -> None:
+        """
+        Close the pooled connections of the Porkbun API clients, new clients are created on next use.
+        """
+
+        with self._client_lock:
+            for client in self._clients.values():
+                client.close()
+            self._clients = {}
+            self._circuit_breaker = None
+
+        if self._event_loop is not None:
+            try:
+                for client in self._async_clients.values():
+                    self._event_loop.run_until_complete(client.close())
+                self._event_loop.run_until_complete(
+                    self._event_loop.shutdown_default_executor()
+                )
+            finally:
+                self._event_loop.close()
+                self._event_loop = None
+                self._async_clients = {}
@@ -0,0 +1,17 @@
+"""
+Default values of the Porkbun API client options, which are needed for the cli arguments without importing the client.
+"""
+
+DEFAULT_RATE_LIMIT = 5.0
+
+DEFAULT_MAX_RETRIES = 5
+
+DEFAULT_RETRY_BACKOFF = 1.0
+
+DEFAULT_CONNECT_TIMEOUT = 10.0
+
+DEFAULT_READ_TIMEOUT = 30.0
+
+DEFAULT_CIRCUIT_BREAKER_THRESHOLD = 10
+
+DEFAULT_CIRCUIT_BREAKER_RESET = 60.0
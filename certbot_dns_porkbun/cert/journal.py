@@ -0,0 +1,137 @@
+"""
+Persistent journal of the challenge TXT records created by the plugin.
+"""
+
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from typing import NamedTuple
+
+logger = logging.getLogger(__name__)
+
+JOURNAL_FILENAME = "dns-porkbun-journal.json"
+
+
+class JournalEntry(NamedTuple):
+    """
+    A challenge TXT record created by the plugin.
+    """
+
+    record_id: str
+    zone: str
+    name: str
+    content: str
+    created: float
+
+
+class RecordJournal:
+    """
+    Thread-safe journal of the created challenge TXT records, persisted as JSON file.
+    The records of a run are removed from the journal once they are deleted, so that all remaining records are
+    orphans of crashed or interrupted runs.
+    """
+
+    def __init__(self, path: str) -> None:
+        """
+        Creates a new RecordJournal object and loads the existing journal file.
+
+        :param path: the path of the journal file
+        """
+
+        self.path = path
+        self._entries = {}
+        # index of the entries by zone, name and content
+        self._records = {}
+        self._lock = threading.Lock()
+
+        try:
+            with open(path, encoding="utf-8") as f:
+                for entry in json.load(f):
+                    self._add_entry(JournalEntry(**entry))
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError, TypeError) as e:
+            logger.warning("Could not read the record journal %s: %s", path, e)
+
+    def add(self, record_id: str, zone: str, name: str, content: str) -> None:
+        """
+        Add a created challenge TXT record.
+
+        :param record_id: the ID of the record
+        :param zone: the root domain of the record
+        :param name: the subdomain of the record
+        :param content: the content of the record
+        """
+
+        with self._lock:
+            self._add_entry(JournalEntry(record_id, zone, name, content, time.time()))
+
+    def find(self, zone: str, name: str, content: str) -> JournalEntry | None:
+        """
+        Find a created challenge TXT record by its zone, name and content.
+
+        :param zone: the root domain of the record
+        :param name: the subdomain of the record
+        :param content: the content of the record
+        :return: the journal entry or None if the record is not in the journal
+        """
+
+        with self._lock:
+            return self._records.get((zone, name, content))
+
+    def remove(self, entry: JournalEntry) -> None:
+        """
+        Remove a deleted challenge TXT record.
+
+        :param entry: the journal entry of the record
+        """
+
+        with self._lock:
+            self._entries.pop((entry.zone, entry.record_id), None)
+            if self._records.get((entry.zone, entry.name, entry.content)) == entry:
+                del self._records[(entry.zone, entry.name, entry.content)]
+
+    def entries_by_zone(self) -> dict[str, list[JournalEntry]]:
+        """
+        Get all journal entries grouped by their zone.
+
+        :return: mapping of the root domains to their journal entries in the order they were created
+        """
+
+        entries_by_zone = {}
+        with self._lock:
+            for entry in self._entries.values():
+                entries_by_zone.setdefault(entry.zone, []).append(entry)
+        return entries_by_zone
+
+    def save(self) -> None:
+        """
+        Write the journal file atomically, only readable by the owner.
+        """
+
+        with self._lock:
+            content = json.dumps(
+                [entry._asdict() for entry in self._entries.values()], indent=2
+            )
+
+            directory = os.path.dirname(os.path.abspath(self.path))
+            os.makedirs(directory, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".tmp-")
+            try:
+                with os.fdopen(fd, "w", encoding="utf-8") as f:
+                    f.write(content + "\n")
+                os.replace(tmp_path, self.path)
+            except BaseException:
+                os.unlink(tmp_path)
+                raise
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
+
+    def _add_entry(self, entry: JournalEntry) -> None:
+        self._entries[(entry.zone, entry.record_id)] = entry
+        self._records[(entry.zone, entry.name, entry.content)] = entry
@@ -0,0 +1,231 @@
+"""
+Timing metrics of the authenticator phases and their export as JSON summary or Prometheus textfile.
+"""
+
+import json
+import os
+import tempfile
+import threading
+import time
+from collections.abc import Iterator
+from contextlib import contextmanager
+
+METRIC_PREFIX = "certbot_dns_porkbun"
+
+
+class Metrics:
+    """
+    Thread-safe collection of the phase timings, per domain and per zone breakdowns and API call counts of an
+    authenticator run.
+    """
+
+    def __init__(self) -> None:
+        self.started = time.time()
+        self.phases = {}
+        self.domains = {}
+        self.zones = {}
+        self.counters = {}
+        self._lock = threading.Lock()
+
+    def reset(self) -> None:
+        """
+        Discard all recorded metrics and start a new collection, e.g. after the metrics of a session of the daemon are
+        exported.
+        """
+
+        with self._lock:
+            self.started = time.time()
+            self.phases = {}
+            self.domains = {}
+            self.zones = {}
+            self.counters = {}
+
+    @contextmanager
+    def timer(
+        self, phase: str, domain: str | None = None, zone: str | None = None
+    ) -> Iterator[None]:
+        """
+        Time the enclosed block as phase, optionally attributed to a domain or zone.
+
+        :param phase: the name of the phase, e.g. resolve or propagation
+        :param domain: the domain the phase is attributed to
+        :param zone: the zone the phase is attributed to
+        """
+
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(phase, time.perf_counter() - start, domain=domain, zone=zone)
+
+    def record(
+        self,
+        phase: str,
+        seconds: float,
+        domain: str | None = None,
+        zone: str | None = None,
+    ) -> None:
+        """
+        Record the duration of a phase.
+
+        :param phase: the name of the phase
+        :param seconds: the duration in seconds
+        :param domain: the domain the phase is attributed to
+        :param zone: the zone the phase is attributed to
+        """
+
+        with self._lock:
+            _add_timing(self.phases, phase, seconds)
+            if domain is not None:
+                _add_timing(self.domains.setdefault(domain, {}), phase, seconds)
+            if zone is not None:
+                _add_timing(self.zones.setdefault(zone, {}), phase, seconds)
+
+    def record_api_call(
+        self, method: str, zone: str | None, seconds: float, error: bool = False
+    ) -> None:
+        """
+        Record a single Porkbun API call including all its retries.
+
+        :param method: the API method, e.g. dns/create
+        :param zone: the zone the API call is made for, None for calls without a zone
+        :param seconds: the duration in seconds
+        :param error: whether the API call finally failed
+        """
+
+        self.record(f"api:{method}", seconds, zone=zone)
+        with self._lock:
+            self.counters["api_calls"] = self.counters.get("api_calls", 0) + 1
+            if error:
+                self.counters["api_errors"] = self.counters.get("api_errors", 0) + 1
+
+    def count(self, name: str, value: int = 1) -> None:
+        """
+        Increase a counter.
+
+        :param name: the name of the counter
+        :param value: the value to add
+        """
+
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def set_counter(self, name: str, value: int) -> None:
+        """
+        Set a counter to an absolute value, e.g. for counters maintained elsewhere.
+
+        :param name: the name of the counter
+        :param value: the value of the counter
+        """
+
+        with self._lock:
+            self.counters[name] = value
+
+    def summary(self) -> dict:
+        """
+        Get the summary of all recorded metrics.
+
+        :return: the JSON serializable summary
+        """
+
+        with self._lock:
+            return {
+                "started": self.started,
+                "duration_seconds": time.time() - self.started,
+                "counters": dict(self.counters),
+                "phases": _copy_timings(self.phases),
+                "domains": {
+                    domain: _copy_timings(phases)
+                    for domain, phases in sorted(self.domains.items())
+                },
+                "zones": {
+                    zone: _copy_timings(phases)
+                    for zone, phases in sorted(self.zones.items())
+                },
+            }
+
+    def write_json(self, path: str) -> None:
+        """
+        Write the summary as JSON file.
+
+        :param path: the path of the JSON file
+        """
+
+        _write_atomic(path, json.dumps(self.summary(), indent=2) + "\n")
+
+    def write_prometheus(self, path: str) -> None:
+        """
+        Write the metrics in the Prometheus text format, e.g. for the textfile collector of the node exporter.
+
+        :param path: the path of the metrics file
+        """
+
+        summary = self.summary()
+        lines = [
+            f"# TYPE {METRIC_PREFIX}_last_run_timestamp_seconds gauge",
+            f"{METRIC_PREFIX}_last_run_timestamp_seconds {summary['started']:.3f}",
+            f"# TYPE {METRIC_PREFIX}_run_duration_seconds gauge",
+            f"{METRIC_PREFIX}_run_duration_seconds {summary['duration_seconds']:.6f}",
+        ]
+
+        for name, value in sorted(summary["counters"].items()):
+            lines.append(f"# TYPE {METRIC_PREFIX}_{name}_total counter")
+            lines.append(f"{METRIC_PREFIX}_{name}_total {value}")
+
+        for label, breakdown in (
+            (None, {None: summary["phases"]}),
+            ("domain", summary["domains"]),
+            ("zone", summary["zones"]),
+        ):
+            metric = (
+                f"{METRIC_PREFIX}_{label}_phase" if label else f"{METRIC_PREFIX}_phase"
+            )
+            lines.append(f"# TYPE {metric}_seconds gauge")
+            lines.append(f"# TYPE {metric}_count gauge")
+            for key, phases in breakdown.items():
+                for phase, timing in sorted(phases.items()):
+                    labels = f'phase="{_escape(phase)}"'
+                    if label:
+                        labels = f'{label}="{_escape(key)}",{labels}'
+                    lines.append(
+                        f"{metric}_seconds{{{labels}}} {timing['seconds']:.6f}"
+                    )
+                    lines.append(f"{metric}_count{{{labels}}} {timing['count']}")
+
+        _write_atomic(path, "\n".join(lines) + "\n")
+
+
+def _add_timing(timings: dict, phase: str, seconds: float) -> None:
+    timing = timings.setdefault(phase, {"count": 0, "seconds": 0.0, "max_seconds": 0.0})
+    timing["count"] += 1
+    timing["seconds"] += seconds
+    timing["max_seconds"] = max(timing["max_seconds"], seconds)
+
+
+def _copy_timings(timings: dict) -> dict:
+    return {phase: dict(timing) for phase, timing in sorted(timings.items())}
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _write_atomic(path: str, content: str) -> None:
+    """
+    Write a file atomically, so that readers never see a partially written file.
+
+    :param path: the path of the file
+    :param content: the content of the file
+    """
+
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".tmp-")
+    try:
+        with os.fdopen(fd, "w") as f:
+            f.write(content)
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
@@ -0,0 +1,231 @@
+"""
+Streaming pipeline of stages connected by bounded queues, so that the stages work on different items at the same time.
+"""
+
+import logging
+import queue
+import threading
+import time
+from collections.abc import Callable, Iterable
+from typing import Any, NamedTuple
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_QUEUE_SIZE = 16
+
+# marks the end of the input of a stage worker
+_END = object()
+
+
+class Stage(NamedTuple):
+    """
+    A stage of the pipeline, whose function is called in worker threads for each item of its input queue and returns
+    the items for the next stage. The optional flush function is called once all items are processed and returns the
+    remaining items for the next stage, e.g. of a stage collecting items into batches.
+    """
+
+    name: str
+    function: Callable[[Any], Iterable]
+    workers: int = 1
+    flush: Callable[[], Iterable] | None = None
+
+
+class StageFailure(NamedTuple):
+    """
+    An item for which the function of a stage raised an exception.
+    """
+
+    stage: str
+    item: Any
+    error: Exception
+
+
+class PipelineError(Exception):
+    """
+    Raised after all items passed the pipeline if the function of a stage failed for some of them.
+    """
+
+    def __init__(self, failures: list[StageFailure]) -> None:
+        super().__init__(
+            "; ".join(
+                f"{failure.stage} {failure.item!r}: {failure.error}"
+                for failure in failures
+            )
+        )
+        self.failures = failures
+
+
+class _StageRunner:  # pylint: disable=too-many-instance-attributes
+    """
+    Runs the workers of a single stage and records its queue depth and timing.
+    """
+
+    def __init__(
+        self,
+        stage: Stage,
+        output: Callable[[Any], None],
+        on_done: Callable[[], None] | None,
+        queue_size: int,
+    ) -> None:
+        self.stage = stage
+        self.output = output
+        self.on_done = on_done
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.failures = []
+        self.items = 0
+        self.busy_seconds = 0.0
+        self.max_depth = 0
+        self._running = stage.workers
+        self._lock = threading.Lock()
+
+    def put(self, item: Any) -> None:
+        """
+        Add an item to the input queue, blocks while the queue is full.
+        """
+
+        self.queue.put(item)
+        depth = self.queue.qsize()
+        with self._lock:
+            self.max_depth = max(self.max_depth, depth)
+
+    def close(self) -> None:
+        """
+        Stop the workers once all queued items are processed.
+        """
+
+        for _ in range(self.stage.workers):
+            self.queue.put(_END)
+
+    def work(self) -> None:
+        """
+        Process the items of the input queue until the stage is closed.
+        """
+
+        while True:
+            item = self.queue.get()
+            if item is _END:
+                break
+
+            start = time.perf_counter()
+            try:
+                outputs = list(self.stage.function(item))
+            except Exception as e:  # pylint: disable=broad-exception-caught
+                # the failure is raised by run_pipeline after all items are processed
+                logger.debug(
+                    "Pipeline stage %s failed for %r: %s",
+                    self.stage.name,
+                    item,
+                    e,
+                    exc_info=True,
+                )
+                outputs = []
+                with self._lock:
+                    self.failures.append(StageFailure(self.stage.name, item, e))
+            elapsed = time.perf_counter() - start
+
+            with self._lock:
+                self.items += 1
+                self.busy_seconds += elapsed
+            for output in outputs:
+                self.output(output)
+
+        with self._lock:
+            self._running -= 1
+            last = self._running == 0
+        if last:
+            self._finish()
+
+    def _finish(self) -> None:
+        if self.stage.flush is not None:
+            try:
+                for output in self.stage.flush():
+                    self.output(output)
+            except Exception as e:  # pylint: disable=broad-exception-caught
+                logger.debug(
+                    "Pipeline stage %s failed to flush: %s",
+                    self.stage.name,
+                    e,
+                    exc_info=True,
+                )
+                self.failures.append(StageFailure(self.stage.name, None, e))
+        if self.on_done is not None:
+            self.on_done()
+
+
+def run_pipeline(
+    items: Iterable, stages: list[Stage], queue_size: int = DEFAULT_QUEUE_SIZE
+) -> list:
+    """
+    Pass the items through the stages, which all run at the same time. The queue in front of each stage holds at most
+    queue_size items, so that a slow stage slows down the stages before it instead of buffering all items.
+    An item for which a stage fails is not passed to the next stages, but all other items are processed.
+    The depth of the queues and the time spent in each stage are logged on debug level.
+
+    :param items: the input items of the first stage
+    :param stages: the stages in their order
+    :param queue_size: the maximum number of items waiting in front of each stage
+    :return: the items returned by the last stage in the order they were completed
+
+    :raise PipelineError: with the failures of all stages in the order of the stages
+    """
+
+    # appending to a list is atomic, so that the workers of the last stage can collect their items directly
+    results = []
+
+    # each stage passes its items to the next one and closes its queue once all workers are done
+    runners = []
+    output, on_done = results.append, None
+    for stage in reversed(stages):
+        runner = _StageRunner(stage, output, on_done, queue_size)
+        runners.insert(0, runner)
+        output, on_done = runner.put, runner.close
+
+    start = time.perf_counter()
+    threads = [
+        threading.Thread(
+            target=runner.work, name=f"pipeline-{runner.stage.name}", daemon=True
+        )
+        for runner in runners
+        for _ in range(runner.stage.workers)
+    ]
+    for thread in threads:
+        thread.start()
+
+    try:
+        for item in items:
+            runners[0].put(item)
+    finally:
+        runners[0].close()
+        for thread in threads:
+            thread.join()
+
+    _log_statistics(runners, time.perf_counter() - start, queue_size)
+
+    failures = [failure for runner in runners for failure in runner.failures]
+    if failures:
+        raise PipelineError(failures)
+    return results
+
+
+def _log_statistics(
+    runners: list[_StageRunner], elapsed: float, queue_size: int
+) -> None:
+    """
+    Log the number of items, the time spent and the maximum queue depth of each stage on debug level.
+
+    :param runners: the runners of the stages
+    :param elapsed: the wall time of the pipeline in seconds
+    :param queue_size: the maximum number of items waiting in front of each stage
+    """
+
+    for runner in runners:
+        logger.debug(
+            "Pipeline stage %s: %d items in %.3fs busy of %.3fs with %d workers, max queue depth %d of %d",
+            runner.stage.name,
+            runner.items,
+            runner.busy_seconds,
+            elapsed,
+            runner.stage.workers,
+            runner.max_depth,
+            queue_size,
+        )
@@ -0,0 +1,186 @@
+"""
+Plan of the DNS changes of a run, which is determined with read-only API calls and DNS queries only.
+"""
+
+import heapq
+import math
+from typing import TYPE_CHECKING, NamedTuple
+
+from certbot_dns_porkbun.cert.journal import JournalEntry
+
+if TYPE_CHECKING:
+    from pkb_client.client import DNSRecord
+
+    from certbot_dns_porkbun.cert.client import ChallengeRecord
+
+
+class ZonePlan(NamedTuple):
+    """
+    The planned API calls of a root domain. The values of the challenges are None if they are not known yet, e.g.
+    before the certificates are ordered.
+    """
+
+    root_domain: str
+    # challenge records which would be created
+    creates: list["ChallengeRecord"]
+    # challenge records which already exist and are not created again
+    existing: list["ChallengeRecord"]
+    # TXT records of the challenge names which would be deleted as stale
+    stale: list["DNSRecord"]
+    # records of the journal left behind by interrupted runs which would be deleted first
+    orphaned: list[JournalEntry]
+    # number of listings of the existing records during perform and cleanup
+    lists: int
+    cleanup_lists: int
+    # number of records which would be deleted during cleanup
+    cleanup_deletes: int
+
+    @property
+    def perform_steps(self) -> list[int]:
+        """
+        The number of API calls of each sequential step of the perform: listing, creating and deleting stale records.
+        """
+
+        return [self.lists, len(self.creates), len(self.stale)]
+
+    @property
+    def cleanup_steps(self) -> list[int]:
+        """
+        The number of API calls of each sequential step of the cleanup: listing and deleting records.
+        """
+
+        return [self.cleanup_lists, self.cleanup_deletes]
+
+
+class Plan(NamedTuple):
+    """
+    The planned API calls of all root domains and the estimated wall time of the run.
+    """
+
+    zones: list[ZonePlan]
+    # domains or root domains which could not be resolved or listed
+    failures: list[str]
+    # estimated seconds of the phases of the run in their order
+    estimates: dict[str, float]
+    # description of the concurrency and rate settings the estimate is based on
+    settings: str
+
+    @property
+    def api_calls(self) -> int:
+        """
+        The total number of API calls of the sweep, perform and cleanup.
+        """
+
+        return sum(
+            len(zone.orphaned) + sum(zone.perform_steps) + sum(zone.cleanup_steps)
+            for zone in self.zones
+        )
+
+    @property
+    def total_seconds(self) -> float:
+        """
+        The estimated wall time of the run.
+        """
+
+        return sum(self.estimates.values())
+
+    def describe(self) -> str:
+        """
+        Describe the planned changes grouped by root domain and the estimated wall time.
+
+        :return: the multi-line description
+        """
+
+        challenges = sum(len(zone.creates) + len(zone.existing) for zone in self.zones)
+        lines = [
+            (
+                f"Planned DNS changes of {challenges} challenges in {len(self.zones)} root domains, no records "
+                "were changed:"
+            )
+        ]
+
+        for zone in self.zones:
+            lines.append(
+                f"{zone.root_domain}: {sum(zone.perform_steps) + len(zone.orphaned)} API calls to perform, "
+                f"{sum(zone.cleanup_steps)} API calls to clean up"
+            )
+            for entry in zone.orphaned:
+                lines.append(
+                    f"  delete orphaned TXT {_get_fqdn(entry.name, zone.root_domain)} {entry.content}"
+                )
+            for challenge in zone.creates:
+                lines.append(
+                    f"  create TXT {_get_fqdn(challenge.name, zone.root_domain)} "
+                    f"{challenge.validation or '(value of the new challenge)'}"
+                )
+            for challenge in zone.existing:
+                lines.append(
+                    f"  keep existing TXT {_get_fqdn(challenge.name, zone.root_domain)} {challenge.validation}"
+                )
+            for record in zone.stale:
+                lines.append(f"  delete stale TXT {record.name} {record.content}")
+            listing = (
+                " after listing the existing records" if zone.cleanup_lists else ""
+            )
+            lines.append(
+                f"  cleanup: delete {zone.cleanup_deletes} TXT records{listing}"
+            )
+
+        for failure in self.failures:
+            lines.append(f"Failed: {failure}")
+
+        lines.append(f"API calls: {self.api_calls}")
+        phases = ", ".join(
+            f"{phase} {seconds:.1f}s" for phase, seconds in self.estimates.items()
+        )
+        lines.append(
+            f"Estimated wall time: {self.total_seconds:.1f}s ({phases}) with {self.settings}"
+        )
+        return "\n".join(lines)
+
+
+def estimate_api_seconds(  # pylint: disable=too-many-arguments,too-many-positional-arguments
+    zone_steps: list[list[int]],
+    latency: float,
+    concurrency: int,
+    rate_limit: float,
+    concurrent_steps: bool = False,
+    connections: int = 0,
+) -> float:
+    """
+    Estimate the wall time of the API calls of the root domains, which are processed by at most concurrency workers
+    in their order like the authenticator does.
+
+    :param zone_steps: the number of API calls of each sequential step of each root domain
+    :param latency: the expected seconds per API call
+    :param concurrency: the maximum number of root domains processed in parallel
+    :param rate_limit: the maximum number of API calls per second, 0 disables the rate limit
+    :param concurrent_steps: whether the API calls of a step are sent concurrently like by the asyncio backend
+    :param connections: the maximum number of API calls in flight, 0 for one call per worker
+    :return: the estimated number of seconds
+    """
+
+    durations = [
+        sum(1 if concurrent_steps else calls for calls in steps if calls) * latency
+        for steps in zone_steps
+    ]
+
+    # each root domain is started by the first free worker
+    workers = [0.0] * max(1, concurrency)
+    for duration in durations:
+        heapq.heappush(workers, heapq.heappop(workers) + duration)
+    seconds = max(workers)
+
+    calls = sum(sum(steps) for steps in zone_steps)
+    if connections:
+        seconds = max(seconds, math.ceil(calls / connections) * latency)
+
+    # the token bucket allows a burst of one second of calls, then the calls are spaced by the rate
+    if rate_limit > 0:
+        seconds = max(seconds, (calls - max(1.0, rate_limit)) / rate_limit)
+
+    return seconds
+
+
+def _get_fqdn(name: str, root_domain: str) -> str:
+    return f"{name}.{root_domain}" if name else root_domain
@@ -0,0 +1,294 @@
+"""
+Opt-in profiling of the perform and cleanup of the authenticator with cProfile and tracemalloc. Each profiled call
+writes three files tagged with its phase and domains to the profile directory:
+
+- <tag>.pstats: the cProfile statistics of all threads, e.g. for python -m pstats or snakeviz
+- <tag>.collapsed: the collapsed stacks in microseconds for flamegraph.pl, inferno or speedscope
+- <tag>.txt: the time and the allocations by package and the top allocating lines
+
+The times are wall clock times, so that waiting for the Porkbun API and the DNS is attributed to the calls waiting.
+Profiled calls are serialized, because only one profiler can be active in the interpreter since Python 3.12.
+"""
+
+import cProfile
+import logging
+import os
+import pstats
+import re
+import sys
+import sysconfig
+import threading
+import time
+import tracemalloc
+from collections.abc import Iterator
+from contextlib import contextmanager
+
+# number of allocating lines in the report
+TOP_ALLOCATIONS = 25
+
+# maximum depth of the collapsed stacks, deeper calls are attributed to the last frame
+MAX_STACK_DEPTH = 64
+
+logger = logging.getLogger(__name__)
+
+_PLUGIN_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+_STDLIB_DIR = os.path.abspath(sysconfig.get_paths()["stdlib"])
+
+# since Python 3.12 cProfile uses sys.monitoring, which is shared by the interpreter, so a single profiler sees the calls
+# of all threads and no other profiler can be enabled while it is active
+_MONITORING_PROFILER = sys.version_info >= (3, 12)
+
+_profile_lock = threading.RLock()
+
+_profiling = threading.local()
+
+
+@contextmanager
+def profile(directory: str, phase: str, domains: list[str]) -> Iterator[None]:
+    """
+    Profile the enclosed block including the threads started by it and write the profile files once it finished,
+    also if it failed.
+
+    :param directory: the directory to write the profile files to, it is created if it does not exist
+    :param phase: the profiled phase, e.g. perform or cleanup
+    :param domains: the domains of the profiled challenges to tag the files with
+    """
+
+    with _profile_lock:
+        # a block nested in a profiled block of the same thread is part of the outer profile
+        if getattr(_profiling, "active", False):
+            yield
+            return
+
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError as e:
+            # another profiler or debugger owns sys.monitoring
+            logger.warning("The %s is not profiled: %s", phase, e)
+            yield
+            return
+
+        _profiling.active = True
+        try:
+            yield from _profile_enabled(profiler, directory, phase, domains)
+        finally:
+            _profiling.active = False
+
+
+def _profile_enabled(
+    profiler: cProfile.Profile, directory: str, phase: str, domains: list[str]
+) -> Iterator[None]:
+    thread_profilers = []
+    previous_hook = threading.getprofile()
+    tracing = tracemalloc.is_tracing()
+    if not tracing:
+        tracemalloc.start()
+    if not _MONITORING_PROFILER:
+        threading.setprofile(_thread_profiler_hook(thread_profilers))
+    try:
+        yield
+    finally:
+        profiler.disable()
+        if not _MONITORING_PROFILER:
+            threading.setprofile(previous_hook)
+        snapshot = tracemalloc.take_snapshot()
+        if not tracing:
+            tracemalloc.stop()
+
+        try:
+            write_profile(
+                os.path.join(directory, get_profile_tag(phase, domains)),
+                _merge_stats(profiler, thread_profilers),
+                snapshot,
+            )
+        except OSError as e:
+            logger.warning("Profile of the %s could not be written: %s", phase, e)
+
+
+def get_profile_tag(phase: str, domains: list[str]) -> str:
+    """
+    Get the file name prefix of a profile, which contains the phase, the first domain, the number of other domains
+    and the start time, e.g. perform-wildcard.example.com+2-20240101T120000-1234.
+
+    :param phase: the profiled phase
+    :param domains: the domains of the profiled challenges
+    :return: the tag
+    """
+
+    domain = domains[0].replace("*", "wildcard") if domains else "none"
+    others = f"+{len(domains) - 1}" if len(domains) > 1 else ""
+    started = time.strftime("%Y%m%dT%H%M%S")
+    return re.sub(
+        r"[^A-Za-z0-9.+_-]", "_", f"{phase}-{domain}{others}-{started}-{os.getpid()}"
+    )
+
+
+def write_profile(
+    path_prefix: str, stats: pstats.Stats, snapshot: tracemalloc.Snapshot
+) -> None:
+    """
+    Write the pstats, collapsed stacks and report files of a profile.
+
+    :param path_prefix: the path of the files without extension
+    :param stats: the merged statistics of all profiled threads
+    :param snapshot: the tracemalloc snapshot at the end of the profiled block
+    """
+
+    os.makedirs(os.path.dirname(path_prefix), exist_ok=True)
+    # profiles of the same phase and domains started in the same second get a sequence number
+    tag, sequence = path_prefix, 1
+    while os.path.exists(f"{path_prefix}.pstats"):
+        sequence += 1
+        path_prefix = f"{tag}-{sequence}"
+    stats.dump_stats(f"{path_prefix}.pstats")
+    with open(f"{path_prefix}.collapsed", "w", encoding="utf-8") as f:
+        f.writelines(f"{stack} {micros}\n" for stack, micros in collapse_stacks(stats))
+    with open(f"{path_prefix}.txt", "w", encoding="utf-8") as f:
+        f.write(format_report(stats, snapshot))
+    logger.info("Wrote profile %s.{pstats,collapsed,txt}", path_prefix)
+
+
+def collapse_stacks(stats: pstats.Stats) -> list[tuple[str, int]]:
+    """
+    Reconstruct the collapsed stacks of the call graph of a profile. cProfile only records the time per caller and
+    callee, so the time of a function shared by several stacks is split in proportion to these times.
+
+    :param stats: the profile statistics
+    :return: the semicolon separated stacks with their self time in microseconds
+    """
+
+    callees = {}
+    for func, (_, _, _, _, callers) in stats.stats.items():
+        for caller, (_, _, _, cumulative) in callers.items():
+            callees.setdefault(caller, []).append((func, cumulative))
+
+    stacks = {}
+
+    def walk(func, stack: tuple[str, ...], seconds: float) -> None:
+        _, _, own, cumulative, _ = stats.stats[func]
+        share = seconds / cumulative if cumulative else 0.0
+        stack = (*stack, _format_frame(func))
+        children = callees.get(func, []) if len(stack) < MAX_STACK_DEPTH else []
+        own += sum(edge for callee, edge in children if _format_frame(callee) in stack)
+        stacks[stack] = stacks.get(stack, 0.0) + own * share
+        for callee, edge in children:
+            # paths below a microsecond are dropped, which keeps the number of reconstructed stacks small
+            if edge * share >= 1e-6 and _format_frame(callee) not in stack:
+                walk(callee, stack, edge * share)
+
+    for func, (_, _, _, cumulative, callers) in stats.stats.items():
+        if not callers:
+            walk(func, (), cumulative)
+
+    return [
+        (";".join(stack), round(seconds * 1e6))
+        for stack, seconds in stacks.items()
+        if round(seconds * 1e6) > 0
+    ]
+
+
+def format_report(stats: pstats.Stats, snapshot: tracemalloc.Snapshot) -> str:
+    """
+    Format the own time and the allocations of a profile by package and the top allocating lines.
+
+    :param stats: the profile statistics
+    :param snapshot: the tracemalloc snapshot
+    :return: the report text
+    """
+
+    cpu = {}
+    for (filename, _, _), (_, _, own, _, _) in stats.stats.items():
+        package = get_package(filename)
+        cpu[package] = cpu.get(package, 0.0) + own
+
+    snapshot = snapshot.filter_traces(
+        [
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, __file__),
+        ]
+    )
+    allocations = snapshot.statistics("lineno")
+    memory = {}
+    for statistic in allocations:
+        package = get_package(statistic.traceback[0].filename)
+        memory[package] = memory.get(package, 0) + statistic.size
+
+    lines = [f"Total time: {stats.total_tt:.3f}s", "", "Own time by package:"]
+    for package, seconds in sorted(cpu.items(), key=lambda item: -item[1]):
+        lines.append(f"  {package:<24} {seconds:10.3f}s")
+    lines += ["", "Allocated memory by package:"]
+    for package, size in sorted(memory.items(), key=lambda item: -item[1]):
+        lines.append(f"  {package:<24} {size / 1024:10.1f} KiB")
+    lines += ["", f"Top {TOP_ALLOCATIONS} allocating lines:"]
+    for statistic in allocations[:TOP_ALLOCATIONS]:
+        frame = statistic.traceback[0]
+        lines.append(
+            f"  {statistic.size / 1024:10.1f} KiB {statistic.count:8d} blocks  {frame.filename}:{frame.lineno}"
+        )
+    return "\n".join(lines) + "\n"
+
+
+def get_package(filename: str) -> str:
+    """
+    Get the top level package of a source file, so that the time and the allocations can be attributed to the
+    plugin and its dependencies.
+
+    :param filename: the source file of a frame
+    :return: the package name, stdlib for the standard library or builtins for C functions
+    """
+
+    if filename == "~" or filename.startswith("<"):
+        return "builtins"
+
+    path = os.path.abspath(filename)
+    parts = path.split(os.sep)
+    for marker in ("site-packages", "dist-packages"):
+        if marker in parts:
+            index = len(parts) - 1 - parts[::-1].index(marker)
+            package = parts[index + 1] if index + 1 < len(parts) else "other"
+            return package.removesuffix(".py")
+    if path.startswith(_PLUGIN_DIR + os.sep):
+        return "certbot_dns_porkbun"
+    if path.startswith(_STDLIB_DIR + os.sep):
+        return "stdlib"
+    return "other"
+
+
+def _thread_profiler_hook(profilers: list[cProfile.Profile]):
+    """
+    Get the profile hook of new threads, which replaces itself with a cProfile profiler on the first event. It is only
+    used before Python 3.12, where each thread has its own profiler.
+
+    :param profilers: the list to add the profilers of the threads to
+    :return: the hook for threading.setprofile
+    """
+
+    lock = threading.Lock()
+
+    def hook(*_) -> None:
+        sys.setprofile(None)
+        profiler = cProfile.Profile()
+        with lock:
+            profilers.append(profiler)
+        profiler.enable()
+
+    return hook
+
+
+def _merge_stats(
+    profiler: cProfile.Profile, thread_profilers: list[cProfile.Profile]
+) -> pstats.Stats:
+    # the worker threads of the profiled block have finished, so their profilers are no longer active
+    stats = pstats.Stats(profiler)
+    for thread_profiler in thread_profilers:
+        stats.add(thread_profiler)
+    return stats
+
+
+def _format_frame(func: tuple[str, int, str]) -> str:
+    filename, lineno, name = func
+    if filename == "~":
+        return name
+    return f"{name} ({os.path.basename(filename)}:{lineno})"
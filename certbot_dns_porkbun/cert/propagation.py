@@ -0,0 +1,341 @@
+"""
+Active propagation checks for the DNS-01 challenge TXT records.
+"""
+
+import logging
+import threading
+import time
+from typing import NamedTuple
+
+import dns.exception
+import dns.inet
+import dns.message
+import dns.rdatatype
+from certbot import errors
+
+from certbot_dns_porkbun.cert.resolvers import (
+    DEFAULT_DNS_PORT,
+    DEFAULT_QUERY_TIMEOUT,
+    query_nameserver,
+)
+
+logger = logging.getLogger(__name__)
+
+
+def parse_nameservers(value: str) -> list[tuple[str, int]]:
+    """
+    Parse a comma separated list of nameserver addresses.
+    Each entry is an IP address with an optional port separated by a colon, IPv6 addresses with a port have to be
+    enclosed in brackets.
+
+    :param value: the comma separated list of nameservers, e.g. "192.0.2.1,192.0.2.2:5353,[2001:db8::1]:53"
+    :return: a list of (address, port) tuples
+
+    :raise PluginError: if an entry is not an IP address or its port is invalid
+    """
+
+    nameservers = []
+    for entry in value.split(","):
+        entry = entry.strip()
+        if not entry:
+            continue
+
+        port_text = str(DEFAULT_DNS_PORT)
+        if entry.startswith("["):
+            address, _, rest = entry[1:].partition("]")
+            if rest.startswith(":"):
+                port_text = rest[1:]
+        elif entry.count(":") == 1:
+            address, port_text = entry.split(":")
+        else:
+            address = entry
+
+        if not dns.inet.is_address(address):
+            raise errors.PluginError(
+                f"Invalid nameserver {entry}, expected an IP address with an optional port"
+            )
+        if not port_text.isdigit() or not 0 < int(port_text) < 65536:
+            raise errors.PluginError(
+                f"Invalid port of nameserver {entry}, expected a number between 1 and 65535"
+            )
+
+        nameservers.append((address, int(port_text)))
+
+    return nameservers
+
+
+def query_txt_values(
+    fqdn: str, nameserver: tuple[str, int], timeout: float = DEFAULT_QUERY_TIMEOUT
+) -> set[str]:
+    """
+    Query a single nameserver for the TXT record values of the provided name.
+    Truncated UDP answers are retried over TCP.
+
+    :param fqdn: the fully qualified name to query the TXT records for
+    :param nameserver: the (address, port) tuple of the nameserver to query
+    :param timeout: the timeout in seconds for a single query
+    :return: the set of TXT values served for the name, empty if the query failed
+    """
+
+    query = dns.message.make_query(fqdn, dns.rdatatype.TXT)
+    try:
+        response = query_nameserver(query, nameserver, timeout)
+    except (dns.exception.DNSException, OSError) as e:
+        logger.debug("TXT query for '%s' at %s:%d failed: %s", fqdn, *nameserver, e)
+        return set()
+
+    values = set()
+    for rrset in response.answer:
+        if rrset.rdtype != dns.rdatatype.TXT:
+            continue
+        for rdata in rrset:
+            values.add(b"".join(rdata.strings).decode())
+
+    return values
+
+
+def wait_for_propagation(  # pylint: disable=too-many-arguments,too-many-positional-arguments
+    expected: dict[str, set[str]],
+    nameservers: dict[str, list[tuple[str, int]]],
+    timeout: float,
+    interval: float,
+    quorum: int = 0,
+    query_timeout: float = DEFAULT_QUERY_TIMEOUT,
+) -> bool:
+    """
+    Poll the nameservers until all expected TXT values are served or the timeout is reached.
+
+    :param expected: mapping of the fully qualified names to the TXT values which must be served
+    :param nameservers: mapping of the fully qualified names to the nameservers which have to serve them
+    :param timeout: the maximum number of seconds to wait
+    :param interval: the number of seconds to wait between two polling rounds
+    :param quorum: the number of nameservers per name which must serve all values, 0 means all nameservers
+    :param query_timeout: the timeout in seconds for a single query
+    :return: True if all values were seen before the timeout, otherwise False
+    """
+
+    deadline = time.monotonic() + timeout
+    pending = dict(expected)
+
+    while True:
+        for fqdn, values in list(pending.items()):
+            if _is_propagated(fqdn, values, nameservers[fqdn], quorum, query_timeout):
+                del pending[fqdn]
+
+        if not pending:
+            return True
+
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            logger.warning(
+                "Challenge TXT records for %s are not yet served by the nameservers",
+                ", ".join(sorted(pending)),
+            )
+            return False
+
+        time.sleep(min(interval, remaining))
+
+
+def _is_propagated(
+    fqdn: str,
+    values: set[str],
+    servers: list[tuple[str, int]],
+    quorum: int,
+    query_timeout: float,
+) -> bool:
+    """
+    Check whether enough nameservers serve all expected TXT values of a name.
+
+    :param fqdn: the fully qualified name to check
+    :param values: the TXT values which must be served
+    :param servers: the nameservers which have to serve them
+    :param quorum: the number of nameservers which must serve all values, 0 means all nameservers
+    :param query_timeout: the timeout in seconds for a single query
+    :return: True if the quorum of nameservers serves all values, always False without nameservers
+    """
+
+    if not servers:
+        return False
+
+    required = len(servers) if quorum <= 0 else min(quorum, len(servers))
+    seen = sum(
+        1
+        for server in servers
+        if values <= query_txt_values(fqdn, server, query_timeout)
+    )
+    if seen < required:
+        return False
+
+    logger.info(
+        "Challenge TXT records for '%s' are served by %d of %d nameservers",
+        fqdn,
+        seen,
+        len(servers),
+    )
+    return True
+
+
+class _PendingName(NamedTuple):
+    values: set[str]
+    nameservers: list[tuple[str, int]]
+    deadline: float
+    next_check: float
+
+
+class PropagationTracker:  # pylint: disable=too-many-instance-attributes
+    """
+    Poll the nameservers in a background thread for the TXT records of names which are added while other records
+    are still created, so that the propagation of the first records is already checked while the last ones are
+    written. Each name is polled until it is served or its own timeout is reached.
+    """
+
+    def __init__(
+        self,
+        interval: float,
+        quorum: int = 0,
+        query_timeout: float = DEFAULT_QUERY_TIMEOUT,
+    ) -> None:
+        """
+        Creates a new PropagationTracker object and starts polling.
+
+        :param interval: the number of seconds between two checks of a name
+        :param quorum: the number of nameservers per name which must serve all values, 0 means all nameservers
+        :param query_timeout: the timeout in seconds for a single query
+        """
+
+        self.interval = interval
+        self.quorum = quorum
+        self.query_timeout = query_timeout
+        self.timed_out = []
+        self._pending = {}
+        self._failed = set()
+        self._closed = False
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = threading.Thread(
+            target=self._run, name="propagation-tracker", daemon=True
+        )
+        self._thread.start()
+
+    def add(
+        self,
+        fqdn: str,
+        values: set[str],
+        nameservers: list[tuple[str, int]],
+        timeout: float,
+    ) -> None:
+        """
+        Start polling the nameservers for the TXT values of a name.
+
+        :param fqdn: the fully qualified name to check
+        :param values: the TXT values which must be served, added to the values of the name if already polled
+        :param nameservers: the nameservers which have to serve the values
+        :param timeout: the maximum number of seconds to wait for the name from now
+        """
+
+        now = time.monotonic()
+        with self._lock:
+            entry = self._pending.get(fqdn)
+            if entry is not None:
+                values = entry.values | values
+            self._pending[fqdn] = _PendingName(
+                set(values), nameservers, now + timeout, now
+            )
+        self._wakeup.set()
+
+    def wait(self) -> bool:
+        """
+        Wait until all added names are served or their timeouts are reached. No names can be added afterwards.
+        If the polling failed, the remaining time until the timeouts of the unchecked names is waited instead.
+
+        :return: True if all values were seen before their timeouts, otherwise False
+        """
+
+        with self._lock:
+            self._closed = True
+        self._wakeup.set()
+        self._thread.join()
+
+        # the polling thread only finishes with pending names if it failed
+        with self._lock:
+            unchecked = dict(self._pending)
+            self._pending.clear()
+        if unchecked:
+            deadline = max(entry.deadline for entry in unchecked.values())
+            remaining = max(0.0, deadline - time.monotonic())
+            logger.warning(
+                "Propagation check failed, waiting the remaining %.0f seconds for DNS changes to propagate",
+                remaining,
+            )
+            time.sleep(remaining)
+            self.timed_out.extend(sorted(unchecked))
+
+        if self.timed_out:
+            logger.warning(
+                "Challenge TXT records for %s are not yet served by the nameservers",
+                ", ".join(sorted(self.timed_out)),
+            )
+        return not self.timed_out
+
+    def cancel(self) -> None:
+        """
+        Stop polling all names without waiting for them.
+        """
+
+        with self._lock:
+            self._pending.clear()
+            self._closed = True
+        self._wakeup.set()
+        self._thread.join()
+
+    def _run(self) -> None:
+        while True:
+            self._wakeup.clear()
+            with self._lock:
+                pending = dict(self._pending)
+                closed = self._closed
+            if not pending and closed:
+                return
+
+            for fqdn, entry in pending.items():
+                now = time.monotonic()
+                if entry.next_check > now and entry.deadline > now:
+                    continue
+                try:
+                    propagated = _is_propagated(
+                        fqdn,
+                        entry.values,
+                        entry.nameservers,
+                        self.quorum,
+                        self.query_timeout,
+                    )
+                except (dns.exception.DNSException, OSError, ValueError) as e:
+                    # e.g. a nameserver which is not an IP address, the name is polled until its timeout
+                    if fqdn not in self._failed:
+                        self._failed.add(fqdn)
+                        logger.warning("Propagation check of '%s' failed: %s", fqdn, e)
+                    propagated = False
+                expired = not propagated and entry.deadline <= time.monotonic()
+                with self._lock:
+                    # the values may have been extended in the meantime
+                    if self._pending.get(fqdn) is not entry:
+                        continue
+                    if propagated or expired:
+                        del self._pending[fqdn]
+                        if expired:
+                            self.timed_out.append(fqdn)
+                    else:
+                        self._pending[fqdn] = entry._replace(
+                            next_check=time.monotonic() + self.interval
+                        )
+
+            # sleep until the next check is due or a name is added
+            with self._lock:
+                due = [
+                    min(entry.next_check, entry.deadline)
+                    for entry in self._pending.values()
+                ]
+            if due:
+                self._wakeup.wait(max(0.0, min(due) - time.monotonic()))
+            elif not closed:
+                self._wakeup.wait()
@@ -0,0 +1,345 @@
+"""
+Resolution of the challenge domains either with a recursive resolver or directly at the authoritative nameservers of
+the zones.
+"""
+
+import logging
+import socket
+import threading
+import time
+from collections.abc import Callable
+
+import dns.exception
+import dns.flags
+import dns.message
+import dns.name
+import dns.query
+import dns.rcode
+import dns.rdataclass
+import dns.rdatatype
+from dns import resolver
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_DNS_PORT = 53
+
+DEFAULT_QUERY_TIMEOUT = 5.0
+
+# maximum number of CNAME records and delegations followed to resolve a name
+MAX_RESOLUTION_STEPS = 16
+
+
+def has_route(address: str) -> bool:
+    """
+    Check whether the host has a route to an address, e.g. hosts without IPv6 connectivity can not reach the IPv6
+    addresses of nameservers. Connecting a UDP socket does not send any packets.
+
+    :param address: the IPv4 or IPv6 address
+    :return: True if the address is reachable, otherwise False
+    """
+
+    family = socket.AF_INET6 if ":" in address else socket.AF_INET
+    try:
+        with socket.socket(family, socket.SOCK_DGRAM) as sock:
+            sock.connect((address, DEFAULT_DNS_PORT))
+    except OSError:
+        return False
+    return True
+
+
+def query_nameserver(
+    query: dns.message.Message,
+    nameserver: tuple[str, int],
+    timeout: float = DEFAULT_QUERY_TIMEOUT,
+) -> dns.message.Message:
+    """
+    Send a query to a single nameserver over UDP and retry it over TCP if the answer is truncated.
+
+    :param query: the query message
+    :param nameserver: the (address, port) tuple of the nameserver to query
+    :param timeout: the timeout in seconds for a single query
+    :return: the response message
+
+    :raise DNSException: if the query failed
+    :raise OSError: if the nameserver is not reachable
+    """
+
+    address, port = nameserver
+    response = dns.query.udp(query, address, port=port, timeout=timeout)
+    if response.flags & dns.flags.TC:
+        response = dns.query.tcp(query, address, port=port, timeout=timeout)
+    return response
+
+
+def create_recursive_resolver(nameservers: list[tuple[str, int]]) -> resolver.Resolver:
+    """
+    Create a recursive resolver using the provided nameservers instead of the resolvers configured on the host.
+
+    :param nameservers: list of (address, port) tuples
+    :return: the Resolver object
+    """
+
+    recursive_resolver = resolver.Resolver(configure=False)
+    recursive_resolver.nameservers = [address for address, _ in nameservers]
+    recursive_resolver.nameserver_ports = dict(nameservers)
+    return recursive_resolver
+
+
+class RecursiveResolver:  # pylint: disable=too-few-public-methods
+    """
+    Resolve the canonical name of a domain with a recursive resolver.
+    """
+
+    def __init__(self, recursive_resolver: resolver.Resolver | None = None) -> None:
+        """
+        Creates a new RecursiveResolver object.
+
+        :param recursive_resolver: the resolver to use, None to use the resolvers configured on the host
+        """
+
+        self.resolver = recursive_resolver
+
+    def resolve_canonical_name(
+        self, name: str, _find_zone: Callable[[str], str] | None = None
+    ) -> tuple[str, float | None]:
+        """
+        Resolve the canonical name of a domain by following all CNAME and DNAME records.
+
+        :param name: the domain to resolve
+        :param _find_zone: unused, the recursive resolver finds the zones itself
+        :return: a tuple of the canonical name and the number of seconds the resolution is valid, None if the name
+                 does not exist
+        """
+
+        resolve = resolver.resolve if self.resolver is None else self.resolver.resolve
+        try:
+            answer = resolve(name, raise_on_no_answer=False)
+        except resolver.NXDOMAIN as e:
+            return e.canonical_name.to_text(), None
+        except resolver.NoAnswer:
+            return name, None
+
+        return get_answer_resolution(answer)
+
+
+def get_answer_resolution(answer: resolver.Answer) -> tuple[str, float]:
+    """
+    Get the canonical name of an answer of a recursive resolver and the number of seconds it is valid.
+
+    :param answer: the answer of the recursive resolver
+    :return: a tuple of the canonical name and the remaining TTL of the answer in seconds
+    """
+
+    return answer.canonical_name.to_text(), max(0.0, answer.expiration - time.time())
+
+
+class NameserverCache:
+    """
+    Thread-safe cache of the authoritative nameservers of zones which expire after the TTL of the DNS answers.
+    """
+
+    def __init__(self) -> None:
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def get(self, zone: str) -> list[tuple[str, int]] | None:
+        """
+        Get the cached nameservers of a zone.
+
+        :param zone: the zone
+        :return: a list of (address, port) tuples or None if not cached or expired
+        """
+
+        with self._lock:
+            entry = self._entries.get(zone)
+            if entry is None or entry[1] <= time.monotonic():
+                self._entries.pop(zone, None)
+                return None
+            return entry[0]
+
+    def put(self, zone: str, nameservers: list[tuple[str, int]], ttl: float) -> None:
+        """
+        Cache the nameservers of a zone.
+
+        :param zone: the zone
+        :param nameservers: a list of (address, port) tuples
+        :param ttl: the number of seconds the nameservers are valid
+        """
+
+        with self._lock:
+            self._entries[zone] = (nameservers, time.monotonic() + ttl)
+
+
+class AuthoritativeResolver:
+    """
+    Resolve the canonical name of a domain by querying the authoritative nameservers of the zones directly, so that
+    no stale answers of recursive resolvers are used. The nameservers of each zone are discovered with the recursive
+    resolver once and cached for the TTL of their NS, A and AAAA records.
+    """
+
+    def __init__(
+        self,
+        recursive_resolver: resolver.Resolver | None = None,
+        port: int = DEFAULT_DNS_PORT,
+        timeout: float = DEFAULT_QUERY_TIMEOUT,
+    ) -> None:
+        """
+        Creates a new AuthoritativeResolver object.
+
+        :param recursive_resolver: the resolver to discover the nameservers with, None to use the resolvers
+                                   configured on the host
+        :param port: the port of the authoritative nameservers
+        :param timeout: the timeout in seconds for a single query
+        """
+
+        self.resolver = recursive_resolver
+        self.port = port
+        self.timeout = timeout
+        self.cache = NameserverCache()
+
+    def zone_nameservers(self, zone: str) -> list[tuple[str, int]]:
+        """
+        Get the addresses of the authoritative nameservers of a zone. The IPv4 addresses of each nameserver come
+        before its IPv6 addresses, IPv6 addresses are skipped if the host has no route to them.
+
+        :param zone: the zone to get the authoritative nameservers for
+        :return: a list of (address, port) tuples
+
+        :raise DNSException: if the nameservers can not be resolved
+        """
+
+        zone = zone.rstrip(".").lower()
+        nameservers = self.cache.get(zone)
+        if nameservers is not None:
+            return nameservers
+
+        resolve = resolver.resolve if self.resolver is None else self.resolver.resolve
+        ns_answer = resolve(zone, "NS")
+        ttl = ns_answer.rrset.ttl
+        nameservers = []
+        for ns_record in ns_answer:
+            for rdtype in ("A", "AAAA"):
+                try:
+                    address_answer = resolve(ns_record.target, rdtype)
+                except dns.exception.DNSException as e:
+                    logger.debug(
+                        "Could not resolve %s of nameserver %s: %s",
+                        rdtype,
+                        ns_record.target,
+                        e,
+                    )
+                    continue
+                ttl = min(ttl, address_answer.rrset.ttl)
+                for address_record in address_answer:
+                    if rdtype == "A" or has_route(address_record.address):
+                        nameservers.append((address_record.address, self.port))
+
+        if not nameservers:
+            raise dns.exception.DNSException(
+                f"No nameserver addresses found for {zone}"
+            )
+
+        logger.debug(
+            "Authoritative nameservers of %s: %s",
+            zone,
+            ", ".join(address for address, _ in nameservers),
+        )
+        self.cache.put(zone, nameservers, ttl)
+        return nameservers
+
+    def query(
+        self, zone: str, name: dns.name.Name, rdtype: dns.rdatatype.RdataType
+    ) -> dns.message.Message:
+        """
+        Query the authoritative nameservers of a zone until one of them answers.
+
+        :param zone: the zone of the name
+        :param name: the name to query
+        :param rdtype: the record type to query
+        :return: the response message
+
+        :raise DNSException: if none of the nameservers answered
+        """
+
+        query = dns.message.make_query(name, rdtype)
+        last_error = None
+        for nameserver in self.zone_nameservers(zone):
+            try:
+                return query_nameserver(query, nameserver, self.timeout)
+            except (dns.exception.DNSException, OSError) as e:
+                logger.debug("Query for '%s' at %s:%d failed: %s", name, *nameserver, e)
+                last_error = e
+
+        raise dns.exception.DNSException(
+            f"No authoritative nameserver of {zone} answered: {last_error}"
+        )
+
+    def resolve_canonical_name(
+        self, name: str, find_zone: Callable[[str], str]
+    ) -> tuple[str, float | None]:
+        """
+        Resolve the canonical name of a domain by following all CNAME records, also across zones.
+        Synthesized CNAME records of DNAME records are followed as well.
+
+        :param name: the domain to resolve
+        :param find_zone: function returning the zone of a name, e.g. the registered domain
+        :return: a tuple of the canonical name and the number of seconds the resolution is valid, None if the name
+                 has no records
+
+        :raise DNSException: if the name can not be resolved
+        """
+
+        current = dns.name.from_text(name)
+        zone = find_zone(current.to_text())
+        ttl = None
+
+        for _ in range(MAX_RESOLUTION_STEPS):
+            response = self.query(zone, current, dns.rdatatype.TXT)
+
+            # follow the referral to a delegated zone
+            if not response.flags & dns.flags.AA and not response.answer:
+                delegation = next(
+                    (
+                        rrset
+                        for rrset in response.authority
+                        if rrset.rdtype == dns.rdatatype.NS
+                    ),
+                    None,
+                )
+                if delegation is not None:
+                    zone = delegation.name.to_text()
+                    continue
+
+            # follow the CNAME chain contained in the answer
+            while True:
+                cname = response.get_rrset(
+                    response.answer,
+                    current,
+                    dns.rdataclass.IN,
+                    dns.rdatatype.CNAME,
+                )
+                if cname is None:
+                    break
+                ttl = cname.ttl if ttl is None else min(ttl, cname.ttl)
+                current = cname[0].target
+
+            data = response.get_rrset(
+                response.answer, current, dns.rdataclass.IN, dns.rdatatype.TXT
+            )
+            if data is not None:
+                ttl = data.ttl if ttl is None else min(ttl, data.ttl)
+                return current.to_text(), ttl
+
+            # the chain continues in another zone, whose nameservers have to be queried
+            if response.rcode() == dns.rcode.NOERROR and not current.is_subdomain(
+                dns.name.from_text(zone)
+            ):
+                zone = find_zone(current.to_text())
+                continue
+
+            # the canonical name has no TXT records, but the followed CNAME records are still valid
+            return current.to_text(), ttl
+
+        raise dns.exception.DNSException(
+            f"Too many CNAME records or delegations for {name}"
+        )
@@ -0,0 +1,323 @@
+"""
+Long-running service which performs the DNS-01 challenges of many certbot runs, so that the Python startup, the plugin
+import, the credentials, the Porkbun API connections and the resolver caches are shared by all certificates.
+
+The service accepts the challenges over a local Unix socket and is used by certbot with the manual authenticator and
+the thin hook command:
+
+    certbot-dns-porkbun-daemon --dns-porkbun-credentials /etc/letsencrypt/porkbun.ini
+
+    certbot certonly --manual --preferred-challenges dns \\
+        --manual-auth-hook "certbot-dns-porkbun-hook auth" \\
+        --manual-cleanup-hook "certbot-dns-porkbun-hook cleanup" \\
+        -d example.com
+
+The hook command only imports the standard library to keep its startup fast.
+"""
+
+import argparse
+import json
+import logging
+import os
+import signal
+import socket
+import socketserver
+import sys
+import threading
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SOCKET_PATH = "/run/certbot-dns-porkbun.sock"
+
+PLUGIN_NAME = "dns-porkbun"
+
+
+class ChallengeService:  # pylint: disable=too-few-public-methods
+    """
+    Thread-safe dispatcher of the challenge requests to a single shared authenticator.
+    The challenges of a certificate are collected in a session until the last one is performed, then the propagation
+    of all of them is waited for once. The session is finished with the cleanup of the last challenge.
+    """
+
+    def __init__(self, authenticator) -> None:
+        """
+        Creates a new ChallengeService object.
+
+        :param authenticator: the started Authenticator performing the challenges
+        """
+
+        self.authenticator = authenticator
+        self._sessions = {}
+        self._lock = threading.Lock()
+
+    def handle(self, request: dict) -> dict:
+        """
+        Handle a single challenge request.
+
+        :param request: the request json with the action (auth, cleanup or ping), domain, validation, the number of
+                        remaining challenges and the session of the certificate
+        :return: the response json with the status and the error message if the request failed
+        """
+
+        action = request.get("action")
+        session = request.get("session")
+        try:
+            if action == "auth":
+                challenge = self.authenticator.perform_challenge(
+                    request["domain"], request["validation"]
+                )
+                with self._lock:
+                    self._sessions.setdefault(session, []).append(challenge)
+                    challenges = None
+                    if int(request.get("remaining", 0)) <= 0:
+                        challenges = self._sessions.pop(session)
+                if challenges is not None:
+                    self.authenticator.wait_for_propagation(challenges)
+            elif action == "cleanup":
+                with self._lock:
+                    self._sessions.pop(session, None)
+                try:
+                    self.authenticator.cleanup_challenge(
+                        request["domain"], request["validation"]
+                    )
+                finally:
+                    if int(request.get("remaining", 0)) <= 0:
+                        self.authenticator.finish_session()
+            elif action != "ping":
+                return {"status": "ERROR", "message": f"Unknown action {action}"}
+        except Exception as e:  # pylint: disable=broad-exception-caught
+            # the daemon keeps serving, the error is sent to the hook of the certificate
+            logger.exception("Challenge request %s failed", action)
+            return {"status": "ERROR", "message": str(e)}
+
+        return {"status": "SUCCESS"}
+
+
+class _RequestHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        # one json request per line
+        for line in self.rfile:
+            try:
+                request = json.loads(line)
+            except ValueError as e:
+                response = {"status": "ERROR", "message": f"Invalid request: {e}"}
+            else:
+                response = self.server.service.handle(request)
+            self.wfile.write(json.dumps(response).encode() + b"\n")
+
+
+class ChallengeServer(socketserver.ThreadingUnixStreamServer):
+    """
+    Unix socket server handling the requests of each connection in its own thread.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, socket_path: str, service: ChallengeService) -> None:
+        """
+        Creates a new ChallengeServer object and binds the socket, which is only accessible by the owner.
+
+        :param socket_path: the path of the Unix socket, an existing socket is replaced
+        :param service: the service handling the requests
+        """
+
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)
+
+        old_umask = os.umask(0o177)
+        try:
+            super().__init__(socket_path, _RequestHandler)
+        finally:
+            os.umask(old_umask)
+        self.service = service
+
+    def server_close(self) -> None:
+        super().server_close()
+        try:
+            os.unlink(self.server_address)
+        except OSError:
+            pass
+
+
+def send_request(socket_path: str, request: dict, timeout: float | None = None) -> dict:
+    """
+    Send a single request to the service.
+
+    :param socket_path: the path of the Unix socket of the service
+    :param request: the request json
+    :param timeout: the timeout in seconds, None to wait until the service answers
+    :return: the response json
+
+    :raise OSError: if the service is not reachable
+    """
+
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.settimeout(timeout)
+        sock.connect(socket_path)
+        with sock.makefile("rwb") as f:
+            f.write(json.dumps(request).encode() + b"\n")
+            f.flush()
+            line = f.readline()
+
+    if not line:
+        raise ConnectionError("The service closed the connection without a response")
+    return json.loads(line)
+
+
+def add_authenticator_arguments(parser: argparse.ArgumentParser) -> None:
+    """
+    Add the certbot directories, the verbosity and all options of the plugin to a command line parser.
+
+    :param parser: the ArgumentParser object to add the arguments to
+    """
+
+    # pylint: disable=import-outside-toplevel
+    from certbot_dns_porkbun.cert.client import Authenticator
+
+    parser.add_argument("--config-dir", default="/etc/letsencrypt")
+    parser.add_argument("--work-dir", default="/var/lib/letsencrypt")
+    parser.add_argument("--logs-dir", default="/var/log/letsencrypt")
+    parser.add_argument(
+        "-v", "--verbose", action="store_true", help="log debug messages"
+    )
+    Authenticator.inject_parser_options(parser, PLUGIN_NAME)
+
+
+def create_parser() -> argparse.ArgumentParser:
+    """
+    Create the command line parser of the service with all options of the plugin.
+
+    :return: the ArgumentParser object
+    """
+
+    parser = argparse.ArgumentParser(
+        description="Serve the DNS-01 challenges of certbot runs using the manual authenticator hooks over a Unix "
+        "socket.",
+    )
+    parser.add_argument(
+        "--socket", default=DEFAULT_SOCKET_PATH, help="path of the Unix socket"
+    )
+    add_authenticator_arguments(parser)
+    return parser
+
+
+def create_config(args: argparse.Namespace):
+    """
+    Create the certbot configuration from the parsed command line arguments.
+
+    :param args: the parsed command line arguments
+    :return: the NamespaceConfig object
+    """
+
+    # pylint: disable=import-outside-toplevel
+    from certbot.configuration import NamespaceConfig
+
+    return NamespaceConfig(
+        argparse.Namespace(
+            http01_port=80,
+            https_port=443,
+            domains=[],
+            strict_permissions=False,
+            **vars(args),
+        )
+    )
+
+
+def create_authenticator(args: argparse.Namespace):
+    """
+    Create the authenticator from the parsed plugin options like certbot does.
+
+    :param args: the parsed command line arguments
+    :return: the Authenticator object
+    """
+
+    # pylint: disable=import-outside-toplevel
+    from certbot._internal.display import obj as display_obj
+
+    from certbot_dns_porkbun.cert.client import Authenticator
+
+    # the authenticator reports the propagation wait on the certbot display
+    display_obj.set_display(display_obj.NoninteractiveDisplay(sys.stdout))
+
+    return Authenticator(create_config(args), PLUGIN_NAME)
+
+
+def configure_logging(verbose: bool) -> None:
+    """
+    Log to stderr with timestamps.
+
+    :param verbose: whether debug messages are logged
+    """
+
+    logging.basicConfig(
+        level=logging.DEBUG if verbose else logging.INFO,
+        format="%(asctime)s %(levelname)s %(message)s",
+    )
+
+
+def serve_main(argv: list[str] | None = None) -> None:
+    """
+    Run the service until it is terminated.
+
+    :param argv: the command line arguments, defaults to the arguments of the process
+    """
+
+    parser = create_parser()
+    args = parser.parse_args(argv)
+    if args.dns_porkbun_plan:
+        parser.error("--dns-porkbun-plan is not supported by the service")
+
+    configure_logging(args.verbose)
+
+    authenticator = create_authenticator(args)
+    authenticator.start_service()
+
+    # stop gracefully on SIGTERM like on Ctrl+C
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+
+    with ChallengeServer(args.socket, ChallengeService(authenticator)) as server:
+        logger.info("Serving challenges on %s", args.socket)
+        try:
+            server.serve_forever()
+        except (KeyboardInterrupt, SystemExit):
+            pass
+        finally:
+            authenticator.stop_service()
+
+
+def hook_main(argv: list[str] | None = None) -> None:
+    """
+    Forward the challenge of a certbot manual authenticator hook to the service.
+    The challenge is read from the environment variables set by certbot.
+
+    :param argv: the command line arguments, defaults to the arguments of the process
+    """
+
+    parser = argparse.ArgumentParser(
+        description="Certbot manual authenticator hook forwarding the challenge to the certbot-dns-porkbun-daemon.",
+    )
+    parser.add_argument("action", choices=["auth", "cleanup"])
+    parser.add_argument(
+        "--socket", default=DEFAULT_SOCKET_PATH, help="path of the Unix socket"
+    )
+    args = parser.parse_args(argv)
+
+    domain = os.environ["CERTBOT_DOMAIN"]
+    request = {
+        "action": args.action,
+        "domain": domain,
+        "validation": os.environ["CERTBOT_VALIDATION"],
+        "remaining": int(os.environ.get("CERTBOT_REMAINING_CHALLENGES", "0")),
+        # all challenges of a certificate share the same list of domains
+        "session": os.environ.get("CERTBOT_ALL_DOMAINS", domain),
+    }
+
+    try:
+        response = send_request(args.socket, request)
+    except OSError as e:
+        sys.exit(
+            f"Could not reach the certbot-dns-porkbun-daemon at {args.socket}: {e}"
+        )
+
+    if response.get("status") != "SUCCESS":
+        sys.exit(response.get("message", "Unknown error"))
@@ -0,0 +1,164 @@
+"""
+Resolve the challenge names of many domains, e.g. to audit the CNAME records of the challenge names of a fleet before
+a renewal. The domains are read from the command line, a file or stdin, one per line, and resolved in parallel like
+by the authenticator:
+
+    certbot-dns-porkbun-resolve --input domains.txt --max-concurrency 16 > challenges.jsonl
+
+Each domain is written as a JSON line to stdout as soon as its lookup finished, in the order of the input:
+
+    {"domain": "www.example.com", "challenge_name": "_acme-challenge.www.example.com", "root_domain": "example.net",
+     "name": "_acme-challenge", "ttl": 300.0, "delegated": true, "seconds": 0.012, "cached": false, "error": null}
+
+The exit status is 1 if the challenge name of any domain could not be resolved.
+"""
+
+import argparse
+import contextlib
+import itertools
+import json
+import logging
+import sys
+from collections.abc import Iterable, Iterator
+from typing import TextIO
+
+from certbot import errors
+
+from certbot_dns_porkbun.cert.client import (
+    DEFAULT_MAX_CONCURRENCY,
+    RESOLVER_AUTHORITATIVE,
+    RESOLVER_SYSTEM,
+    ChallengeResolution,
+    resolve_challenge_domains,
+)
+
+
+def create_dns_resolver(selection: str):
+    """
+    Create the resolver of a --resolver selection. Its answers are cached, so that the names shared by the challenge
+    names of many domains, e.g. a common CNAME target, are only queried once.
+
+    :param selection: 'system', 'authoritative' or a comma separated list of resolver addresses
+    :return: the RecursiveResolver or AuthoritativeResolver object
+    """
+
+    # pylint: disable=import-outside-toplevel
+    from dns import resolver
+
+    from certbot_dns_porkbun.cert import propagation
+    from certbot_dns_porkbun.cert.resolvers import (
+        AuthoritativeResolver,
+        RecursiveResolver,
+        create_recursive_resolver,
+    )
+
+    if selection in (RESOLVER_SYSTEM, RESOLVER_AUTHORITATIVE):
+        recursive_resolver = resolver.Resolver()
+    else:
+        recursive_resolver = create_recursive_resolver(
+            propagation.parse_nameservers(selection)
+        )
+    recursive_resolver.cache = resolver.LRUCache()
+
+    if selection == RESOLVER_AUTHORITATIVE:
+        return AuthoritativeResolver(recursive_resolver)
+    return RecursiveResolver(recursive_resolver)
+
+
+def read_domains(lines: Iterable[str]) -> Iterator[str]:
+    """
+    Read the domains of the input lines, blank lines and comments starting with # are skipped.
+
+    :param lines: the input lines
+    :return: the domains
+    """
+
+    for line in lines:
+        domain = line.split("#", 1)[0].strip()
+        if domain:
+            yield domain
+
+
+def format_resolution(resolution: ChallengeResolution) -> str:
+    """
+    Format the resolution of a challenge name as a JSON line.
+
+    :param resolution: the ChallengeResolution object
+    :return: the JSON object without line break
+    """
+
+    entry = resolution._asdict()
+    entry["seconds"] = round(resolution.seconds, 6)
+    if resolution.error is not None:
+        entry["error"] = str(resolution.error) or type(resolution.error).__name__
+        entry["error_type"] = type(resolution.error).__name__
+    return json.dumps(entry)
+
+
+def main(argv: list[str] | None = None, stdout: TextIO | None = None) -> int:
+    """
+    Resolve the challenge names of the domains of the command line and write them as JSON lines.
+
+    :param argv: the command line arguments, defaults to the arguments of the process
+    :param stdout: the stream to write the JSON lines to, defaults to stdout
+    :return: the exit status, 1 if any lookup failed
+    """
+
+    parser = argparse.ArgumentParser(
+        description="Resolve the challenge names of many domains and write them as JSON lines.",
+    )
+    parser.add_argument(
+        "domains", nargs="*", help="domains to resolve, defaults to the input"
+    )
+    parser.add_argument(
+        "--input",
+        help="file with a domain per line, - for stdin, which is the default without domains",
+    )
+    parser.add_argument(
+        "--max-concurrency",
+        type=int,
+        default=DEFAULT_MAX_CONCURRENCY,
+        help="maximum number of lookups in parallel",
+    )
+    parser.add_argument(
+        "--resolver",
+        default=RESOLVER_SYSTEM,
+        help="'system' for the resolvers configured on the host, 'authoritative' to query the authoritative "
+        "nameservers of the zones directly or a comma separated list of resolver addresses (address[:port])",
+    )
+    parser.add_argument(
+        "--suffix-cache-dir",
+        help="directory to persist the parsed public suffix list across runs",
+    )
+    args = parser.parse_args(argv)
+    stdout = stdout or sys.stdout
+
+    logging.basicConfig(level=logging.WARNING, stream=sys.stderr)
+
+    try:
+        dns_resolver = create_dns_resolver(args.resolver)
+    except errors.PluginError as e:
+        parser.error(str(e))
+
+    failed = False
+    with (
+        contextlib.nullcontext(sys.stdin)
+        if args.input in (None, "-")
+        else open(args.input, encoding="utf-8")
+    ) as input_file:
+        domains = iter(args.domains)
+        if args.input is not None or not args.domains:
+            domains = itertools.chain(domains, read_domains(input_file))
+
+        for resolution in resolve_challenge_domains(
+            domains, args.suffix_cache_dir, dns_resolver, args.max_concurrency
+        ):
+            failed = failed or resolution.error is not None
+            stdout.write(format_resolution(resolution) + "\n")
+            stdout.flush()
+
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
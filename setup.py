@@ -1,4 +1,4 @@
-from setuptools import setup, find_packages
+from setuptools import find_packages, setup
 
 import certbot_dns_porkbun
 
@@ -34,12 +34,22 @@ setup(
         "setuptools>=41.6.0",
         "certbot>=1.18.0,<6.0",
         "pkb_client>=2.0,<3.0",
+        "requests>=2.20.0,<3.0",
         "dnspython>=2.0.0,<3.0",
         "tldextract>=5.1.2,<6.0",
     ],
+    extras_require={
+        "asyncio": ["aiohttp>=3.10,<4.0"],
+    },
     entry_points={
         "certbot.plugins": [
             "dns-porkbun = certbot_dns_porkbun.cert.client:Authenticator",
-        ]
+        ],
+        "console_scripts": [
+            "certbot-dns-porkbun-bulk = certbot_dns_porkbun.bulk:main",
+            "certbot-dns-porkbun-resolve = certbot_dns_porkbun.resolve:main",
+            "certbot-dns-porkbun-daemon = certbot_dns_porkbun.daemon:serve_main",
+            "certbot-dns-porkbun-hook = certbot_dns_porkbun.daemon:hook_main",
+        ],
     },
 )
@@ -0,0 +1,285 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from acme import challenges, messages
+from acme import crypto_util as acme_crypto_util
+from cryptography import x509
+
+from certbot_dns_porkbun import bulk
+from tests.helpers import ACCOUNT_KEY, create_authenticator, split_challenge_domain
+from tests.porkbun_stub import FakePorkbunAPI
+
+
+class FakeACMEClient:
+    """
+    Stand-in of the ACME client, which validates the DNS-01 challenges against the records of the fake Porkbun API.
+    """
+
+    def __init__(self, api: FakePorkbunAPI, failing_domains: tuple[str, ...] = ()):
+        self.api = api
+        self.failing_domains = failing_domains
+        self.answered = []
+        self._token = 0
+
+    def new_order(self, csr_pem: bytes) -> messages.OrderResource:
+        csr = x509.load_pem_x509_csr(csr_pem)
+        domains = acme_crypto_util.get_names_from_subject_and_extensions(
+            csr.subject, csr.extensions
+        )
+        if any(domain in self.failing_domains for domain in domains):
+            raise messages.Error(detail="Rejected identifier")
+
+        authorizations = []
+        for domain in domains:
+            self._token += 1
+            challb = messages.ChallengeBody(
+                chall=challenges.DNS01(token=self._token.to_bytes(16, "big")),
+                uri=f"https://ca.example/chall/{self._token}",
+                status=messages.STATUS_PENDING,
+            )
+            authorizations.append(
+                messages.AuthorizationResource(
+                    body=messages.Authorization(
+                        identifier=messages.Identifier(
+                            typ=messages.IDENTIFIER_FQDN, value=domain
+                        ),
+                        challenges=[challb],
+                        status=messages.STATUS_PENDING,
+                    ),
+                    uri=f"https://ca.example/authz/{self._token}",
+                )
+            )
+        return messages.OrderResource(
+            body=messages.Order(),
+            uri="https://ca.example/order",
+            csr_pem=csr_pem,
+            authorizations=authorizations,
+        )
+
+    def answer_challenge(self, challb, response):
+        self.answered.append(challb.uri)
+        # the records of all certificates exist before the first challenge is answered
+        self.validated = [
+            record["content"] for record in self.api.records("example.com")
+        ]
+
+    def poll_and_finalize(self, orderr, deadline=None):
+        return orderr.update(
+            fullchain_pem=f"CERTIFICATE {orderr.authorizations[0].body.identifier.value}"
+        )
+
+
+@mock.patch(
+    "certbot_dns_porkbun.cert.client.resolve_challenge_domain_with_ttl",
+    side_effect=lambda domain, *_: (*split_challenge_domain(domain), 300),
+)
+class TestBulkRenewal(unittest.TestCase):
+    def setUp(self):
+        self.api = FakePorkbunAPI().__enter__()
+        self.authenticator = create_authenticator(
+            porkbun_api_endpoint=self.api.endpoint
+        )
+
+    def tearDown(self):
+        self.api.__exit__()
+
+    def test_single_propagation_wait(self, _):
+        acme = FakeACMEClient(self.api)
+        requests = bulk.parse_certificates(
+            ["example.com,www.example.com", "a.example.com"]
+        )
+
+        with mock.patch.object(
+            self.authenticator,
+            "wait_for_propagation",
+            wraps=self.authenticator.wait_for_propagation,
+        ) as wait:
+            results = bulk.BulkRenewal(self.authenticator, acme, ACCOUNT_KEY).run(
+                requests
+            )
+
+        wait.assert_called_once()
+        self.assertEqual(len(wait.call_args.args[0]), 3)
+        self.assertEqual(len(acme.answered), 3)
+        self.assertEqual(len(acme.validated), 3)
+        self.assertEqual(
+            [(result.name, result.fullchain_pem) for result in results],
+            [
+                ("example.com", "CERTIFICATE example.com"),
+                ("a.example.com", "CERTIFICATE a.example.com"),
+            ],
+        )
+        self.assertEqual(self.api.records("example.com"), [])
+
+    def test_failed_certificate(self, _):
+        acme = FakeACMEClient(self.api, failing_domains=("a.example.com",))
+        requests = bulk.parse_certificates(["a.example.com", "b.example.com"])
+
+        results = bulk.BulkRenewal(self.authenticator, acme, ACCOUNT_KEY).run(requests)
+
+        self.assertIn("Rejected identifier", results[0].error)
+        self.assertIsNone(results[1].error)
+        self.assertEqual(len(acme.answered), 1)
+
+    def test_failed_challenges(self, _):
+        acme = FakeACMEClient(self.api)
+        self.api.owners["example.org"] = "other-key"
+        requests = bulk.parse_certificates(
+            ["example.com", "example.org", "example.net"]
+        )
+
+        with mock.patch.object(
+            self.authenticator,
+            "wait_for_propagation",
+            wraps=self.authenticator.wait_for_propagation,
+        ) as wait:
+            results = bulk.BulkRenewal(self.authenticator, acme, ACCOUNT_KEY).run(
+                requests
+            )
+
+        self.assertIsNone(results[0].error)
+        self.assertIn("not opted in", results[1].error)
+        self.assertIsNone(results[2].error)
+        self.assertEqual(
+            [result.fullchain_pem for result in results],
+            ["CERTIFICATE example.com", None, "CERTIFICATE example.net"],
+        )
+        self.assertEqual(wait.call_count, 2)
+        self.assertEqual(self.api.records("example.com"), [])
+        self.assertEqual(self.api.records("example.net"), [])
+
+    def test_plan_certificates(self, _):
+        requests = bulk.parse_certificates(
+            ["example.com,www.example.com", "example.org"]
+        )
+
+        with mock.patch("builtins.print") as output:
+            bulk.plan_certificates(self.authenticator, requests)
+
+        self.assertIn("3 challenges in 2 root domains", output.call_args.args[0])
+        self.assertNotIn("dns/create", self.api.calls)
+        self.assertEqual(self.api.records("example.com"), [])
+
+    def test_save_certificate(self, _):
+        result = bulk.CertificateResult("example.com", "CERTIFICATE", b"KEY")
+
+        with tempfile.TemporaryDirectory() as directory:
+            bulk.save_certificate(directory, result)
+
+            key_path = os.path.join(directory, "example.com", "privkey.pem")
+            self.assertEqual(os.stat(key_path).st_mode & 0o777, 0o600)
+            with open(os.path.join(directory, "example.com", "fullchain.pem")) as f:
+                self.assertEqual(f.read(), "CERTIFICATE")
+
+
+class TestAnnotateChallenge(unittest.TestCase):
+    def setUp(self):
+        self.challb = messages.ChallengeBody(
+            chall=challenges.DNS01(token=b"0" * 16),
+            uri="https://ca.example/chall/1",
+            status=messages.STATUS_PENDING,
+        )
+        self.identifier = messages.Identifier(
+            typ=messages.IDENTIFIER_FQDN, value="example.com"
+        )
+
+    def test_identifier(self):
+        achall = bulk.annotate_challenge(self.challb, self.identifier, ACCOUNT_KEY)
+
+        self.assertEqual(achall.identifier, self.identifier)
+
+    def test_domain(self):
+        # certbot versions before the identifier field
+        with mock.patch.object(
+            bulk.achallenges, "KeyAuthorizationAnnotatedChallenge"
+        ) as annotated:
+            annotated.__slots__ = ("challb", "domain", "account_key")
+            bulk.annotate_challenge(self.challb, self.identifier, ACCOUNT_KEY)
+
+        annotated.assert_called_once_with(
+            challb=self.challb, domain="example.com", account_key=ACCOUNT_KEY
+        )
+
+
+class TestParseCertificates(unittest.TestCase):
+    def test_parse_certificates(self):
+        with tempfile.NamedTemporaryFile("w", suffix=".txt") as f:
+            f.write("# comment\n\nexample.org www.example.org\n")
+            f.flush()
+
+            self.assertEqual(
+                bulk.parse_certificates(["*.example.com,example.com"], f.name),
+                [
+                    bulk.CertificateRequest(
+                        "example.com", ["*.example.com", "example.com"]
+                    ),
+                    bulk.CertificateRequest(
+                        "example.org", ["example.org", "www.example.org"]
+                    ),
+                ],
+            )
+
+    def test_unique_names(self):
+        requests = bulk.parse_certificates(
+            ["example.com", "*.example.com", "example.com,www.example.com"]
+        )
+
+        self.assertEqual(
+            [request.name for request in requests],
+            ["example.com", "example.com-0001", "example.com-0002"],
+        )
+
+
+class TestFindAccounts(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.config = mock.Mock(accounts_dir=self.directory.name)
+        self.regr = messages.RegistrationResource(
+            body=messages.Registration(), uri="https://ca.example/acct/1"
+        )
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def add_account(self, account_id, key=ACCOUNT_KEY):
+        os.mkdir(os.path.join(self.directory.name, account_id))
+        with open(
+            os.path.join(self.directory.name, account_id, "private_key.json"), "w"
+        ) as f:
+            f.write(key.json_dumps())
+        with open(os.path.join(self.directory.name, account_id, "regr.json"), "w") as f:
+            f.write(self.regr.json_dumps())
+
+    def test_find_accounts(self):
+        self.add_account("b")
+        self.add_account("a")
+
+        accounts = bulk.find_accounts(self.config)
+
+        self.assertEqual([account_id for account_id, _, _ in accounts], ["a", "b"])
+        self.assertEqual(accounts[0][1], ACCOUNT_KEY)
+        self.assertEqual(accounts[0][2].uri, "https://ca.example/acct/1")
+        self.assertEqual(
+            [account_id for account_id, _, _ in bulk.find_accounts(self.config, "b")],
+            ["b"],
+        )
+
+    def test_invalid_account(self):
+        self.add_account("a")
+        os.mkdir(os.path.join(self.directory.name, "b"))
+
+        with self.assertLogs(level="WARNING"):
+            accounts = bulk.find_accounts(self.config)
+
+        self.assertEqual([account_id for account_id, _, _ in accounts], ["a"])
+
+    def test_no_accounts_dir(self):
+        self.config.accounts_dir = os.path.join(self.directory.name, "missing")
+
+        self.assertEqual(bulk.find_accounts(self.config), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
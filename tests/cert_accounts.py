@@ -0,0 +1,230 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from certbot.errors import PluginError
+
+from certbot_dns_porkbun.cert import accounts
+from certbot_dns_porkbun.cert.accounts import Account, AccountRouter, load_accounts
+from tests.helpers import create_achall, create_authenticator, split_challenge_domain
+from tests.porkbun_stub import FakePorkbunAPI
+
+CREDENTIALS = """\
+porkbun_key=key
+porkbun_secret=secret
+
+[shop]
+porkbun_key=shop-key
+porkbun_secret=shop-secret
+porkbun_zones=example.org, *.shop
+"""
+
+
+def mapper(var: str) -> str:
+    return f"porkbun_{var}"
+
+
+class TestAccountRouter(unittest.TestCase):
+    def setUp(self):
+        self.default = Account("default", "key", "secret")
+        self.first = Account("first", "first-key", "first-secret")
+        self.second = Account("second", "second-key", "second-secret")
+
+    def test_lookup(self):
+        router = AccountRouter(
+            self.default,
+            [("*.shop", self.first), ("example.shop", self.second)],
+        )
+
+        # exact root domains take precedence over patterns
+        self.assertEqual(router.lookup("Example.Shop."), self.second)
+        self.assertEqual(router.lookup("other.shop"), self.first)
+        self.assertEqual(router.lookup("example.com"), self.default)
+        self.assertEqual(router.accounts, [self.default, self.first, self.second])
+
+    def test_patterns_in_order(self):
+        router = AccountRouter(
+            None, [("example-*.com", self.first), ("*.com", self.second)]
+        )
+
+        self.assertEqual(router.lookup("example-shop.com"), self.first)
+        self.assertEqual(router.lookup("example.com"), self.second)
+        with self.assertRaisesRegex(PluginError, "example.org"):
+            router.lookup("example.org")
+
+    def test_with_default(self):
+        router = AccountRouter(self.default, [("example.org", self.first)])
+        router = router.with_default(self.second)
+
+        self.assertEqual(router.lookup("example.com"), self.second)
+        self.assertEqual(router.lookup("example.org"), self.first)
+
+
+class TestLoadAccounts(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "porkbun.ini")
+        self.write(CREDENTIALS)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def write(self, content: str) -> None:
+        with open(self.path, "w", encoding="utf-8") as f:
+            f.write(content)
+        os.chmod(self.path, 0o600)
+
+    def test_sections(self):
+        router = load_accounts(self.path, mapper)
+
+        shop = Account("shop", "shop-key", "shop-secret")
+        self.assertEqual(router.default, Account("default", "key", "secret"))
+        self.assertEqual(router.routes, [("example.org", shop), ("*.shop", shop)])
+
+    def test_without_default(self):
+        self.write(CREDENTIALS.split("\n\n", 1)[1])
+
+        router = load_accounts(self.path, mapper)
+
+        self.assertIsNone(router.default)
+        with self.assertRaises(PluginError):
+            router.lookup("example.com")
+
+    def test_missing_properties(self):
+        self.write("[shop]\nporkbun_key=shop-key\n")
+
+        with self.assertRaisesRegex(
+            PluginError, "porkbun_secret, porkbun_zones of account shop"
+        ):
+            load_accounts(self.path, mapper)
+
+        self.write("porkbun_key=key\n")
+        with self.assertRaisesRegex(PluginError, "porkbun_secret"):
+            load_accounts(self.path, mapper)
+
+    def test_parsed_once(self):
+        with mock.patch.object(
+            accounts.dns_common,
+            "CredentialsConfiguration",
+            wraps=accounts.dns_common.CredentialsConfiguration,
+        ) as parse:
+            router = load_accounts(self.path, mapper)
+            self.assertIs(load_accounts(self.path, mapper), router)
+            self.assertEqual(parse.call_count, 1)
+
+            self.write(CREDENTIALS.replace("shop-secret", "new-secret"))
+            os.utime(self.path, ns=(0, 0))
+            self.assertEqual(
+                load_accounts(self.path, mapper).routes[0][1].secret, "new-secret"
+            )
+            self.assertEqual(parse.call_count, 2)
+
+    def test_unsafe_permissions(self):
+        os.chmod(self.path, 0o644)
+        with self.assertLogs(level="WARNING") as logs:
+            router = load_accounts(self.path, mapper)
+        self.assertEqual(
+            [record.getMessage() for record in logs.records],
+            [f"Unsafe permissions on credentials configuration file: {self.path}"],
+        )
+
+        # the permissions are checked again once the file changed
+        with self.assertNoLogs(level="WARNING"):
+            self.assertIs(load_accounts(self.path, mapper), router)
+            os.chmod(self.path, 0o600)
+            load_accounts(self.path, mapper)
+        with self.assertLogs(level="WARNING"):
+            os.chmod(self.path, 0o604)
+            load_accounts(self.path, mapper)
+
+
+@mock.patch(
+    "certbot_dns_porkbun.cert.client.resolve_challenge_domain_with_ttl",
+    side_effect=lambda domain, *_: (*split_challenge_domain(domain), 300),
+)
+@mock.patch(
+    "certbot_dns_porkbun.cert.client.resolve_challenge_domain_async",
+    side_effect=lambda domain, *_: (*split_challenge_domain(domain), 300),
+)
+class TestMultiAccount(unittest.TestCase):
+    def setUp(self):
+        self.api = FakePorkbunAPI(
+            accounts={"shop-key": "shop-secret"},
+            owners={"example.com": "key", "example.org": "shop-key"},
+        ).__enter__()
+        self.directory = tempfile.TemporaryDirectory()
+        self.credentials = os.path.join(self.directory.name, "porkbun.ini")
+        with open(self.credentials, "w", encoding="utf-8") as f:
+            f.write(CREDENTIALS)
+        os.chmod(self.credentials, 0o600)
+
+    def tearDown(self):
+        self.api.__exit__()
+        self.directory.cleanup()
+
+    def test_mixed_account_certificate(self, *_):
+        achalls = [
+            create_achall("example.com", token=b"a" * 16),
+            create_achall("www.example.org", token=b"b" * 16),
+        ]
+
+        for backend in ("threads", "asyncio"):
+            with self.subTest(backend=backend):
+                self.api.calls_by_key.clear()
+                authenticator = create_authenticator(
+                    porkbun_key=None,
+                    porkbun_secret=None,
+                    porkbun_credentials=self.credentials,
+                    porkbun_api_endpoint=self.api.endpoint,
+                    porkbun_backend=backend,
+                )
+
+                authenticator.perform(achalls)
+                self.assertEqual(len(self.api.records("example.com")), 1)
+                self.assertEqual(len(self.api.records("example.org")), 1)
+
+                authenticator.cleanup(achalls)
+                self.assertEqual(self.api.records("example.com"), [])
+                self.assertEqual(self.api.records("example.org"), [])
+                # list, create, list and delete per root domain with the account of the root domain
+                self.assertEqual(dict(self.api.calls_by_key), {"key": 4, "shop-key": 4})
+
+    def test_unsafe_credentials_permissions(self, *_):
+        os.chmod(self.credentials, 0o644)
+        authenticator = create_authenticator(
+            porkbun_key=None,
+            porkbun_secret=None,
+            porkbun_credentials=self.credentials,
+            porkbun_api_endpoint=self.api.endpoint,
+        )
+
+        with self.assertLogs(level="WARNING") as logs:
+            authenticator.perform([create_achall("example.com")])
+        authenticator.cleanup([create_achall("example.com")])
+
+        self.assertIn(
+            f"Unsafe permissions on credentials configuration file: {self.credentials}",
+            "\n".join(logs.output),
+        )
+
+    def test_cli_key_overwrites_default_account(self, *_):
+        authenticator = create_authenticator(
+            porkbun_key="other",
+            porkbun_secret=None,
+            porkbun_credentials=self.credentials,
+            porkbun_api_endpoint=self.api.endpoint,
+        )
+
+        with self.assertRaisesRegex(
+            PluginError, "example.com: ERROR: Invalid API key."
+        ):
+            authenticator.perform([create_achall("example.com")])
+        authenticator.cleanup([])
+
+        authenticator.perform([create_achall("example.org")])
+        self.assertEqual(self.api.calls_by_key["shop-key"], 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
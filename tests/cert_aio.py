@@ -0,0 +1,461 @@
+import asyncio
+import os
+import tempfile
+import time
+import unittest
+from collections.abc import Callable
+from unittest import mock
+
+from certbot.errors import PluginError
+from pkb_client.client import DNSRecordType, PKBClientException
+
+from certbot_dns_porkbun.cert.aio import AsyncPorkbunClient
+from certbot_dns_porkbun.cert.api import RetryablePKBClientException
+from tests.dns_stub import StubDNSServer
+from tests.helpers import create_achall, create_authenticator, split_challenge_domain
+from tests.porkbun_stub import FakePorkbunAPI
+
+ZONE_RECORDS = {
+    ("_acme-challenge.www.example.com", "CNAME"): ["_acme-challenge.example.net."],
+}
+
+PING_CHUNKS = [b'{"status": "SUCCESS", ', b'"yourIp": "127.0.0.1"}']
+PING_RESPONSE = (
+    b"HTTP/1.1 200 OK\r\n"
+    b"Content-Type: application/json\r\n"
+    b"Transfer-Encoding: Chunked\r\n"
+    b"\r\n"
+    + b"".join(b"%x;ext=1\r\n%s\r\n" % (len(chunk), chunk) for chunk in PING_CHUNKS)
+    + b"0\r\n\r\n"
+)
+
+
+async def serve_responses(responses: list[bytes | None], requests: list[bytes]):
+    """
+    Start a raw HTTP server on a single connection, which answers the requests with the responses in order. A
+    response of None closes the connection without answering.
+    """
+
+    async def handle(reader, writer):
+        for response in responses:
+            head = await reader.readuntil(b"\r\n\r\n")
+            length = int(head.lower().split(b"content-length:")[1].split(b"\r\n")[0])
+            requests.append(head + await reader.readexactly(length))
+            if response is None:
+                break
+            writer.write(response)
+            await writer.drain()
+        writer.close()
+
+    return await asyncio.start_server(handle, "127.0.0.1", 0)
+
+
+class TestAsyncPorkbunClient(unittest.TestCase):
+    def test_calls_reuse_connection(self):
+        async def run(endpoint):
+            async with AsyncPorkbunClient(
+                "key", "secret", api_endpoint=endpoint, rate_limit=0
+            ) as client:
+                self.assertEqual(await client.ping(), "127.0.0.1")
+                record_id = await client.create_dns_record(
+                    "example.com", DNSRecordType.TXT, "ABCDEF", name="_acme-challenge"
+                )
+                records = await client.get_all_dns_records(
+                    "example.com", DNSRecordType.TXT, "_acme-challenge"
+                )
+                self.assertEqual([record.id for record in records], [record_id])
+                self.assertEqual(
+                    [
+                        record.id
+                        for record in await client.get_dns_records("example.com")
+                    ],
+                    [record_id],
+                )
+                self.assertTrue(
+                    await client.delete_dns_record("example.com", record_id)
+                )
+
+        with FakePorkbunAPI() as server:
+            asyncio.run(run(server.endpoint))
+
+        self.assertEqual(server.connections, 1)
+        self.assertEqual(server.records("example.com"), [])
+
+    def test_concurrent_calls(self):
+        async def run(endpoint):
+            async with AsyncPorkbunClient(
+                "key", "secret", api_endpoint=endpoint, pool_size=8, rate_limit=0
+            ) as client:
+                return await asyncio.gather(*(client.ping() for _ in range(32)))
+
+        with FakePorkbunAPI(latency=0.05) as server:
+            start = time.monotonic()
+            self.assertEqual(asyncio.run(run(server.endpoint)), ["127.0.0.1"] * 32)
+
+        # the calls are sent over at most pool size connections at the same time
+        self.assertLessEqual(server.connections, 8)
+        self.assertLess(time.monotonic() - start, 32 * 0.05)
+
+    def test_retry_server_errors(self):
+        async def run(endpoint):
+            async with AsyncPorkbunClient(
+                "key",
+                "secret",
+                api_endpoint=endpoint,
+                rate_limit=0,
+                retry_backoff=0.01,
+            ) as client:
+                for _ in range(10):
+                    self.assertEqual(await client.ping(), "127.0.0.1")
+
+        with FakePorkbunAPI(error_rate=0.5, seed=1) as server:
+            asyncio.run(run(server.endpoint))
+
+        self.assertGreater(server.calls["failed"], 0)
+        self.assertEqual(server.calls["ping"], 10 + server.calls["failed"])
+
+    def test_lost_create_response_is_not_duplicated(self):
+        async def run(endpoint):
+            async with AsyncPorkbunClient(
+                "key",
+                "secret",
+                api_endpoint=endpoint,
+                rate_limit=0,
+                retry_backoff=0.01,
+            ) as client:
+                return await client.create_dns_record(
+                    "example.com", DNSRecordType.TXT, "ABCDEF", name="_acme-challenge"
+                )
+
+        with FakePorkbunAPI() as server:
+            server.lost_creates = 1
+            record_id = asyncio.run(run(server.endpoint))
+
+        self.assertEqual(
+            [record["id"] for record in server.records("example.com")], [record_id]
+        )
+        self.assertEqual(server.calls["dns/create"], 1)
+        self.assertEqual(server.calls["lost"], 1)
+
+    def test_error_response(self):
+        async def run(endpoint):
+            async with AsyncPorkbunClient(
+                "key", "wrong", api_endpoint=endpoint
+            ) as client:
+                await client.ping()
+
+        with (
+            FakePorkbunAPI() as server,
+            self.assertRaises(PKBClientException) as context,
+        ):
+            asyncio.run(run(server.endpoint))
+
+        self.assertNotIsInstance(context.exception, RetryablePKBClientException)
+        self.assertEqual(server.calls["ping"], 1)
+
+    def test_unreachable_endpoint(self):
+        async def run():
+            async with AsyncPorkbunClient(
+                "key", "secret", api_endpoint="http://127.0.0.1:1/", max_retries=0
+            ) as client:
+                await client.ping()
+
+        with self.assertRaises(RetryablePKBClientException):
+            asyncio.run(run())
+
+    def test_read_timeout(self):
+        async def run(endpoint):
+            async with AsyncPorkbunClient(
+                "key",
+                "secret",
+                api_endpoint=endpoint,
+                max_retries=0,
+                read_timeout=0.1,
+            ) as client:
+                await client.ping()
+
+        with (
+            FakePorkbunAPI(latency=0.5) as server,
+            self.assertRaisesRegex(
+                RetryablePKBClientException, "No response within 0.1 seconds"
+            ),
+        ):
+            asyncio.run(run(server.endpoint))
+
+    def test_chunked_response(self):
+        async def run():
+            server = await serve_responses([PING_RESPONSE], [])
+            async with server:
+                host, port = server.sockets[0].getsockname()[:2]
+                async with AsyncPorkbunClient(
+                    "key", "secret", api_endpoint=f"http://{host}:{port}/"
+                ) as client:
+                    return await client.ping()
+
+        self.assertEqual(asyncio.run(run()), "127.0.0.1")
+
+    def test_failed_call_is_not_resent(self):
+        requests = []
+
+        async def run():
+            # the keep-alive connection of the ping is closed while the create call is in flight
+            server = await serve_responses([PING_RESPONSE, None], requests)
+            async with server:
+                host, port = server.sockets[0].getsockname()[:2]
+                async with AsyncPorkbunClient(
+                    "key",
+                    "secret",
+                    api_endpoint=f"http://{host}:{port}/",
+                    max_retries=0,
+                ) as client:
+                    await client.ping()
+                    await client.create_dns_record(
+                        "example.com", DNSRecordType.TXT, "ABCDEF"
+                    )
+
+        with self.assertRaises(RetryablePKBClientException) as context:
+            asyncio.run(run())
+
+        self.assertTrue(context.exception.outcome_unknown)
+        self.assertEqual(len(requests), 2)
+        self.assertIn(b"POST /dns/create/example.com ", requests[1])
+
+    def test_proxy(self):
+        async def run():
+            async with AsyncPorkbunClient(
+                "key",
+                "secret",
+                api_endpoint="http://api.porkbun.invalid/api/json/v3/",
+                max_retries=0,
+            ) as client:
+                return await client.ping()
+
+        with FakePorkbunAPI() as proxy:
+            proxy_url = proxy.endpoint.removesuffix("/api/json/v3/")
+            with mock.patch.dict(os.environ, {"HTTP_PROXY": proxy_url}):
+                self.assertEqual(asyncio.run(run()), "127.0.0.1")
+            self.assertEqual(proxy.calls["ping"], 1)
+
+            with (
+                mock.patch.dict(
+                    os.environ,
+                    {"HTTP_PROXY": proxy_url, "NO_PROXY": "api.porkbun.invalid"},
+                ),
+                self.assertRaises(RetryablePKBClientException),
+            ):
+                asyncio.run(run())
+            self.assertEqual(proxy.calls["ping"], 1)
+
+
+class TestBackendEquivalence(unittest.TestCase):
+    """
+    Runs the same challenges with the thread pool and the asyncio backend against separate fake APIs and compares the
+    resulting records, API calls, responses and errors.
+    """
+
+    def setUp(self):
+        self.dns = StubDNSServer({}, dict(ZONE_RECORDS)).__enter__()
+
+    def tearDown(self):
+        self.dns.__exit__()
+
+    def run_backend(
+        self,
+        backend: str,
+        achalls: list,
+        setup: Callable[[FakePorkbunAPI], None] | None = None,
+        **options,
+    ) -> dict:
+        outcome = {}
+        with FakePorkbunAPI() as api, tempfile.TemporaryDirectory() as work_dir:
+            if setup is not None:
+                setup(api)
+            authenticator = create_authenticator(
+                porkbun_api_endpoint=api.endpoint,
+                porkbun_backend=backend,
+                porkbun_resolver="{}:{}".format(*self.dns.address),
+                work_dir=work_dir,
+                **options,
+            )
+
+            try:
+                outcome["responses"] = authenticator.perform(achalls)
+            except PluginError as e:
+                outcome["perform_error"] = str(e)
+            outcome["performed"] = self.snapshot(api)
+            outcome["perform_calls"] = dict(api.calls)
+
+            # the injected resolution errors are raised by the cleanup of both backends
+            try:
+                authenticator.cleanup(achalls)
+            except (PluginError, ValueError) as e:
+                outcome["cleanup_error"] = f"{type(e).__name__}: {e}"
+            outcome["cleaned"] = self.snapshot(api)
+            outcome["calls"] = dict(api.calls)
+
+        self.assertIsNone(authenticator._event_loop)
+        return outcome
+
+    @staticmethod
+    def snapshot(api: FakePorkbunAPI) -> list[tuple[str, str, str, str]]:
+        # the IDs of records created concurrently differ between the runs
+        return sorted(
+            (zone, record["name"], record["content"], record["ttl"])
+            for zone in api.zones
+            for record in api.records(zone)
+        )
+
+    def assertEquivalent(self, achalls: list, **kwargs) -> dict:
+        threads = self.run_backend("threads", achalls, **kwargs)
+        asyncio_backend = self.run_backend("asyncio", achalls, **kwargs)
+
+        self.assertEqual(asyncio_backend, threads)
+        return threads
+
+    def test_challenges_in_input_order(self):
+        domains = ["example.org", "example.com", "a.example.org", "www.example.com"]
+        achalls = [
+            create_achall(domain, token=bytes([i]) * 16)
+            for i, domain in enumerate(domains)
+        ]
+
+        with FakePorkbunAPI() as api:
+            authenticator = create_authenticator(
+                porkbun_api_endpoint=api.endpoint,
+                porkbun_backend="asyncio",
+                porkbun_resolver="{}:{}".format(*self.dns.address),
+            )
+            with mock.patch.object(authenticator, "wait_for_propagation") as wait:
+                authenticator.perform(achalls)
+            authenticator.cleanup(achalls)
+
+        (challenges,) = wait.call_args.args
+        self.assertEqual([challenge.domain for challenge in challenges], domains)
+
+    def test_zones_and_cname(self):
+        achalls = [
+            create_achall(domain, token=bytes([i]) * 16)
+            for i, domain in enumerate(
+                [
+                    "example.com",
+                    "*.example.com",
+                    "www.example.com",
+                    "example.org",
+                    "a.example.org",
+                ]
+            )
+        ]
+
+        outcome = self.assertEquivalent(achalls)
+
+        self.assertEqual(len(outcome["responses"]), 5)
+        self.assertEqual(
+            [record[:2] for record in outcome["performed"]],
+            [
+                ("example.com", "_acme-challenge.example.com"),
+                ("example.com", "_acme-challenge.example.com"),
+                ("example.net", "_acme-challenge.example.net"),
+                ("example.org", "_acme-challenge.a.example.org"),
+                ("example.org", "_acme-challenge.example.org"),
+            ],
+        )
+        self.assertEqual(outcome["cleaned"], [])
+
+    def test_existing_and_stale_records(self):
+        achalls = [create_achall("example.com", token=b"a" * 16)]
+        validation = achalls[0].validation(achalls[0].account_key)
+
+        def setup(api):
+            api.add_record("example.com", "_acme-challenge", "TXT", "STALE")
+            api.add_record("example.com", "_acme-challenge", "TXT", validation)
+
+        outcome = self.assertEquivalent(
+            achalls, setup=setup, porkbun_prune_stale_records=True, porkbun_ttl=900
+        )
+
+        self.assertEqual(
+            outcome["performed"],
+            [("example.com", "_acme-challenge.example.com", validation, "600")],
+        )
+        self.assertNotIn("dns/create", outcome["perform_calls"])
+
+    def test_journal(self):
+        achalls = [
+            create_achall("example.com", token=b"a" * 16),
+            create_achall("example.org", token=b"b" * 16),
+        ]
+
+        outcome = self.assertEquivalent(achalls, porkbun_journal=True)
+
+        self.assertEqual(outcome["cleaned"], [])
+        # the records are deleted by the IDs of the journal without listing them
+        self.assertEqual(outcome["calls"], {"dns/create": 2, "dns/delete": 2})
+
+    def test_journal_and_stale_records(self):
+        achalls = [create_achall("example.com", token=b"a" * 16)]
+        validation = achalls[0].validation(achalls[0].account_key)
+
+        def setup(api):
+            api.add_record("example.com", "_acme-challenge", "TXT", "STALE")
+
+        outcome = self.assertEquivalent(
+            achalls,
+            setup=setup,
+            porkbun_journal=True,
+            porkbun_prune_stale_records=True,
+        )
+
+        # the records are listed to find the stale records despite the journal
+        self.assertEqual(
+            outcome["performed"],
+            [("example.com", "_acme-challenge.example.com", validation, "300")],
+        )
+        self.assertEqual(outcome["perform_calls"]["dns/delete"], 1)
+
+    def test_api_errors(self):
+        achalls = [
+            create_achall("example.com", token=b"a" * 16),
+            create_achall("example.org", token=b"b" * 16),
+        ]
+
+        outcome = self.assertEquivalent(achalls, porkbun_secret="wrong")
+
+        self.assertIn("example.com: ERROR: Invalid API key.", outcome["perform_error"])
+        self.assertIn("example.org", outcome["cleanup_error"])
+
+    def test_resolution_errors(self):
+        def resolve(domain, *_):
+            if domain == "example.org":
+                raise ValueError("resolution failed")
+            return (*split_challenge_domain(domain), 300)
+
+        async def resolve_async(domain, *args):
+            return resolve(domain, *args)
+
+        achalls = [
+            create_achall("example.org", token=b"a" * 16),
+            create_achall("example.com", token=b"b" * 16),
+        ]
+        with (
+            mock.patch(
+                "certbot_dns_porkbun.cert.client.resolve_challenge_domain_with_ttl",
+                side_effect=resolve,
+            ),
+            mock.patch(
+                "certbot_dns_porkbun.cert.client.resolve_challenge_domain_async",
+                side_effect=resolve_async,
+            ),
+        ):
+            outcome = self.assertEquivalent(achalls)
+
+        self.assertEqual(
+            outcome["perform_error"],
+            "Challenge TXT records failed for root domains:\n"
+            "example.org: resolution failed",
+        )
+        # the records of the other domains are still created, so that they are cleaned up
+        self.assertEqual(len(outcome["performed"]), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,117 @@
+import unittest
+
+from certbot_dns_porkbun.cert.alias import ChallengeAlias, get_challenge_alias
+from tests.dns_stub import StubDNSServer
+from tests.helpers import create_achall, create_authenticator
+from tests.porkbun_stub import FakePorkbunAPI
+
+ZONE_RECORDS = {
+    ("_acme-challenge.example.com", "CNAME"): ["example.com.acme.example.net."],
+    ("_acme-challenge.www.example.com", "CNAME"): ["_acme-challenge.example.org."],
+}
+
+
+class TestChallengeAlias(unittest.TestCase):
+    def test_get_challenge_alias(self):
+        self.assertEqual(
+            get_challenge_alias(
+                "_acme-challenge.WWW.example.com.", "acme.example.net."
+            ),
+            ChallengeAlias(
+                "_acme-challenge.www.example.com", "www.example.com.acme.example.net"
+            ),
+        )
+
+
+class TestAliasMode(unittest.TestCase):
+    def setUp(self):
+        self.dns = StubDNSServer({}, dict(ZONE_RECORDS)).__enter__()
+        self.api = FakePorkbunAPI().__enter__()
+
+    def tearDown(self):
+        self.api.__exit__()
+        self.dns.__exit__()
+
+    def create_authenticator(self, **options):
+        return create_authenticator(
+            porkbun_api_endpoint=self.api.endpoint,
+            porkbun_resolver="{}:{}".format(*self.dns.address),
+            porkbun_challenge_alias="acme.example.net",
+            **options,
+        )
+
+    def txt_records(self) -> list[tuple[str, str]]:
+        return sorted(
+            (zone, record["name"])
+            for zone in self.api.zones
+            for record in self.api.records(zone)
+        )
+
+    def test_provision_aliases(self):
+        achalls = [
+            create_achall(domain, token=bytes([i]) * 16)
+            for i, domain in enumerate(
+                ["example.com", "example.io", "*.example.io", "www.example.com"]
+            )
+        ]
+
+        for backend in ("threads", "asyncio"):
+            with self.subTest(backend=backend):
+                self.api.zones.clear()
+                self.api.calls.clear()
+                authenticator = self.create_authenticator(
+                    porkbun_backend=backend, porkbun_provision_aliases=True
+                )
+
+                with self.assertLogs(level="WARNING") as logs:
+                    authenticator.perform(achalls)
+                self.assertEqual(
+                    self.txt_records(),
+                    [
+                        ("example.net", "example.com.acme.example.net"),
+                        ("example.net", "example.io.acme.example.net"),
+                        ("example.net", "example.io.acme.example.net"),
+                        # CNAME records to other names are kept
+                        ("example.org", "_acme-challenge.example.org"),
+                    ],
+                )
+                self.assertIn(
+                    "_acme-challenge.www.example.com is an alias of _acme-challenge.example.org",
+                    "\n".join(logs.output),
+                )
+                # the CNAME record of the shared challenge name is only created once
+                self.assertEqual(
+                    [
+                        (record["name"], record["content"])
+                        for record in self.api.records("example.io", "CNAME")
+                    ],
+                    [("_acme-challenge.example.io", "example.io.acme.example.net")],
+                )
+
+                authenticator.cleanup(achalls)
+                self.assertEqual(self.txt_records(), [])
+                self.assertEqual(len(self.api.records("example.io", "CNAME")), 1)
+                # 3 TXT records in the validation zone, 1 in example.org and the CNAME record
+                self.assertEqual(self.api.calls["dns/create"], 5)
+
+    def test_missing_alias(self):
+        achalls = [create_achall("example.io")]
+        authenticator = self.create_authenticator()
+
+        with self.assertLogs(level="WARNING") as logs:
+            authenticator.perform(achalls)
+        authenticator.cleanup(achalls)
+
+        self.assertIn(
+            "_acme-challenge.example.io has no CNAME record to example.io.acme.example.net",
+            "\n".join(logs.output),
+        )
+        self.assertIn("--porkbun-provision-aliases", "\n".join(logs.output))
+        # the TXT record was created in the zone of the domain without creating the CNAME record
+        self.assertEqual(self.api.calls["dns/create"], 1)
+        self.assertEqual(self.api.records("example.io", "CNAME"), [])
+        self.assertNotIn("example.net", self.api.zones)
+
+
+if __name__ == "__main__":
+    unittest.main()
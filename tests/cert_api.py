@@ -0,0 +1,473 @@
+import unittest
+from unittest import mock
+
+import requests
+import responses
+from certbot.errors import PluginError
+from pkb_client.client import DNSRecordType, PKBClientException
+
+from certbot_dns_porkbun.cert import api
+from certbot_dns_porkbun.cert.api import (
+    CircuitBreaker,
+    CircuitOpenError,
+    PooledPKBClient,
+    RetryablePKBClientException,
+    RetrySchedule,
+    TokenBucket,
+)
+from tests.helpers import create_achall, create_authenticator, split_challenge_domain
+from tests.porkbun_stub import FakePorkbunAPI
+
+
+class TestPooledPKBClient(unittest.TestCase):
+    def test_calls_reuse_connection(self):
+        with (
+            FakePorkbunAPI() as server,
+            PooledPKBClient("key", "secret", api_endpoint=server.endpoint) as client,
+        ):
+            self.assertEqual(client.ping(), "127.0.0.1")
+            record_id = client.create_dns_record(
+                "example.com", DNSRecordType.TXT, "ABCDEF", name="_acme-challenge"
+            )
+            records = client.get_all_dns_records(
+                "example.com", DNSRecordType.TXT, "_acme-challenge"
+            )
+            self.assertEqual([record.id for record in records], [record_id])
+            self.assertEqual(
+                [record.id for record in client.get_dns_records("example.com")],
+                [record_id],
+            )
+            self.assertTrue(client.delete_dns_record("example.com", record_id))
+
+        self.assertEqual(server.connections, 1)
+        self.assertEqual(server.records("example.com"), [])
+
+    def test_retry_server_errors(self):
+        with (
+            FakePorkbunAPI(error_rate=0.5, seed=1) as server,
+            PooledPKBClient(
+                "key", "secret", api_endpoint=server.endpoint, retry_backoff=0.01
+            ) as client,
+        ):
+            for _ in range(10):
+                self.assertEqual(client.ping(), "127.0.0.1")
+
+        self.assertGreater(server.calls["failed"], 0)
+        self.assertEqual(server.calls["ping"], 10 + server.calls["failed"])
+
+    def test_error_response(self):
+        with (
+            FakePorkbunAPI() as server,
+            PooledPKBClient("key", "wrong", api_endpoint=server.endpoint) as client,
+            self.assertRaises(PKBClientException),
+        ):
+            client.ping()
+
+    def test_read_timeout(self):
+        with (
+            FakePorkbunAPI(latency=0.5) as server,
+            PooledPKBClient(
+                "key",
+                "secret",
+                api_endpoint=server.endpoint,
+                max_retries=0,
+                read_timeout=0.1,
+            ) as client,
+            self.assertRaisesRegex(RetryablePKBClientException, "ReadTimeout"),
+        ):
+            client.ping()
+
+    def test_lost_create_response_is_not_duplicated(self):
+        with FakePorkbunAPI() as server:
+            server.lost_creates = 2
+            with PooledPKBClient(
+                "key", "secret", api_endpoint=server.endpoint, retry_backoff=0.01
+            ) as client:
+                record_id = client.create_dns_record(
+                    "example.com", DNSRecordType.TXT, "ABCDEF", name="_acme-challenge"
+                )
+                root_id = client.create_dns_record(
+                    "example.com", DNSRecordType.TXT, "GHIJKL"
+                )
+
+        self.assertEqual(
+            [
+                (record["id"], record["name"])
+                for record in server.records("example.com")
+            ],
+            [
+                (record_id, "_acme-challenge.example.com"),
+                (root_id, "example.com"),
+            ],
+        )
+        self.assertEqual(server.calls["dns/create"], 2)
+        self.assertEqual(server.calls["lost"], 2)
+
+
+API = "https://api.porkbun.com/api/json/v3"
+PING = f"{API}/ping"
+
+
+@mock.patch("certbot_dns_porkbun.cert.api.time.sleep")
+class TestRetries(unittest.TestCase):
+    @responses.activate
+    def test_retry_throttled_and_server_errors(self, sleep):
+        responses.post(PING, status=429, json={"status": "ERROR"})
+        responses.post(PING, status=503, body="<html>Service Unavailable</html>")
+        responses.post(PING, body=requests.ConnectionError("connection reset"))
+        responses.post(PING, json={"status": "SUCCESS", "yourIp": "192.0.2.1"})
+
+        client = PooledPKBClient("key", "secret", rate_limit=0, retry_backoff=1)
+
+        self.assertEqual(client.ping(), "192.0.2.1")
+        self.assertEqual(len(responses.calls), 4)
+        delays = [call.args[0] for call in sleep.call_args_list]
+        self.assertEqual(len(delays), 3)
+        for attempt, delay in enumerate(delays):
+            self.assertGreaterEqual(delay, 2**attempt / 2)
+            self.assertLessEqual(delay, 2**attempt)
+
+    @responses.activate
+    def test_retry_after_header(self, sleep):
+        responses.post(
+            PING,
+            status=429,
+            json={"status": "ERROR", "message": "Rate limit exceeded"},
+            headers={"Retry-After": "30"},
+        )
+        responses.post(PING, json={"status": "SUCCESS", "yourIp": "192.0.2.1"})
+
+        client = PooledPKBClient("key", "secret", rate_limit=0)
+
+        self.assertEqual(client.ping(), "192.0.2.1")
+        sleep.assert_called_once_with(30.0)
+
+    @responses.activate
+    def test_fatal_error_is_not_retried(self, sleep):
+        responses.post(
+            PING, status=400, json={"status": "ERROR", "message": "Invalid API key."}
+        )
+
+        client = PooledPKBClient("key", "secret", rate_limit=0)
+
+        with self.assertRaises(PKBClientException) as context:
+            client.ping()
+        self.assertNotIsInstance(context.exception, RetryablePKBClientException)
+        self.assertEqual(len(responses.calls), 1)
+        sleep.assert_not_called()
+
+    @responses.activate
+    def test_retries_exhausted(self, sleep):
+        responses.post(PING, status=502, json={"status": "ERROR"})
+
+        client = PooledPKBClient("key", "secret", rate_limit=0, max_retries=2)
+
+        with self.assertRaises(RetryablePKBClientException):
+            client.ping()
+        self.assertEqual(len(responses.calls), 3)
+        self.assertEqual(sleep.call_count, 2)
+
+    @responses.activate
+    def test_create_with_unknown_outcome(self, _):
+        create = f"{API}/dns/create/example.com"
+        retrieve = f"{API}/dns/retrieveByNameType/example.com/TXT/_acme-challenge"
+        responses.post(create, status=503, json={"status": "ERROR"})
+        responses.post(create, body=requests.ConnectTimeout("connect timeout"))
+        responses.post(create, json={"status": "SUCCESS", "id": 1})
+        responses.post(retrieve, json={"status": "SUCCESS", "records": []})
+
+        client = PooledPKBClient("key", "secret", rate_limit=0)
+
+        # the record is only looked up after the server error, the connect timeout was never sent
+        self.assertEqual(
+            client.create_dns_record(
+                "example.com", DNSRecordType.TXT, "ABCDEF", name="_acme-challenge"
+            ),
+            "1",
+        )
+        self.assertEqual(
+            [call.request.url for call in responses.calls],
+            [create, retrieve, create, create],
+        )
+
+    @responses.activate
+    def test_create_is_not_retried_if_unknown(self, _):
+        create = f"{API}/dns/create/example.com"
+        responses.post(create, status=503, json={"status": "ERROR"})
+        responses.post(
+            f"{API}/dns/retrieve/example.com",
+            status=400,
+            json={"status": "ERROR", "message": "Invalid API key."},
+        )
+
+        client = PooledPKBClient("key", "secret", rate_limit=0)
+
+        with self.assertRaises(RetryablePKBClientException):
+            client.create_dns_record("example.com", DNSRecordType.TXT, "ABCDEF")
+        responses.assert_call_count(create, 1)
+
+    def test_token_bucket(self, sleep):
+        with mock.patch(
+            "certbot_dns_porkbun.cert.api.time.monotonic", return_value=100.0
+        ):
+            bucket = TokenBucket(rate=2, capacity=2)
+            waits = [bucket.acquire() for _ in range(5)]
+
+        self.assertEqual(waits, [0.0, 0.0, 0.5, 1.0, 1.5])
+        self.assertEqual(sleep.call_count, 3)
+
+    def test_token_bucket_disabled(self, sleep):
+        bucket = TokenBucket(rate=0)
+        self.assertEqual([bucket.acquire() for _ in range(10)], [0.0] * 10)
+        sleep.assert_not_called()
+
+
+class TestCircuitBreaker(unittest.TestCase):
+    def test_open_after_consecutive_failures(self):
+        breaker = CircuitBreaker(failure_threshold=3, reset_seconds=60)
+        error = RetryablePKBClientException("503", "Service unavailable.")
+
+        breaker.record_failure(error)
+        breaker.record_failure(error)
+        breaker.record_success()
+        breaker.record_failure(error)
+        breaker.record_failure(error)
+        breaker.allow()
+
+        breaker.record_failure(error)
+        self.assertTrue(breaker.is_open)
+        with self.assertRaisesRegex(CircuitOpenError, "3 consecutive API calls failed"):
+            breaker.allow()
+
+    def test_probe_after_reset(self):
+        breaker = CircuitBreaker(failure_threshold=1, reset_seconds=60)
+        error = RetryablePKBClientException("503", "Service unavailable.")
+
+        with mock.patch(
+            "certbot_dns_porkbun.cert.api.time.monotonic", return_value=100.0
+        ) as monotonic:
+            breaker.record_failure(error)
+            monotonic.return_value = 160.0
+            # a single call probes the API, the others still fail fast
+            breaker.allow()
+            with self.assertRaises(CircuitOpenError):
+                breaker.allow()
+
+            breaker.record_failure(error)
+            with self.assertRaises(CircuitOpenError):
+                breaker.allow()
+
+            monotonic.return_value = 220.0
+            breaker.allow()
+            breaker.record_success()
+            self.assertFalse(breaker.is_open)
+            breaker.allow()
+
+    def test_disabled(self):
+        breaker = CircuitBreaker(failure_threshold=0)
+        for _ in range(100):
+            breaker.record_failure(RetryablePKBClientException("503", "Error"))
+        breaker.allow()
+
+    def test_throttled_and_fatal_errors_are_no_failures(self):
+        breaker = CircuitBreaker(failure_threshold=1)
+        retries = RetrySchedule("ping", 0, 1.0, circuit_breaker=breaker)
+
+        for error in (
+            RetryablePKBClientException("429", "Rate limit", throttled=True),
+            PKBClientException("400", "Invalid API key."),
+        ):
+            with self.assertRaises(PKBClientException), retries.attempt():
+                raise error
+        self.assertFalse(breaker.is_open)
+
+        with self.assertRaises(RetryablePKBClientException), retries.attempt():
+            raise RetryablePKBClientException("503", "Service unavailable.")
+        self.assertTrue(breaker.is_open)
+
+
+@mock.patch(
+    "certbot_dns_porkbun.cert.client.resolve_challenge_domain_with_ttl",
+    side_effect=lambda domain, *_: (*split_challenge_domain(domain), 300),
+)
+@mock.patch(
+    "certbot_dns_porkbun.cert.client.resolve_challenge_domain_async",
+    side_effect=lambda domain, *_: (*split_challenge_domain(domain), 300),
+)
+class TestOutage(unittest.TestCase):
+    def setUp(self):
+        self.api = FakePorkbunAPI().__enter__()
+        self.api.outage = True
+
+    def tearDown(self):
+        self.api.__exit__()
+
+    def test_remaining_domains_fail_fast(self, *_):
+        achalls = [
+            create_achall(domain)
+            for domain in ("example.com", "example.org", "example.net", "example.io")
+        ]
+
+        for backend in ("threads", "asyncio"):
+            with self.subTest(backend=backend):
+                self.api.calls.clear()
+                authenticator = create_authenticator(
+                    porkbun_api_endpoint=self.api.endpoint,
+                    porkbun_backend=backend,
+                    porkbun_max_concurrency=1,
+                    porkbun_retry_backoff=0.01,
+                    porkbun_circuit_breaker_threshold=3,
+                )
+
+                with self.assertRaises(PluginError) as context:
+                    authenticator.perform(achalls)
+                with self.assertRaisesRegex(PluginError, "Porkbun API unavailable"):
+                    authenticator.cleanup(achalls)
+
+                for domain in (
+                    "example.com",
+                    "example.org",
+                    "example.net",
+                    "example.io",
+                ):
+                    self.assertIn(
+                        f"{domain}: ERROR: Porkbun API unavailable, 3 consecutive API calls failed",
+                        str(context.exception),
+                    )
+                # without the circuit breaker, each root domain would be tried 6 times during perform and cleanup
+                self.assertEqual(self.api.calls["failed"], 3)
+
+    def test_health_check(self, *_):
+        authenticator = create_authenticator(
+            porkbun_api_endpoint=self.api.endpoint,
+            porkbun_retry_backoff=0.01,
+            porkbun_health_check=True,
+        )
+
+        with self.assertRaisesRegex(
+            PluginError,
+            "Porkbun API health check failed for account default: ERROR: Service unavailable.",
+        ):
+            authenticator.perform([create_achall("example.com")])
+        authenticator.cleanup([])
+
+        # the ping is not retried and no records are changed
+        self.assertEqual(dict(self.api.calls), {"ping": 1, "failed": 1})
+
+        self.api.outage = False
+        authenticator.perform([create_achall("example.com")])
+        self.assertEqual(self.api.calls["ping"], 2)
+        self.assertEqual(len(self.api.records("example.com")), 1)
+
+
+class TestAuthenticatorClient(unittest.TestCase):
+    def setUp(self):
+        patcher = mock.patch(
+            "certbot_dns_porkbun.cert.client.resolve_challenge_domain_with_ttl",
+            side_effect=lambda domain, *_: (*split_challenge_domain(domain), 300),
+        )
+        self.resolve = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_single_client_per_run(self):
+        domains = ["example.com", "www.example.com", "example.org", "example.net"]
+        achalls = [create_achall(domain) for domain in domains]
+
+        with FakePorkbunAPI() as server:
+            authenticator = create_authenticator(
+                porkbun_api_endpoint=server.endpoint, porkbun_max_concurrency=2
+            )
+            with mock.patch(
+                "certbot_dns_porkbun.cert.api.PooledPKBClient",
+                wraps=api.PooledPKBClient,
+            ) as client_class:
+                authenticator.perform(achalls)
+                self.assertEqual(len(server.records("example.com")), 2)
+                authenticator.cleanup(achalls)
+
+        client_class.assert_called_once()
+        self.assertEqual(server.records("example.com"), [])
+        # one connection per concurrently processed root domain at most
+        self.assertLessEqual(server.connections, 2)
+        self.assertEqual(server.calls["dns/create"], 4)
+        self.assertEqual(server.calls["dns/delete"], 4)
+        self.assertEqual(authenticator._clients, {})
+        self.assertEqual(self.resolve.call_count, len(domains))
+
+    @mock.patch("certbot_dns_porkbun.cert.api.time.sleep")
+    @responses.activate
+    def test_cleanup_continues_after_failed_delete(self, *_):
+        api_url = "https://api.porkbun.com/api/json/v3"
+        achalls = [
+            create_achall("example.com", token=b"a" * 16),
+            create_achall("www.example.com", token=b"b" * 16),
+        ]
+        responses.post(
+            url=f"{api_url}/dns/retrieve/example.com",
+            json={
+                "status": "SUCCESS",
+                "records": [
+                    {
+                        "id": str(i),
+                        "name": name,
+                        "type": "TXT",
+                        "content": achall.validation(achall.account_key),
+                        "ttl": "600",
+                        "prio": "0",
+                        "notes": "",
+                    }
+                    for i, (name, achall) in enumerate(
+                        zip(
+                            [
+                                "_acme-challenge.example.com",
+                                "_acme-challenge.www.example.com",
+                            ],
+                            achalls,
+                        )
+                    )
+                ],
+            },
+        )
+        responses.post(
+            url=f"{api_url}/dns/delete/example.com/0",
+            status=500,
+            json={"status": "ERROR", "message": "Internal error"},
+        )
+        responses.post(
+            url=f"{api_url}/dns/delete/example.com/1", json={"status": "SUCCESS"}
+        )
+
+        authenticator = create_authenticator(porkbun_max_retries=1)
+        authenticator._attempt_cleanup = True
+        with self.assertRaises(PluginError):
+            authenticator.cleanup(achalls)
+
+        assert responses.assert_call_count(f"{api_url}/dns/delete/example.com/0", 2)
+        assert responses.assert_call_count(f"{api_url}/dns/delete/example.com/1", 1)
+        self.assertEqual(self.resolve.call_count, len(achalls))
+
+    def test_cleanup_deletes_duplicates(self):
+        achall = create_achall("example.com")
+        validation = achall.validation(achall.account_key)
+
+        for backend in ("threads", "asyncio"):
+            with self.subTest(backend=backend), FakePorkbunAPI() as server:
+                authenticator = create_authenticator(
+                    porkbun_api_endpoint=server.endpoint, porkbun_backend=backend
+                )
+                with mock.patch(
+                    "certbot_dns_porkbun.cert.client.resolve_challenge_domain_async",
+                    side_effect=lambda domain, *_: (
+                        *split_challenge_domain(domain),
+                        300,
+                    ),
+                ):
+                    authenticator.perform([achall])
+                    # a duplicate left by a create call which was applied twice
+                    server.add_record(
+                        "example.com", "_acme-challenge", "TXT", validation
+                    )
+                    authenticator.cleanup([achall])
+
+                self.assertEqual(server.records("example.com"), [])
+                self.assertEqual(server.calls["dns/delete"], 2)
@@ -1,12 +1,28 @@
+import os
+import tempfile
+import threading
+import time
 import unittest
 from argparse import Namespace
+from unittest import mock
 
 import responses
 from certbot.configuration import NamespaceConfig
 from certbot.errors import PluginError
+from dns import resolver
 from responses import matchers
 
+from certbot_dns_porkbun.cert import client
 from certbot_dns_porkbun.cert.client import Authenticator
+from tests.helpers import (
+    create_achall,
+    create_authenticator,
+    split_challenge_domain,
+    with_plugin_defaults,
+)
+from tests.porkbun_stub import FakePorkbunAPI
+
+API = "https://api.porkbun.com/api/json/v3"
 
 
 class TestCertClient(unittest.TestCase):
@@ -54,7 +70,7 @@ class TestCertClient(unittest.TestCase):
             https_port=443,
             domains=["example.com"],
         )
-        config = NamespaceConfig(namespace)
+        config = NamespaceConfig(with_plugin_defaults(namespace))
 
         authenticator = Authenticator(config, name="porkbun")
 
@@ -100,7 +116,7 @@ class TestCertClient(unittest.TestCase):
             https_port=443,
             domains=["example.com"],
         )
-        config = NamespaceConfig(namespace)
+        config = NamespaceConfig(with_plugin_defaults(namespace))
 
         authenticator = Authenticator(config, name="porkbun")
 
@@ -153,7 +169,7 @@ class TestCertClient(unittest.TestCase):
             https_port=443,
             domains=["example.co.uk"],
         )
-        config = NamespaceConfig(namespace)
+        config = NamespaceConfig(with_plugin_defaults(namespace))
 
         authenticator = Authenticator(config, name="porkbun")
 
@@ -218,7 +234,7 @@ class TestCertClient(unittest.TestCase):
             https_port=443,
             domains=["example.com"],
         )
-        config = NamespaceConfig(namespace)
+        config = NamespaceConfig(with_plugin_defaults(namespace))
 
         authenticator = Authenticator(config, name="porkbun")
 
@@ -279,7 +295,7 @@ class TestCertClient(unittest.TestCase):
             https_port=443,
             domains=["example.com"],
         )
-        config = NamespaceConfig(namespace)
+        config = NamespaceConfig(with_plugin_defaults(namespace))
 
         authenticator = Authenticator(config, name="porkbun")
 
@@ -339,10 +355,459 @@ class TestCertClient(unittest.TestCase):
             https_port=443,
             domains=["example.com"],
         )
-        config = NamespaceConfig(namespace)
+        config = NamespaceConfig(with_plugin_defaults(namespace))
 
         authenticator = Authenticator(config, name="porkbun")
 
         authenticator._cleanup(
             domain="example.com", validation_name="", validation="ABCDEF"
         )
+
+
+@mock.patch("certbot_dns_porkbun.cert.client.time.sleep")
+class TestBatchedChallenges(unittest.TestCase):
+    def setUp(self):
+        patcher = mock.patch(
+            "certbot_dns_porkbun.cert.client.resolve_challenge_domain_with_ttl",
+            side_effect=lambda domain, *_: (*split_challenge_domain(domain), 300),
+        )
+        self.resolve = patcher.start()
+        self.addCleanup(patcher.stop)
+        self.achalls = [
+            create_achall("example.com", token=b"a" * 16),
+            create_achall("*.example.com", token=b"b" * 16),
+            create_achall("www.example.com", token=b"c" * 16),
+            create_achall("example.org", token=b"d" * 16),
+        ]
+        self.validations = [
+            achall.validation(achall.account_key) for achall in self.achalls
+        ]
+
+    @responses.activate
+    def test_perform_lists_each_zone_once(self, *_):
+        responses.post(
+            url=f"{API}/dns/retrieve/example.com",
+            json={
+                "status": "SUCCESS",
+                "records": [
+                    {
+                        "id": "1",
+                        "name": "_acme-challenge.example.com",
+                        "type": "TXT",
+                        "content": self.validations[1],
+                        "ttl": "600",
+                        "prio": "0",
+                        "notes": "",
+                    },
+                    {
+                        "id": "2",
+                        "name": "www.example.com",
+                        "type": "A",
+                        "content": "192.0.2.1",
+                        "ttl": "600",
+                        "prio": "0",
+                        "notes": "",
+                    },
+                ],
+            },
+        )
+        responses.post(
+            url=f"{API}/dns/retrieveByNameType/example.org/TXT/_acme-challenge",
+            json={"status": "SUCCESS", "records": []},
+        )
+        responses.post(
+            url=f"{API}/dns/create/example.com",
+            json={"status": "SUCCESS", "id": "3"},
+        )
+        responses.post(
+            url=f"{API}/dns/create/example.org",
+            json={"status": "SUCCESS", "id": "4"},
+        )
+
+        authenticator = create_authenticator()
+        result = authenticator.perform(self.achalls)
+
+        self.assertEqual(len(result), 4)
+        assert responses.assert_call_count(f"{API}/dns/retrieve/example.com", 1)
+        assert responses.assert_call_count(
+            f"{API}/dns/retrieveByNameType/example.org/TXT/_acme-challenge", 1
+        )
+        assert responses.assert_call_count(f"{API}/dns/create/example.com", 2)
+        assert responses.assert_call_count(f"{API}/dns/create/example.org", 1)
+        self.assertEqual(self.resolve.call_count, len(self.achalls))
+
+    @responses.activate
+    def test_cleanup_lists_each_zone_once(self, *_):
+        responses.post(
+            url=f"{API}/dns/retrieve/example.com",
+            json={
+                "status": "SUCCESS",
+                "records": [
+                    {
+                        "id": str(i),
+                        "name": name,
+                        "type": "TXT",
+                        "content": self.validations[i],
+                        "ttl": "600",
+                        "prio": "0",
+                        "notes": "",
+                    }
+                    for i, name in enumerate(
+                        [
+                            "_acme-challenge.example.com",
+                            "_acme-challenge.example.com",
+                            "_acme-challenge.www.example.com",
+                        ]
+                    )
+                ],
+            },
+        )
+        responses.post(
+            url=f"{API}/dns/retrieveByNameType/example.org/TXT/_acme-challenge",
+            json={"status": "SUCCESS", "records": []},
+        )
+        for i in range(3):
+            responses.post(
+                url=f"{API}/dns/delete/example.com/{i}",
+                json={"status": "SUCCESS"},
+            )
+
+        authenticator = create_authenticator()
+        authenticator._attempt_cleanup = True
+        authenticator.cleanup(self.achalls)
+
+        assert responses.assert_call_count(f"{API}/dns/retrieve/example.com", 1)
+        assert responses.assert_call_count(
+            f"{API}/dns/retrieveByNameType/example.org/TXT/_acme-challenge", 1
+        )
+        for i in range(3):
+            assert responses.assert_call_count(f"{API}/dns/delete/example.com/{i}", 1)
+        self.assertEqual(self.resolve.call_count, len(self.achalls))
+
+
+@mock.patch("certbot_dns_porkbun.cert.client.time.sleep")
+class TestConcurrentZones(unittest.TestCase):
+    zones = ("example.com", "example.org", "example.net")
+
+    def setUp(self):
+        patcher = mock.patch(
+            "certbot_dns_porkbun.cert.client.resolve_challenge_domain_with_ttl",
+            side_effect=lambda domain, *_: (*split_challenge_domain(domain), 300),
+        )
+        self.resolve = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    @responses.activate
+    def test_perform_zones_in_parallel(self, *_):
+        barrier = threading.Barrier(len(self.zones), timeout=5)
+
+        def list_records(_):
+            barrier.wait()
+            return 200, {}, '{"status": "SUCCESS", "records": []}'
+
+        for zone in self.zones:
+            responses.add_callback(
+                responses.POST,
+                f"{API}/dns/retrieveByNameType/{zone}/TXT/_acme-challenge",
+                callback=list_records,
+            )
+            responses.post(
+                url=f"{API}/dns/create/{zone}", json={"status": "SUCCESS", "id": "1"}
+            )
+
+        authenticator = create_authenticator(porkbun_max_concurrency=len(self.zones))
+        authenticator.perform([create_achall(zone) for zone in self.zones])
+
+        for zone in self.zones:
+            assert responses.assert_call_count(f"{API}/dns/create/{zone}", 1)
+        self.assertEqual(self.resolve.call_count, len(self.zones))
+
+    @responses.activate
+    def test_perform_collects_zone_errors(self, *_):
+        for zone in self.zones:
+            responses.post(
+                url=f"{API}/dns/retrieveByNameType/{zone}/TXT/_acme-challenge",
+                json={"status": "SUCCESS", "records": []},
+            )
+        responses.post(
+            url=f"{API}/dns/create/example.com", json={"status": "SUCCESS", "id": "1"}
+        )
+        for zone in self.zones[1:]:
+            responses.post(
+                url=f"{API}/dns/create/{zone}",
+                status=400,
+                json={"status": "ERROR", "message": f"Invalid domain {zone}"},
+            )
+
+        authenticator = create_authenticator()
+        with self.assertRaises(PluginError) as context:
+            authenticator.perform([create_achall(zone) for zone in self.zones])
+
+        message = str(context.exception)
+        self.assertLess(message.index("example.org:"), message.index("example.net:"))
+        self.assertNotIn("example.com:", message)
+        assert responses.assert_call_count(f"{API}/dns/create/example.com", 1)
+        self.assertEqual(self.resolve.call_count, len(self.zones))
+
+
+@mock.patch(
+    "dns.resolver.resolve",
+    side_effect=resolver.NoAnswer,
+)
+class TestResolveChallengeDomain(unittest.TestCase):
+    @responses.activate
+    def test_offline_suffix_list(self, _):
+        # no passthru for the public suffix list, any fetch would fail
+        self.assertEqual(
+            client.resolve_challenge_domain("*.example.co.uk"),
+            ("example.co.uk", "_acme-challenge"),
+        )
+        self.assertEqual(
+            client.resolve_challenge_domain("www.example.com"),
+            ("example.com", "_acme-challenge.www"),
+        )
+        self.assertEqual(len(responses.calls), 0)
+
+    def test_memoized_split(self, _):
+        client.split_domain.cache_clear()
+
+        client.resolve_challenge_domain("example.com")
+        client.resolve_challenge_domain("*.example.com")
+
+        self.assertEqual(client.split_domain.cache_info().hits, 1)
+        self.assertEqual(client.split_domain.cache_info().misses, 1)
+
+    def test_persistent_cache_dir(self, _):
+        with tempfile.TemporaryDirectory() as cache_dir:
+            self.assertEqual(
+                client.resolve_challenge_domain("example.com", cache_dir),
+                ("example.com", "_acme-challenge"),
+            )
+            self.assertNotEqual(os.listdir(cache_dir), [])
+
+
+class TestResolveChallengeDomains(unittest.TestCase):
+    @staticmethod
+    def resolve(domain, *_):
+        if domain == "invalid.example.org":
+            raise resolver.NoNameservers()
+        if domain.endswith("example.net"):
+            return "example.org", "_acme-challenge", 60.0
+        return *split_challenge_domain(domain), 300.0
+
+    def test_order_and_shared_lookups(self):
+        domains = [
+            "example.com",
+            "www.example.net",
+            "invalid.example.org",
+            "*.example.com",
+            "example.io",
+        ]
+
+        with mock.patch(
+            "certbot_dns_porkbun.cert.client.resolve_challenge_domain_with_ttl",
+            side_effect=self.resolve,
+        ) as resolve:
+            results = list(
+                client.resolve_challenge_domains(iter(domains), max_concurrency=2)
+            )
+
+        self.assertEqual([result.domain for result in results], domains)
+        self.assertEqual(
+            [(result.root_domain, result.name, result.ttl) for result in results],
+            [
+                ("example.com", "_acme-challenge", 300.0),
+                ("example.org", "_acme-challenge", 60.0),
+                (None, None, None),
+                ("example.com", "_acme-challenge", 300.0),
+                ("example.io", "_acme-challenge", 300.0),
+            ],
+        )
+        self.assertEqual(
+            [result.delegated for result in results], [False, True, False, False, False]
+        )
+        # the wildcard shares the lookup of its base domain
+        self.assertEqual(
+            [result.cached for result in results], [False, False, False, True, False]
+        )
+        self.assertEqual(resolve.call_count, 4)
+        self.assertIsInstance(results[2].error, resolver.NoNameservers)
+        self.assertTrue(all(result.seconds >= 0 for result in results))
+
+    def test_single_domain_raises(self):
+        with mock.patch(
+            "certbot_dns_porkbun.cert.client.resolve_challenge_domain_with_ttl",
+            side_effect=self.resolve,
+        ):
+            self.assertEqual(
+                client.resolve_challenge_domain("www.example.net"),
+                ("example.org", "_acme-challenge"),
+            )
+            with self.assertRaises(resolver.NoNameservers):
+                client.resolve_challenge_domain("invalid.example.org")
+
+
+@mock.patch("certbot_dns_porkbun.cert.client.time.sleep")
+class TestResolutionCache(unittest.TestCase):
+    @responses.activate
+    def test_perform_and_cleanup_resolve_once(self, _):
+        domains = ["example.com", "www.example.com", "example.org"]
+        responses.post(
+            url=f"{API}/dns/retrieve/example.com",
+            json={"status": "SUCCESS", "records": []},
+        )
+        responses.post(
+            url=f"{API}/dns/retrieveByNameType/example.org/TXT/_acme-challenge",
+            json={"status": "SUCCESS", "records": []},
+        )
+        for zone in ["example.com", "example.org"]:
+            responses.post(
+                url=f"{API}/dns/create/{zone}", json={"status": "SUCCESS", "id": "1"}
+            )
+
+        achalls = [create_achall(domain) for domain in domains]
+        authenticator = create_authenticator()
+        with mock.patch(
+            "certbot_dns_porkbun.cert.client.resolve_challenge_domain_with_ttl",
+            side_effect=lambda domain, *_: (*split_challenge_domain(domain), 0),
+        ) as resolve:
+            authenticator.perform(achalls)
+            authenticator.cleanup(achalls)
+
+        # the TTL of 0 is already expired, but the cleanup must use the same records as the perform
+        self.assertEqual(resolve.call_count, 3)
+        self.assertEqual(authenticator._resolution_cache.hits, 3)
+        self.assertEqual(authenticator._resolution_cache.misses, 3)
+
+    def test_evict_expired(self, _):
+        cache = client.ResolutionCache()
+        cache.put("example.com", ("example.com", "_acme-challenge"), 0)
+        cache.put("example.org", ("example.org", "_acme-challenge"), 300)
+        cache.get("example.com")
+
+        cache.evict_expired()
+
+        self.assertIsNone(cache.get("example.com", allow_expired=True))
+        self.assertEqual(cache.get("example.org"), ("example.org", "_acme-challenge"))
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+
+    def test_expired_resolution_is_refreshed(self, _):
+        authenticator = create_authenticator()
+        with mock.patch(
+            "certbot_dns_porkbun.cert.client.resolve_challenge_domain_with_ttl",
+            side_effect=[
+                ("example.com", "_acme-challenge", 0),
+                ("example.net", "_acme-challenge", 300),
+            ],
+        ):
+            self.assertEqual(
+                authenticator._resolve_challenge_domain("example.com"),
+                ("example.com", "_acme-challenge"),
+            )
+            self.assertEqual(
+                authenticator._resolve_challenge_domain("example.com"),
+                ("example.net", "_acme-challenge"),
+            )
+            self.assertEqual(
+                authenticator._resolve_challenge_domain("example.com"),
+                ("example.net", "_acme-challenge"),
+            )
+
+    @mock.patch("dns.resolver.resolve")
+    def test_ttl_from_answer(self, resolve, _):
+        resolve.return_value = mock.Mock(
+            canonical_name=mock.Mock(
+                to_text=mock.Mock(return_value="_acme-challenge.example.net.")
+            ),
+            expiration=time.time() + 120,
+        )
+
+        root_domain, name, ttl = client.resolve_challenge_domain_with_ttl("example.com")
+
+        self.assertEqual((root_domain, name), ("example.net", "_acme-challenge"))
+        self.assertAlmostEqual(ttl, 120, delta=5)
+
+
+@mock.patch(
+    "certbot_dns_porkbun.cert.client.resolve_challenge_domain_with_ttl",
+    side_effect=lambda domain, *_: (*split_challenge_domain(domain), 300),
+)
+class TestRecordReconciliation(unittest.TestCase):
+    def setUp(self):
+        self.api = FakePorkbunAPI().__enter__()
+        self.stale_id = self.api.add_record(
+            "example.com", "_acme-challenge", "TXT", "STALE"
+        )
+        self.other_id = self.api.add_record(
+            "example.com", "_acme-challenge.other", "TXT", "OTHER"
+        )
+        # the wildcard and the apex domain share the same challenge name
+        self.achalls = [
+            create_achall("example.com", token=b"a" * 16),
+            create_achall("*.example.com", token=b"b" * 16),
+        ]
+        self.validations = {
+            achall.validation(achall.account_key) for achall in self.achalls
+        }
+
+    def tearDown(self):
+        self.api.__exit__()
+
+    def _values(self, name: str) -> set[str]:
+        return {
+            record["content"]
+            for record in self.api.records("example.com")
+            if record["name"] == name
+        }
+
+    def test_ttl(self, _):
+        authenticator = create_authenticator(
+            porkbun_api_endpoint=self.api.endpoint, porkbun_ttl=900
+        )
+        authenticator.perform(self.achalls)
+
+        self.assertEqual(
+            {
+                record["ttl"]
+                for record in self.api.records("example.com")
+                if record["content"] in self.validations
+            },
+            {"900"},
+        )
+
+    def test_ttl_out_of_range(self, _):
+        for ttl in (60, 86401):
+            with self.subTest(ttl=ttl):
+                authenticator = create_authenticator(
+                    porkbun_api_endpoint=self.api.endpoint, porkbun_ttl=ttl
+                )
+                with self.assertRaises(PluginError):
+                    authenticator.perform(self.achalls)
+
+        self.assertNotIn("dns/create", self.api.calls)
+
+    def test_prune_stale_records(self, _):
+        existing = next(iter(self.validations))
+        self.api.add_record("example.com", "_acme-challenge", "TXT", existing)
+
+        authenticator = create_authenticator(
+            porkbun_api_endpoint=self.api.endpoint, porkbun_prune_stale_records=True
+        )
+        authenticator.perform(self.achalls)
+
+        self.assertEqual(self._values("_acme-challenge.example.com"), self.validations)
+        # the existing record with a current value is reused
+        self.assertEqual(self.api.calls["dns/create"], 1)
+        # records of other names are not touched
+        self.assertEqual(self._values("_acme-challenge.other.example.com"), {"OTHER"})
+        self.assertEqual(
+            authenticator._metrics.summary()["counters"]["stale_records_deleted"], 1
+        )
+
+    def test_keep_stale_records(self, _):
+        authenticator = create_authenticator(porkbun_api_endpoint=self.api.endpoint)
+        authenticator.perform(self.achalls)
+
+        self.assertEqual(
+            self._values("_acme-challenge.example.com"), self.validations | {"STALE"}
+        )
@@ -0,0 +1,25 @@
+import unittest
+
+from benchmarks import import_time
+
+# budget of the additional import time of the plugin relative to the import time of the certbot modules in the same
+# interpreter, the plugin adds about 3ms to the about 250ms of the certbot modules
+IMPORT_TIME_FRACTION = 0.05
+
+
+class TestImportTime(unittest.TestCase):
+    def test_deferred_modules_not_imported(self):
+        self.assertEqual(import_time.measure().imported, [])
+
+    def test_import_time_budget(self):
+        # the fastest of a few runs is the least affected by other load on the machine
+        result = min(
+            (import_time.measure() for _ in range(3)),
+            key=lambda result: result.seconds / result.baseline_seconds,
+        )
+
+        self.assertLess(result.seconds, result.baseline_seconds * IMPORT_TIME_FRACTION)
+
+
+if __name__ == "__main__":
+    unittest.main()
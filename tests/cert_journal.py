@@ -0,0 +1,142 @@
+import json
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from certbot_dns_porkbun.cert.journal import JOURNAL_FILENAME, RecordJournal
+from tests.helpers import create_achall, create_authenticator, split_challenge_domain
+from tests.porkbun_stub import FakePorkbunAPI
+
+
+class TestRecordJournal(unittest.TestCase):
+    def test_persisted(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, JOURNAL_FILENAME)
+            journal = RecordJournal(path)
+            journal.add("1", "example.com", "_acme-challenge", "a")
+            journal.add("2", "example.org", "_acme-challenge.www", "b")
+            journal.save()
+
+            journal = RecordJournal(path)
+            entry = journal.find("example.com", "_acme-challenge", "a")
+            self.assertEqual(entry.record_id, "1")
+            self.assertEqual(
+                sorted(journal.entries_by_zone()), ["example.com", "example.org"]
+            )
+
+            journal.remove(entry)
+            journal.save()
+            self.assertEqual(len(RecordJournal(path)), 1)
+
+    def test_unreadable_journal(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, JOURNAL_FILENAME)
+            with open(path, "w", encoding="utf-8") as f:
+                f.write("{")
+
+            with self.assertLogs(level="WARNING"):
+                journal = RecordJournal(path)
+            self.assertEqual(len(journal), 0)
+
+
+@mock.patch("certbot_dns_porkbun.cert.client.time.sleep")
+@mock.patch(
+    "certbot_dns_porkbun.cert.client.resolve_challenge_domain_with_ttl",
+    side_effect=lambda domain, *_: (*split_challenge_domain(domain), 300),
+)
+class TestAuthenticatorJournal(unittest.TestCase):
+    def setUp(self):
+        self.work_dir = tempfile.TemporaryDirectory()
+        self.server = FakePorkbunAPI().__enter__()
+
+    def tearDown(self):
+        self.server.__exit__()
+        self.work_dir.cleanup()
+
+    def _create_authenticator(self):
+        return create_authenticator(
+            porkbun_api_endpoint=self.server.endpoint,
+            porkbun_journal=True,
+            work_dir=self.work_dir.name,
+        )
+
+    def _journal_entries(self) -> list:
+        with open(
+            os.path.join(self.work_dir.name, JOURNAL_FILENAME), encoding="utf-8"
+        ) as f:
+            return json.load(f)
+
+    def test_no_listing(self, *_):
+        achalls = [
+            create_achall(domain)
+            for domain in ["example.com", "www.example.com", "example.org"]
+        ]
+        authenticator = self._create_authenticator()
+
+        authenticator.perform(achalls)
+        self.assertEqual(len(self._journal_entries()), 3)
+        authenticator.cleanup(achalls)
+
+        self.assertEqual(self.server.calls["dns/create"], 3)
+        self.assertEqual(self.server.calls["dns/delete"], 3)
+        self.assertEqual(self.server.calls["dns/retrieve"], 0)
+        self.assertEqual(self.server.calls["dns/retrieveByNameType"], 0)
+        self.assertEqual(self.server.records("example.com"), [])
+        self.assertEqual(self._journal_entries(), [])
+
+    def test_sweep_orphaned_records(self, *_):
+        orphaned = [create_achall("example.com"), create_achall("example.org")]
+        # the first run is interrupted before the cleanup
+        self._create_authenticator().perform(orphaned)
+        # a record which was deleted manually in the meantime
+        record_id = self.server.records("example.org")[0]["id"]
+        self.server.zones["example.org"].pop(record_id)
+
+        achalls = [create_achall("www.example.com", token=b"b" * 16)]
+        authenticator = self._create_authenticator()
+        authenticator.perform(achalls)
+
+        records = self.server.records("example.com")
+        self.assertEqual(len(records), 1)
+        self.assertEqual(records[0]["name"], "_acme-challenge.www.example.com")
+        self.assertEqual(len(self._journal_entries()), 1)
+
+        authenticator.cleanup(achalls)
+        self.assertEqual(self.server.records("example.com"), [])
+        self.assertEqual(self._journal_entries(), [])
+
+    def test_sweep_keeps_records_on_temporary_errors(self, *_):
+        self._create_authenticator().perform([create_achall("example.com")])
+        self.server.error_rate = 1.0
+
+        authenticator = create_authenticator(
+            porkbun_api_endpoint=self.server.endpoint,
+            porkbun_journal=True,
+            porkbun_max_retries=0,
+            work_dir=self.work_dir.name,
+        )
+        with self.assertLogs(level="WARNING"):
+            authenticator._sweep_journal()
+
+        self.assertEqual(len(self._journal_entries()), 1)
+
+    def test_sweep_keeps_records_on_permanent_errors(self, *_):
+        self._create_authenticator().perform([create_achall("example.com")])
+        self.server.owners["example.com"] = "other-key"
+
+        with self.assertLogs(level="WARNING") as logs:
+            self._create_authenticator()._sweep_journal()
+
+        self.assertIn("kept in the journal", "\n".join(logs.output))
+        self.assertEqual(len(self._journal_entries()), 1)
+        self.assertEqual(len(self.server.records("example.com")), 1)
+
+        del self.server.owners["example.com"]
+        self._create_authenticator()._sweep_journal()
+        self.assertEqual(self._journal_entries(), [])
+        self.assertEqual(self.server.records("example.com"), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
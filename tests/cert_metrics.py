@@ -0,0 +1,111 @@
+import json
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from certbot_dns_porkbun.cert.metrics import Metrics
+from tests.helpers import create_achall, create_authenticator, split_challenge_domain
+from tests.porkbun_stub import FakePorkbunAPI
+
+
+class TestMetrics(unittest.TestCase):
+    def test_summary(self):
+        metrics = Metrics()
+        with metrics.timer("resolve", domain="example.com"):
+            pass
+        metrics.record("resolve", 0.5, domain="www.example.com")
+        metrics.record_api_call("dns/create", "example.com", 0.25)
+        metrics.record_api_call("dns/create", "example.com", 0.75, error=True)
+
+        summary = metrics.summary()
+
+        self.assertEqual(summary["phases"]["resolve"]["count"], 2)
+        self.assertEqual(summary["phases"]["resolve"]["max_seconds"], 0.5)
+        self.assertEqual(summary["domains"]["www.example.com"]["resolve"]["count"], 1)
+        self.assertEqual(
+            summary["zones"]["example.com"]["api:dns/create"],
+            {"count": 2, "seconds": 1.0, "max_seconds": 0.75},
+        )
+        self.assertEqual(summary["counters"], {"api_calls": 2, "api_errors": 1})
+
+    def test_reset(self):
+        metrics = Metrics()
+        metrics.record("resolve", 0.5, domain="example.com", zone="example.com")
+        metrics.count("stale_records_deleted")
+
+        metrics.reset()
+
+        summary = metrics.summary()
+        self.assertEqual(
+            (
+                summary["counters"],
+                summary["phases"],
+                summary["domains"],
+                summary["zones"],
+            ),
+            ({}, {}, {}, {}),
+        )
+
+    def test_write_prometheus(self):
+        metrics = Metrics()
+        metrics.record("propagation", 12.5)
+        metrics.record_api_call("dns/create", "example.com", 0.25)
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "porkbun.prom")
+            metrics.write_prometheus(path)
+            with open(path) as f:
+                lines = f.read().splitlines()
+
+        self.assertIn("certbot_dns_porkbun_api_calls_total 1", lines)
+        self.assertIn(
+            'certbot_dns_porkbun_phase_seconds{phase="propagation"} 12.500000', lines
+        )
+        self.assertIn(
+            'certbot_dns_porkbun_zone_phase_count{zone="example.com",phase="api:dns/create"} 1',
+            lines,
+        )
+        self.assertEqual(
+            len([line for line in lines if line.startswith("# TYPE")]),
+            len({line for line in lines if line.startswith("# TYPE")}),
+        )
+
+
+@mock.patch(
+    "certbot_dns_porkbun.cert.client.resolve_challenge_domain_with_ttl",
+    side_effect=lambda domain, *_: (*split_challenge_domain(domain), 300),
+)
+class TestAuthenticatorMetrics(unittest.TestCase):
+    def test_export_after_cleanup(self, _):
+        achalls = [
+            create_achall(domain)
+            for domain in ["example.com", "www.example.com", "example.org"]
+        ]
+
+        with FakePorkbunAPI() as server, tempfile.TemporaryDirectory() as directory:
+            json_path = os.path.join(directory, "metrics.json")
+            prometheus_path = os.path.join(directory, "metrics.prom")
+            authenticator = create_authenticator(
+                porkbun_api_endpoint=server.endpoint,
+                porkbun_metrics_json=json_path,
+                porkbun_metrics_prometheus=prometheus_path,
+            )
+            authenticator.perform(achalls)
+            authenticator.cleanup(achalls)
+
+            with open(json_path) as f:
+                summary = json.load(f)
+            self.assertTrue(os.path.exists(prometheus_path))
+
+        for phase in ["perform", "propagation", "cleanup", "resolve"]:
+            self.assertIn(phase, summary["phases"])
+        self.assertEqual(summary["phases"]["resolve"]["count"], 3)
+        self.assertEqual(summary["counters"]["api_calls"], 10)
+        self.assertEqual(summary["counters"]["resolution_cache_hits"], 3)
+        self.assertEqual(summary["zones"]["example.com"]["api:dns/create"]["count"], 2)
+        self.assertEqual(
+            summary["zones"]["example.org"]["api:dns/retrieveByNameType"]["count"], 2
+        )
+        self.assertIn("perform_zone", summary["zones"]["example.org"])
+        self.assertIn("resolve", summary["domains"]["www.example.com"])
@@ -0,0 +1,300 @@
+import threading
+import time
+import unittest
+from unittest import mock
+
+from certbot_dns_porkbun.cert import propagation
+from certbot_dns_porkbun.cert.client import ChallengeRecord, _ZoneBatcher
+from certbot_dns_porkbun.cert.pipeline import PipelineError, Stage, run_pipeline
+from tests.dns_stub import StubDNSServer
+from tests.helpers import create_achall, create_authenticator, split_challenge_domain
+from tests.porkbun_stub import FakePorkbunAPI
+
+
+class TestPipeline(unittest.TestCase):
+    def test_stages_keep_order(self):
+        seen = []
+
+        def record(stage):
+            def function(item):
+                seen.append((stage, item))
+                return [item]
+
+            return function
+
+        results = run_pipeline(
+            range(5),
+            [Stage("first", record("first")), Stage("second", record("second"))],
+        )
+
+        self.assertEqual(results, list(range(5)))
+        # single worker stages process their items in order, each item passes the first stage before the second
+        self.assertEqual(
+            [item for stage, item in seen if stage == "second"], list(range(5))
+        )
+        for item in range(5):
+            self.assertLess(seen.index(("first", item)), seen.index(("second", item)))
+
+    def test_stages_overlap(self):
+        second_started = threading.Event()
+
+        def first(item):
+            # the second item is only processed once the first item reached the second stage
+            if item == 1:
+                self.assertTrue(second_started.wait(5))
+            return [item]
+
+        def second(item):
+            second_started.set()
+            return [item]
+
+        self.assertEqual(
+            run_pipeline(range(2), [Stage("first", first), Stage("second", second)]),
+            [0, 1],
+        )
+
+    def test_bounded_queue(self):
+        consumed = []
+        release = threading.Event()
+
+        def source():
+            for item in range(10):
+                consumed.append(item)
+                yield item
+
+        def slow(item):
+            release.wait(5)
+            return [item]
+
+        thread = threading.Thread(
+            target=run_pipeline, args=(source(), [Stage("slow", slow)], 2)
+        )
+        thread.start()
+        time.sleep(0.2)
+
+        # one item is processed and two are waiting in the queue, the next one is blocked
+        self.assertLessEqual(len(consumed), 4)
+        release.set()
+        thread.join(5)
+        self.assertEqual(len(consumed), 10)
+
+    def test_failures_are_collected(self):
+        def first(item):
+            if item == 1:
+                raise ValueError("first failed")
+            return [item]
+
+        def second(item):
+            if item == 3:
+                raise ValueError("second failed")
+            return [item * 10]
+
+        passed = []
+        with self.assertRaises(PipelineError) as context:
+            run_pipeline(
+                range(5),
+                [
+                    Stage("first", first, workers=2),
+                    Stage("second", second),
+                    Stage("collect", lambda item: passed.append(item) or [item]),
+                ],
+            )
+
+        self.assertEqual(
+            [(failure.stage, failure.item) for failure in context.exception.failures],
+            [("first", 1), ("second", 3)],
+        )
+        # the failed items are not passed on, all other items are processed
+        self.assertEqual(sorted(passed), [0, 20, 40])
+
+    def test_flush(self):
+        collected = []
+
+        def collect(item):
+            collected.append(item)
+            return []
+
+        self.assertEqual(
+            run_pipeline(
+                range(3),
+                [
+                    Stage("batch", collect, flush=lambda: [list(collected)]),
+                    Stage("sum", lambda batch: [sum(batch)]),
+                ],
+            ),
+            [3],
+        )
+
+    def test_debug_log(self):
+        with self.assertLogs(level="DEBUG") as logs:
+            run_pipeline(range(3), [Stage("only", lambda item: [item])])
+
+        self.assertIn("Pipeline stage only: 3 items", "\n".join(logs.output))
+
+
+class TestZoneBatcher(unittest.TestCase):
+    def test_release_when_resolved(self):
+        batcher = _ZoneBatcher({"example.com": 2, "example.org": 1})
+        first = ChallengeRecord("example.com", "example.com", "_acme-challenge", "a")
+        second = ChallengeRecord(
+            "www.example.com", "example.com", "_acme-challenge.www", "b"
+        )
+
+        self.assertEqual(batcher.add((1, "example.com", second)), [])
+        batches = batcher.add((0, "example.com", first))
+
+        self.assertEqual(
+            [(batch.root_domain, batch.challenges, batch.index) for batch in batches],
+            [("example.com", [first, second], 0)],
+        )
+
+    def test_delegated_challenges_released_on_flush(self):
+        batcher = _ZoneBatcher({"example.com": 1, "example.org": 1})
+
+        for index, domain in enumerate(["example.com", "example.org"]):
+            self.assertEqual(
+                batcher.add(
+                    (
+                        index,
+                        domain,
+                        ChallengeRecord(domain, "example.net", "_acme-challenge", "a"),
+                    )
+                ),
+                [],
+            )
+
+        batches = batcher.flush()
+        self.assertEqual([batch.root_domain for batch in batches], ["example.net"])
+        self.assertEqual(len(batches[0].challenges), 2)
+
+
+class TestPropagationTracker(unittest.TestCase):
+    def test_names_added_while_polling(self):
+        with StubDNSServer({"_acme-challenge.example.com": ["ABCDEF"]}) as server:
+            tracker = propagation.PropagationTracker(interval=0.1)
+            tracker.add("_acme-challenge.example.com", {"ABCDEF"}, [server.address], 5)
+            time.sleep(0.2)
+            server.records["_acme-challenge.example.org"] = ["GHIJKL"]
+            tracker.add("_acme-challenge.example.org", {"GHIJKL"}, [server.address], 5)
+
+            self.assertTrue(tracker.wait())
+        self.assertIn(("_acme-challenge.example.org", 16), server.queries)
+
+    def test_timeout_per_name(self):
+        with StubDNSServer({}) as server:
+            tracker = propagation.PropagationTracker(interval=0.1)
+            tracker.add(
+                "_acme-challenge.example.com", {"ABCDEF"}, [server.address], 0.3
+            )
+
+            start = time.monotonic()
+            self.assertFalse(tracker.wait())
+        self.assertLess(time.monotonic() - start, 2)
+        self.assertEqual(tracker.timed_out, ["_acme-challenge.example.com"])
+
+    def test_failed_check_is_not_propagated(self):
+        tracker = propagation.PropagationTracker(interval=0.1)
+        with self.assertLogs(level="WARNING") as logs:
+            tracker.add(
+                "_acme-challenge.example.com", {"ABCDEF"}, [("ns.example.com", 53)], 0.3
+            )
+
+            start = time.monotonic()
+            self.assertFalse(tracker.wait())
+        self.assertGreaterEqual(time.monotonic() - start, 0.25)
+        self.assertEqual(tracker.timed_out, ["_acme-challenge.example.com"])
+        self.assertIn(
+            "Propagation check of '_acme-challenge.example.com' failed",
+            "\n".join(logs.output),
+        )
+
+    def test_failed_thread_waits_remaining_time(self):
+        tracker = propagation.PropagationTracker(interval=0.1)
+        with (
+            mock.patch.object(
+                propagation, "_is_propagated", side_effect=RuntimeError("failed")
+            ),
+            mock.patch.object(propagation.threading, "excepthook"),
+            mock.patch.object(propagation.time, "sleep") as sleep,
+        ):
+            tracker.add("_acme-challenge.example.com", {"ABCDEF"}, [], 30)
+            self.assertFalse(tracker.wait())
+
+        (remaining,) = sleep.call_args.args
+        self.assertGreater(remaining, 25)
+        self.assertEqual(tracker.timed_out, ["_acme-challenge.example.com"])
+
+
+class TestPipelinedPerform(unittest.TestCase):
+    def setUp(self):
+        self.api = FakePorkbunAPI().__enter__()
+
+    def tearDown(self):
+        self.api.__exit__()
+
+    def test_records_created_while_resolving(self):
+        def resolve(domain, *_):
+            # the records of the first root domain are created before the last domain is resolved
+            if domain == "example.org":
+                deadline = time.monotonic() + 5
+                while not self.api.records("example.com"):
+                    self.assertLess(time.monotonic(), deadline)
+                    time.sleep(0.01)
+            return (*split_challenge_domain(domain), 300)
+
+        authenticator = create_authenticator(
+            porkbun_api_endpoint=self.api.endpoint, porkbun_max_concurrency=2
+        )
+        with mock.patch(
+            "certbot_dns_porkbun.cert.client.resolve_challenge_domain_with_ttl",
+            side_effect=resolve,
+        ):
+            authenticator.perform(
+                [create_achall("example.com"), create_achall("example.org")]
+            )
+
+        self.assertEqual(len(self.api.records("example.org")), 1)
+
+    def test_delegated_zone_listed_once(self):
+        authenticator = create_authenticator(porkbun_api_endpoint=self.api.endpoint)
+        with mock.patch(
+            "certbot_dns_porkbun.cert.client.resolve_challenge_domain_with_ttl",
+            return_value=("example.net", "_acme-challenge", 300),
+        ):
+            authenticator.perform(
+                [
+                    create_achall("example.com", token=b"a" * 16),
+                    create_achall("example.org", token=b"b" * 16),
+                ]
+            )
+
+        self.assertEqual(len(self.api.records("example.net")), 2)
+        self.assertEqual(
+            self.api.calls["dns/retrieve"] + self.api.calls["dns/retrieveByNameType"],
+            1,
+        )
+
+    def test_resolution_error_reported(self):
+        def resolve(domain, *_):
+            if domain == "example.org":
+                raise ValueError("resolution failed")
+            return (*split_challenge_domain(domain), 300)
+
+        authenticator = create_authenticator(porkbun_api_endpoint=self.api.endpoint)
+        with (
+            mock.patch(
+                "certbot_dns_porkbun.cert.client.resolve_challenge_domain_with_ttl",
+                side_effect=resolve,
+            ),
+            self.assertRaisesRegex(Exception, "example.org: resolution failed"),
+        ):
+            authenticator.perform(
+                [create_achall("example.com"), create_achall("example.org")]
+            )
+
+        # the records of the other domains are still created, so that they are cleaned up
+        self.assertEqual(len(self.api.records("example.com")), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
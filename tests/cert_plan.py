@@ -0,0 +1,162 @@
+import tempfile
+import unittest
+from unittest import mock
+
+from certbot.errors import PluginError
+
+from certbot_dns_porkbun.cert.journal import JOURNAL_FILENAME, RecordJournal
+from certbot_dns_porkbun.cert.plan import estimate_api_seconds
+from tests.helpers import create_achall, create_authenticator, split_challenge_domain
+from tests.porkbun_stub import FakePorkbunAPI
+
+
+class TestEstimateApiSeconds(unittest.TestCase):
+    def test_sequential_calls_per_zone(self):
+        # two workers process the root domains with 3, 1 and 1 calls in their order
+        self.assertAlmostEqual(
+            estimate_api_seconds([[1, 2], [1, 0], [0, 1]], 0.1, 2, 0), 0.3
+        )
+
+    def test_concurrent_steps(self):
+        # the calls of each step are in flight at the same time, but limited by the connections
+        self.assertAlmostEqual(
+            estimate_api_seconds(
+                [[1, 8, 0]], 0.1, 4, 0, concurrent_steps=True, connections=4
+            ),
+            0.3,
+        )
+        self.assertAlmostEqual(
+            estimate_api_seconds([[1, 8, 0]], 0.1, 4, 0, concurrent_steps=True), 0.2
+        )
+
+    def test_rate_limit(self):
+        # the first 2 calls are a burst, the remaining 8 are spaced by the rate
+        self.assertAlmostEqual(estimate_api_seconds([[1, 9]], 0.01, 4, 2), 4.0)
+        self.assertAlmostEqual(estimate_api_seconds([[1, 9]], 0.01, 4, 0), 0.1)
+
+
+@mock.patch(
+    "certbot_dns_porkbun.cert.client.resolve_challenge_domain_with_ttl",
+    side_effect=lambda domain, *_: (*split_challenge_domain(domain), 300),
+)
+class TestPlan(unittest.TestCase):
+    def setUp(self):
+        self.api = FakePorkbunAPI().__enter__()
+
+    def tearDown(self):
+        self.api.__exit__()
+
+    def test_perform_changes_nothing(self, _):
+        achalls = [
+            create_achall("example.com", token=b"a" * 16),
+            create_achall("*.example.com", token=b"b" * 16),
+            create_achall("example.org", token=b"c" * 16),
+        ]
+        validation = achalls[0].validation(achalls[0].account_key)
+        self.api.add_record("example.com", "_acme-challenge", "TXT", validation)
+        self.api.add_record("example.com", "_acme-challenge", "TXT", "STALE")
+        records = self.api.records("example.com")
+
+        authenticator = create_authenticator(
+            porkbun_api_endpoint=self.api.endpoint,
+            porkbun_prune_stale_records=True,
+            porkbun_plan=True,
+            porkbun_propagation_seconds=60,
+        )
+        with (
+            mock.patch("certbot.display.util.notify") as notify,
+            self.assertRaisesRegex(PluginError, "--porkbun-plan"),
+        ):
+            authenticator.perform(achalls)
+        authenticator.cleanup(achalls)
+
+        self.assertEqual(self.api.records("example.com"), records)
+        self.assertEqual(self.api.records("example.org"), [])
+        self.assertEqual(dict(self.api.calls), {"dns/retrieveByNameType": 2})
+
+        description = notify.call_args.args[0]
+        self.assertIn("3 challenges in 2 root domains", description)
+        self.assertIn(
+            f"keep existing TXT _acme-challenge.example.com {validation}", description
+        )
+        self.assertIn("delete stale TXT _acme-challenge.example.com STALE", description)
+        self.assertIn("create TXT _acme-challenge.example.org", description)
+        self.assertIn("propagation 60.0s", description)
+
+    def test_plan_zones(self, _):
+        self.api.add_record("example.com", "_acme-challenge", "TXT", "STALE")
+
+        authenticator = create_authenticator(
+            porkbun_api_endpoint=self.api.endpoint,
+            porkbun_prune_stale_records=True,
+            porkbun_propagation_seconds=0,
+            porkbun_rate_limit=1,
+        )
+        plan = authenticator.plan(["example.com", "www.example.com", "example.org"])
+        authenticator.stop_service()
+
+        self.assertEqual(plan.failures, [])
+        self.assertEqual(
+            [
+                (zone.root_domain, len(zone.creates), len(zone.stale))
+                for zone in plan.zones
+            ],
+            [("example.com", 2, 1), ("example.org", 1, 0)],
+        )
+        # unknown values are never existing, each record is created and deleted again
+        self.assertEqual([zone.cleanup_deletes for zone in plan.zones], [2, 1])
+        self.assertEqual(plan.api_calls, 4 + 3 + 2 + 2)
+        # the rate limit dominates the estimate of the 6 calls of the perform
+        self.assertGreaterEqual(plan.estimates["perform"], 5)
+
+    def test_journal(self, _):
+        with tempfile.TemporaryDirectory() as work_dir:
+            journal = RecordJournal(f"{work_dir}/{JOURNAL_FILENAME}")
+            journal.add("1", "example.net", "_acme-challenge", "ORPHANED")
+            journal.save()
+
+            authenticator = create_authenticator(
+                porkbun_api_endpoint=self.api.endpoint,
+                porkbun_journal=True,
+                work_dir=work_dir,
+            )
+            plan = authenticator.plan(["example.com"], ["VALUE"])
+            authenticator.stop_service()
+
+            self.assertEqual(len(RecordJournal(journal.path)), 1)
+
+        self.assertEqual(
+            [(zone.root_domain, zone.lists, len(zone.orphaned)) for zone in plan.zones],
+            [("example.com", 0, 0), ("example.net", 0, 1)],
+        )
+        # the latency is measured with a ping, because no records are listed
+        self.assertEqual(dict(self.api.calls), {"ping": 1})
+        self.assertIn(
+            "delete orphaned TXT _acme-challenge.example.net ORPHANED", plan.describe()
+        )
+
+    def test_failures(self, resolve):
+        def fail(domain, *_):
+            if domain == "example.org":
+                raise ValueError("resolution failed")
+            return (*split_challenge_domain(domain), 300)
+
+        resolve.side_effect = fail
+        authenticator = create_authenticator(
+            porkbun_api_endpoint=self.api.endpoint, porkbun_secret="wrong"
+        )
+        plan = authenticator.plan(["example.org", "example.com"])
+        authenticator.stop_service()
+
+        self.assertEqual(plan.zones, [])
+        self.assertEqual(
+            plan.failures,
+            [
+                "example.org: resolution failed",
+                "example.com: ERROR: Invalid API key.",
+            ],
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
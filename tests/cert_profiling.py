@@ -0,0 +1,133 @@
+import os
+import pstats
+import tempfile
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+
+from certbot_dns_porkbun.cert import profiling
+from tests.helpers import create_achall, create_authenticator, split_challenge_domain
+from tests.porkbun_stub import FakePorkbunAPI
+
+
+class TestProfiling(unittest.TestCase):
+    def test_profile_tag(self):
+        with mock.patch("os.getpid", return_value=1234):
+            tag = profiling.get_profile_tag(
+                "perform", ["*.example.com", "example.com", "example.org"]
+            )
+
+        self.assertRegex(tag, r"^perform-wildcard\.example\.com\+2-\d{8}T\d{6}-1234$")
+
+    def test_get_package(self):
+        self.assertEqual(
+            profiling.get_package(profiling.__file__), "certbot_dns_porkbun"
+        )
+        self.assertEqual(profiling.get_package(os.__file__), "stdlib")
+        self.assertEqual(
+            profiling.get_package("/usr/lib/python3/site-packages/dns/resolver.py"),
+            "dns",
+        )
+        self.assertEqual(profiling.get_package("~"), "builtins")
+
+    def test_collapse_stacks(self):
+        def leaf():
+            return sum(range(20000))
+
+        def branch():
+            return [leaf() for _ in range(20)]
+
+        with tempfile.TemporaryDirectory() as directory:
+            with profiling.profile(directory, "test", ["example.com"]):
+                branch()
+            (prefix,) = {name.rsplit(".", 1)[0] for name in os.listdir(directory)}
+            with open(
+                os.path.join(directory, f"{prefix}.collapsed"), encoding="utf-8"
+            ) as f:
+                stacks = [line.rsplit(" ", 1) for line in f.read().splitlines()]
+
+        # the time of sum is attributed to the stack through branch and leaf
+        self.assertIn(
+            True,
+            [
+                stack.startswith("branch (")
+                and ";leaf (" in stack
+                and stack.endswith(";<built-in method builtins.sum>")
+                for stack, _ in stacks
+            ],
+        )
+        self.assertTrue(all(int(micros) > 0 for _, micros in stacks))
+
+    def test_threads(self):
+        def work():
+            return sum(range(20000))
+
+        def session(directory):
+            executor = ThreadPoolExecutor(max_workers=2)
+            try:
+                with profiling.profile(directory, "test", ["example.com"]):
+                    futures = [executor.submit(work) for _ in range(4)]
+                    # the workers fail to start if their profilers can not be enabled
+                    return [future.result(timeout=10) for future in futures]
+            finally:
+                executor.shutdown(wait=False)
+
+        with tempfile.TemporaryDirectory() as directory:
+            with ThreadPoolExecutor(max_workers=2) as sessions:
+                results = list(sessions.map(session, [directory] * 2))
+            self.assertEqual(results, [[sum(range(20000))] * 4] * 2)
+
+            files = sorted(os.listdir(directory))
+            self.assertEqual(len(files), 6)
+            stats = pstats.Stats(os.path.join(directory, files[1]))
+
+        self.assertIn(
+            "work",
+            {name for _, _, name in stats.stats},  # pylint: disable=no-member
+        )
+
+
+@mock.patch(
+    "certbot_dns_porkbun.cert.client.resolve_challenge_domain_with_ttl",
+    side_effect=lambda domain, *_: (*split_challenge_domain(domain), 300),
+)
+class TestAuthenticatorProfile(unittest.TestCase):
+    def test_perform_and_cleanup(self, _):
+        achalls = [create_achall("example.com"), create_achall("example.org")]
+
+        with FakePorkbunAPI() as api, tempfile.TemporaryDirectory() as directory:
+            authenticator = create_authenticator(
+                porkbun_api_endpoint=api.endpoint, porkbun_profile=directory
+            )
+            authenticator.perform(achalls)
+            authenticator.cleanup(achalls)
+
+            files = sorted(os.listdir(directory))
+            self.assertEqual(
+                [name.split("-", 2)[:2] + [name.rsplit(".", 1)[1]] for name in files],
+                [
+                    ["cleanup", "example.com+1", "collapsed"],
+                    ["cleanup", "example.com+1", "pstats"],
+                    ["cleanup", "example.com+1", "txt"],
+                    ["perform", "example.com+1", "collapsed"],
+                    ["perform", "example.com+1", "pstats"],
+                    ["perform", "example.com+1", "txt"],
+                ],
+            )
+
+            perform = [name for name in files if name.startswith("perform")]
+            stats = pstats.Stats(os.path.join(directory, perform[1]))
+            with open(os.path.join(directory, perform[2]), encoding="utf-8") as f:
+                report = f.read()
+
+        # the root domains are processed by worker threads, which are profiled too
+        self.assertIn(
+            "_perform_zone",
+            {name for _, _, name in stats.stats},  # pylint: disable=no-member
+        )
+        self.assertIn("certbot_dns_porkbun", report)
+        self.assertIn("Top 25 allocating lines:", report)
+
+
+if __name__ == "__main__":
+    unittest.main()
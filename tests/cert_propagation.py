@@ -0,0 +1,189 @@
+import re
+import time
+import unittest
+from unittest import mock
+
+import responses
+from certbot.errors import PluginError
+
+from certbot_dns_porkbun.cert import propagation
+from tests.dns_stub import StubDNSServer, silent_nameserver
+from tests.helpers import ACCOUNT_KEY, create_achall, create_authenticator
+
+API = "https://api.porkbun.com/api/json/v3"
+
+
+class TestPropagation(unittest.TestCase):
+    def test_parse_nameservers(self):
+        self.assertEqual(
+            propagation.parse_nameservers(
+                "192.0.2.1, 192.0.2.2:5353,[2001:db8::1]:5300,2001:db8::2"
+            ),
+            [
+                ("192.0.2.1", 53),
+                ("192.0.2.2", 5353),
+                ("2001:db8::1", 5300),
+                ("2001:db8::2", 53),
+            ],
+        )
+
+    def test_parse_invalid_nameservers(self):
+        for value, entry in (
+            ("192.0.2.1,ns.example.com", "ns.example.com"),
+            ("ns.example.com:53", "ns.example.com:53"),
+            ("192.0.2.1:domain", "192.0.2.1:domain"),
+            ("[2001:db8::1]:70000", "[2001:db8::1]:70000"),
+            ("[192.0.2]", "[192.0.2]"),
+        ):
+            with (
+                self.subTest(value=value),
+                self.assertRaisesRegex(PluginError, re.escape(entry)),
+            ):
+                propagation.parse_nameservers(value)
+
+    def test_query_txt_values(self):
+        with StubDNSServer(
+            {"_acme-challenge.example.com": ["ABCDEF", "GHIJKL"]}
+        ) as server:
+            self.assertEqual(
+                propagation.query_txt_values(
+                    "_acme-challenge.example.com", server.address
+                ),
+                {"ABCDEF", "GHIJKL"},
+            )
+            self.assertEqual(
+                propagation.query_txt_values("missing.example.com", server.address),
+                set(),
+            )
+
+    def test_wait_returns_when_records_are_served(self):
+        with StubDNSServer({"_acme-challenge.example.com": ["ABCDEF"]}) as server:
+            start = time.monotonic()
+            result = propagation.wait_for_propagation(
+                {"_acme-challenge.example.com": {"ABCDEF"}},
+                {"_acme-challenge.example.com": [server.address]},
+                timeout=30,
+                interval=1,
+            )
+
+        self.assertTrue(result)
+        self.assertLess(time.monotonic() - start, 5)
+
+    def test_wait_sees_late_records(self):
+        with StubDNSServer({}) as server:
+
+            def publish(_):
+                server.records["_acme-challenge.example.com"] = ["ABCDEF"]
+
+            with mock.patch.object(propagation.time, "sleep", side_effect=publish):
+                result = propagation.wait_for_propagation(
+                    {"_acme-challenge.example.com": {"ABCDEF"}},
+                    {"_acme-challenge.example.com": [server.address]},
+                    timeout=30,
+                    interval=1,
+                )
+
+        self.assertTrue(result)
+        self.assertEqual(len(server.queries), 2)
+
+    def test_wait_times_out(self):
+        with StubDNSServer({"_acme-challenge.example.com": ["OTHER"]}) as server:
+            result = propagation.wait_for_propagation(
+                {"_acme-challenge.example.com": {"ABCDEF"}},
+                {"_acme-challenge.example.com": [server.address]},
+                timeout=0.5,
+                interval=0.1,
+            )
+
+        self.assertFalse(result)
+
+    def test_wait_quorum(self):
+        with (
+            silent_nameserver() as offline,
+            StubDNSServer({"_acme-challenge.example.com": ["ABCDEF"]}) as first,
+            StubDNSServer({"_acme-challenge.example.com": ["ABCDEF"]}) as second,
+        ):
+            self.assertTrue(
+                propagation.wait_for_propagation(
+                    {"_acme-challenge.example.com": {"ABCDEF"}},
+                    {
+                        "_acme-challenge.example.com": [
+                            first.address,
+                            second.address,
+                            offline,
+                        ]
+                    },
+                    timeout=1,
+                    interval=0.1,
+                    quorum=2,
+                    query_timeout=0.2,
+                )
+            )
+
+    def test_wait_without_nameservers(self):
+        start = time.monotonic()
+        result = propagation.wait_for_propagation(
+            {"_acme-challenge.example.com": {"ABCDEF"}},
+            {"_acme-challenge.example.com": []},
+            timeout=0.3,
+            interval=0.1,
+        )
+
+        # no nameserver confirmed the records, so the full timeout is waited
+        self.assertFalse(result)
+        self.assertGreaterEqual(time.monotonic() - start, 0.25)
+
+
+class TestAuthenticatorPropagation(unittest.TestCase):
+    @responses.activate
+    @mock.patch(
+        "certbot_dns_porkbun.cert.client.resolve_challenge_domain_with_ttl",
+        return_value=("example.com", "_acme-challenge", 300),
+    )
+    def test_perform_polls_nameservers(self, resolve):
+        responses.post(
+            url=f"{API}/dns/retrieveByNameType/example.com/TXT/_acme-challenge",
+            json={"status": "SUCCESS", "records": []},
+        )
+        responses.post(
+            url=f"{API}/dns/create/example.com",
+            json={"status": "SUCCESS", "id": "123456789"},
+        )
+
+        achall = create_achall("example.com")
+        validation = achall.validation(ACCOUNT_KEY)
+
+        with StubDNSServer({"_acme-challenge.example.com": [validation]}) as server:
+            authenticator = create_authenticator(
+                porkbun_propagation_seconds=600,
+                porkbun_propagation_check=True,
+                porkbun_propagation_nameservers="{}:{}".format(*server.address),
+            )
+            start = time.monotonic()
+            authenticator.perform([achall])
+
+        self.assertLess(time.monotonic() - start, 5)
+        self.assertIn(("_acme-challenge.example.com", 16), server.queries)
+        resolve.assert_called_once()
+
+    @responses.activate
+    @mock.patch(
+        "certbot_dns_porkbun.cert.client.resolve_challenge_domain_with_ttl",
+        return_value=("example.com", "_acme-challenge", 300),
+    )
+    @mock.patch("certbot_dns_porkbun.cert.client.time.sleep")
+    def test_perform_sleeps_without_check(self, sleep, resolve):
+        responses.post(
+            url=f"{API}/dns/retrieveByNameType/example.com/TXT/_acme-challenge",
+            json={"status": "SUCCESS", "records": []},
+        )
+        responses.post(
+            url=f"{API}/dns/create/example.com",
+            json={"status": "SUCCESS", "id": "123456789"},
+        )
+
+        authenticator = create_authenticator(porkbun_propagation_seconds=600)
+        authenticator.perform([create_achall("example.com")])
+
+        sleep.assert_called_once_with(600)
+        resolve.assert_called_once()
@@ -0,0 +1,158 @@
+import time
+import unittest
+from unittest import mock
+
+from certbot_dns_porkbun.cert import client
+from certbot_dns_porkbun.cert.resolvers import (
+    AuthoritativeResolver,
+    RecursiveResolver,
+    create_recursive_resolver,
+)
+from tests.dns_stub import StubDNSServer
+from tests.helpers import create_authenticator
+
+ZONE_RECORDS = {
+    ("example.com", "NS"): ["ns1.example.org."],
+    ("example.net", "NS"): ["ns1.example.org."],
+    ("ns1.example.org", "A"): ["127.0.0.1"],
+    ("_acme-challenge.www.example.com", "CNAME"): ["_acme-challenge.example.net."],
+}
+
+
+def find_zone(name: str) -> str:
+    return client.split_domain(name)[0]
+
+
+class TestAuthoritativeResolver(unittest.TestCase):
+    def setUp(self):
+        self.server = StubDNSServer(
+            {"_acme-challenge.example.net": ["ABCDEF"]}, dict(ZONE_RECORDS)
+        ).__enter__()
+        self.resolver = AuthoritativeResolver(
+            create_recursive_resolver([self.server.address]),
+            port=self.server.address[1],
+            timeout=1,
+        )
+
+    def tearDown(self):
+        self.server.__exit__()
+
+    def _ns_queries(self) -> int:
+        return sum(1 for _, rdtype in self.server.queries if rdtype == 2)
+
+    def test_zone_nameservers_cached(self):
+        nameservers = [("127.0.0.1", self.server.address[1])]
+
+        self.assertEqual(self.resolver.zone_nameservers("example.com"), nameservers)
+        self.assertEqual(self.resolver.zone_nameservers("example.com."), nameservers)
+        self.assertEqual(self._ns_queries(), 1)
+
+        # the NS and A records are served with a TTL of 60 seconds
+        with mock.patch(
+            "certbot_dns_porkbun.cert.resolvers.time.monotonic",
+            return_value=time.monotonic() + 61,
+        ):
+            self.assertEqual(self.resolver.zone_nameservers("example.com"), nameservers)
+        self.assertEqual(self._ns_queries(), 2)
+
+    def test_zone_nameservers_ipv6(self):
+        self.server.zone_records[("ns1.example.org", "AAAA")] = ["2001:db8::1"]
+        port = self.server.address[1]
+
+        with mock.patch(
+            "certbot_dns_porkbun.cert.resolvers.has_route", return_value=True
+        ):
+            self.assertEqual(
+                self.resolver.zone_nameservers("example.com"),
+                [("127.0.0.1", port), ("2001:db8::1", port)],
+            )
+
+        # without IPv6 connectivity only the IPv4 addresses are queried
+        with mock.patch(
+            "certbot_dns_porkbun.cert.resolvers.has_route", return_value=False
+        ):
+            self.assertEqual(
+                self.resolver.zone_nameservers("example.net"), [("127.0.0.1", port)]
+            )
+
+    def test_follow_cname_across_zones(self):
+        self.assertEqual(
+            client.resolve_challenge_domain_with_ttl(
+                "www.example.com", None, self.resolver
+            ),
+            ("example.net", "_acme-challenge", 60),
+        )
+        self.assertIn(("_acme-challenge.example.net", 16), self.server.queries)
+
+    def test_missing_name(self):
+        self.assertEqual(
+            client.resolve_challenge_domain_with_ttl(
+                "missing.example.com", None, self.resolver
+            ),
+            (
+                "example.com",
+                "_acme-challenge.missing",
+                client.DEFAULT_NEGATIVE_RESOLUTION_TTL,
+            ),
+        )
+
+    def test_tcp_fallback(self):
+        self.server.truncate = True
+
+        canonical_name, ttl = self.resolver.resolve_canonical_name(
+            "_acme-challenge.www.example.com", find_zone
+        )
+
+        self.assertEqual((canonical_name, ttl), ("_acme-challenge.example.net.", 60))
+        self.assertGreater(self.server.tcp_queries, 0)
+
+    def test_follow_delegation(self):
+        self.server.zone_records.update(
+            {
+                ("sub.example.com", "NS"): ["ns1.example.info."],
+                ("ns1.example.info", "A"): ["127.0.0.2"],
+            }
+        )
+        self.server.delegations = ("sub.example.com",)
+
+        with StubDNSServer(
+            {"_acme-challenge.www.sub.example.com": ["ABCDEF"]},
+            address=("127.0.0.2", self.server.address[1]),
+        ) as sub_server:
+            self.assertEqual(
+                client.resolve_challenge_domain_with_ttl(
+                    "www.sub.example.com", None, self.resolver
+                ),
+                ("example.com", "_acme-challenge.www.sub", 60),
+            )
+
+        self.assertIn(("_acme-challenge.www.sub.example.com", 16), sub_server.queries)
+
+
+class TestAuthenticatorResolver(unittest.TestCase):
+    def test_configured_resolver_addresses(self):
+        with StubDNSServer({}, dict(ZONE_RECORDS)) as server:
+            authenticator = create_authenticator(
+                porkbun_resolver="{}:{}".format(*server.address)
+            )
+
+            self.assertIsInstance(authenticator._get_dns_resolver(), RecursiveResolver)
+            self.assertEqual(
+                authenticator._resolve_challenge_domain("www.example.com"),
+                ("example.net", "_acme-challenge"),
+            )
+
+    def test_authoritative_resolver_shared_with_propagation_check(self):
+        authenticator = create_authenticator(porkbun_resolver="authoritative")
+
+        self.assertIs(
+            authenticator._get_dns_resolver(),
+            authenticator._get_authoritative_resolver(),
+        )
+
+    def test_system_resolver(self):
+        self.assertIsNone(create_authenticator()._get_dns_resolver())
+
+
+if __name__ == "__main__":
+    unittest.main()
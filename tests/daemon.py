@@ -0,0 +1,116 @@
+import os
+import tempfile
+import threading
+import unittest
+from unittest import mock
+
+from certbot_dns_porkbun import daemon
+from tests.helpers import create_authenticator, split_challenge_domain
+from tests.porkbun_stub import FakePorkbunAPI
+
+
+@mock.patch(
+    "certbot_dns_porkbun.cert.client.resolve_challenge_domain_with_ttl",
+    side_effect=lambda domain, *_: (*split_challenge_domain(domain), 300),
+)
+class TestDaemon(unittest.TestCase):
+    def setUp(self):
+        self.api = FakePorkbunAPI().__enter__()
+        self.directory = tempfile.TemporaryDirectory()
+        self.socket_path = os.path.join(self.directory.name, "daemon.sock")
+
+        self.authenticator = create_authenticator(
+            porkbun_api_endpoint=self.api.endpoint
+        )
+        self.authenticator.start_service()
+        self.server = daemon.ChallengeServer(
+            self.socket_path, daemon.ChallengeService(self.authenticator)
+        )
+        self.thread = threading.Thread(target=self.server.serve_forever, args=(0.1,))
+        self.thread.start()
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        self.thread.join()
+        self.authenticator.stop_service()
+        self.directory.cleanup()
+        self.api.__exit__()
+
+    def _hook(self, action: str, domain: str, validation: str, remaining: int = 0):
+        environ = {
+            "CERTBOT_DOMAIN": domain,
+            "CERTBOT_VALIDATION": validation,
+            "CERTBOT_REMAINING_CHALLENGES": str(remaining),
+            "CERTBOT_ALL_DOMAINS": "example.com,www.example.com",
+        }
+        with mock.patch.dict(os.environ, environ):
+            daemon.hook_main([action, "--socket", self.socket_path])
+
+    def test_socket_only_accessible_by_owner(self, _):
+        self.assertEqual(os.stat(self.socket_path).st_mode & 0o777, 0o600)
+
+    def test_hooks(self, _):
+        with mock.patch.object(
+            self.authenticator,
+            "wait_for_propagation",
+            wraps=self.authenticator.wait_for_propagation,
+        ) as wait:
+            self._hook("auth", "example.com", "a", remaining=1)
+            wait.assert_not_called()
+            self._hook("auth", "www.example.com", "b", remaining=0)
+
+        # the propagation is waited for once for all challenges of the certificate
+        wait.assert_called_once()
+        self.assertEqual(
+            [challenge.validation for challenge in wait.call_args.args[0]], ["a", "b"]
+        )
+        self.assertEqual(
+            sorted(record["content"] for record in self.api.records("example.com")),
+            ["a", "b"],
+        )
+
+        with mock.patch.object(
+            self.authenticator,
+            "finish_session",
+            wraps=self.authenticator.finish_session,
+        ) as finish:
+            self._hook("cleanup", "example.com", "a", remaining=1)
+            finish.assert_not_called()
+            self._hook("cleanup", "www.example.com", "b", remaining=0)
+
+        # the metrics of the certificate are reset after its last cleanup
+        finish.assert_called_once()
+        self.assertEqual(self.authenticator._metrics.summary()["phases"], {})
+        self.assertEqual(self.api.records("example.com"), [])
+        # all API calls of the certificate used the same connection
+        self.assertEqual(self.api.connections, 1)
+
+    def test_failed_hook(self, _):
+        self.api.api_key = "other"
+
+        with self.assertRaises(SystemExit) as context:
+            self._hook("auth", "example.com", "a")
+        self.assertIn("Invalid API key", context.exception.code)
+
+    def test_unreachable_daemon(self, _):
+        self.server.shutdown()
+        self.server.server_close()
+
+        with self.assertRaises(SystemExit) as context:
+            self._hook("auth", "example.com", "a")
+        self.assertIn("Could not reach", context.exception.code)
+
+    def test_invalid_request(self, _):
+        self.assertEqual(
+            daemon.send_request(self.socket_path, {"action": "unknown"})["status"],
+            "ERROR",
+        )
+        self.assertEqual(
+            daemon.send_request(self.socket_path, {"action": "ping"})["status"],
+            "SUCCESS",
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,155 @@
+"""
+Local stub DNS server serving static records for tests.
+"""
+
+import contextlib
+import errno
+import socket
+import socketserver
+import struct
+import threading
+from collections.abc import Iterator
+from typing import TYPE_CHECKING
+
+import dns.flags
+import dns.message
+import dns.rcode
+import dns.rdatatype
+import dns.rrset
+
+if TYPE_CHECKING:
+    from typing import Self
+
+BIND_ATTEMPTS = 20
+
+
+class _UDPHandler(socketserver.BaseRequestHandler):
+    def handle(self):
+        data, sock = self.request
+        response = self.server.stub.answer(dns.message.from_wire(data))
+        if self.server.stub.truncate:
+            response.answer.clear()
+            response.flags |= dns.flags.TC
+        sock.sendto(response.to_wire(), self.client_address)
+
+
+class _TCPHandler(socketserver.BaseRequestHandler):
+    def handle(self):
+        (length,) = struct.unpack("!H", self.request.recv(2))
+        data = b""
+        while len(data) < length:
+            data += self.request.recv(length - len(data))
+        self.server.stub.tcp_queries += 1
+        wire = self.server.stub.answer(dns.message.from_wire(data)).to_wire()
+        self.request.sendall(struct.pack("!H", len(wire)) + wire)
+
+
+class StubDNSServer:
+    """
+    Minimal authoritative DNS server on localhost answering queries over UDP and TCP from in-memory records.
+    TXT values are served from records, all other records from zone_records by name and type. CNAME records are not
+    followed, like for names outside the zones of an authoritative server. Names below one of the delegations are
+    answered with a referral to the NS records of the delegation. If truncate is set, all UDP answers are truncated.
+    """
+
+    def __init__(  # pylint: disable=too-many-arguments
+        self,
+        records: dict[str, list[str]] | None = None,
+        zone_records: dict[tuple[str, str], list[str]] | None = None,
+        delegations: tuple[str, ...] = (),
+        truncate: bool = False,
+        address: tuple[str, int] = ("127.0.0.1", 0),
+    ) -> None:
+        self.records = records if records is not None else {}
+        self.zone_records = zone_records if zone_records is not None else {}
+        self.delegations = delegations
+        self.truncate = truncate
+        self.queries = []
+        self.tcp_queries = 0
+        self._tcp_server, self._server = self._bind(address)
+        self._tcp_server.stub = self
+        self._server.stub = self
+        self._threads = [
+            threading.Thread(target=server.serve_forever, args=(0.1,), daemon=True)
+            for server in (self._server, self._tcp_server)
+        ]
+
+    @staticmethod
+    def _bind(
+        address: tuple[str, int],
+    ) -> tuple[socketserver.ThreadingTCPServer, socketserver.ThreadingUDPServer]:
+        # an ephemeral TCP port can be in use for UDP, another port is tried until both protocols are bound
+        for _ in range(BIND_ATTEMPTS):
+            tcp_server = socketserver.ThreadingTCPServer(address, _TCPHandler)
+            try:
+                return tcp_server, socketserver.ThreadingUDPServer(
+                    tcp_server.server_address, _UDPHandler
+                )
+            except OSError as e:
+                tcp_server.server_close()
+                if e.errno != errno.EADDRINUSE or address[1]:
+                    raise
+        raise OSError(errno.EADDRINUSE, f"No free port for UDP and TCP on {address[0]}")
+
+    @property
+    def address(self) -> tuple[str, int]:
+        return self._server.server_address
+
+    def answer(self, query: dns.message.Message) -> dns.message.Message:
+        response = dns.message.make_response(query)
+        question = query.question[0]
+        name = question.name.to_text(omit_final_dot=True).lower()
+        rdtype = dns.rdatatype.to_text(question.rdtype)
+        self.queries.append((name, question.rdtype))
+
+        for delegation in self.delegations:
+            if name.endswith(f".{delegation}"):
+                response.authority.append(
+                    self._rrset(delegation, "NS", self.zone_records[(delegation, "NS")])
+                )
+                return response
+
+        response.flags |= dns.flags.AA
+        if (name, rdtype) in self.zone_records:
+            response.answer.append(
+                self._rrset(name, rdtype, self.zone_records[(name, rdtype)])
+            )
+        elif (name, "CNAME") in self.zone_records:
+            response.answer.append(
+                self._rrset(name, "CNAME", self.zone_records[(name, "CNAME")])
+            )
+        elif rdtype == "TXT" and name in self.records:
+            response.answer.append(
+                self._rrset(name, "TXT", [f'"{value}"' for value in self.records[name]])
+            )
+        elif name not in self.records and not any(
+            record_name == name for record_name, _ in self.zone_records
+        ):
+            response.set_rcode(dns.rcode.NXDOMAIN)
+        return response
+
+    @staticmethod
+    def _rrset(name: str, rdtype: str, values: list[str]) -> dns.rrset.RRset:
+        return dns.rrset.from_text(f"{name}.", 60, "IN", rdtype, *values)
+
+    def __enter__(self) -> "Self":
+        for thread in self._threads:
+            thread.start()
+        return self
+
+    def __exit__(self, *args) -> None:
+        for server in (self._server, self._tcp_server):
+            server.shutdown()
+            server.server_close()
+
+
+@contextlib.contextmanager
+def silent_nameserver() -> Iterator[tuple[str, int]]:
+    """
+    Address of a nameserver on localhost which never answers. The UDP socket stays bound, so the port can not be taken
+    by another server while it is used.
+    """
+
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
+        sock.bind(("127.0.0.1", 0))
+        yield sock.getsockname()
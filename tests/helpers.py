@@ -0,0 +1,97 @@
+"""
+Shared helpers to create authenticators and challenges for tests.
+"""
+
+import io
+from argparse import ArgumentParser, Namespace
+
+import josepy as jose
+from acme import challenges, messages
+from certbot import achallenges
+from certbot._internal.display import obj as display_obj
+from certbot.configuration import NamespaceConfig
+from cryptography.hazmat.primitives.asymmetric import rsa
+
+from certbot_dns_porkbun.cert.client import Authenticator
+
+display_obj.set_display(display_obj.NoninteractiveDisplay(io.StringIO()))
+
+ACCOUNT_KEY = jose.JWKRSA(
+    key=rsa.generate_private_key(public_exponent=65537, key_size=2048)
+)
+
+# test overrides of the plugin defaults: fixed credentials, no propagation wait and no rate limit
+DEFAULT_OPTIONS = {
+    "porkbun_key": "key",
+    "porkbun_secret": "secret",
+    "porkbun_propagation_seconds": 0,
+    "porkbun_propagation_poll_interval": 1,
+    "porkbun_rate_limit": 0,
+}
+
+
+def get_plugin_defaults() -> dict:
+    """
+    Get the defaults of all plugin options like certbot parses them.
+    """
+
+    parser = ArgumentParser()
+    Authenticator.inject_parser_options(parser, "porkbun")
+    return vars(parser.parse_args([]))
+
+
+def with_plugin_defaults(namespace: Namespace) -> Namespace:
+    """
+    Add the defaults of the plugin options which are not set to a namespace.
+    """
+
+    return Namespace(**{**get_plugin_defaults(), **vars(namespace)})
+
+
+def create_authenticator(**options) -> Authenticator:
+    """
+    Create an authenticator with the default plugin options, overwritten by the provided options.
+    """
+
+    namespace = Namespace(
+        **{
+            "config_dir": "config_dir",
+            "work_dir": "work_dir",
+            "logs_dir": "logs_dir",
+            "http01_port": 80,
+            "https_port": 443,
+            "domains": [],
+            **get_plugin_defaults(),
+            **DEFAULT_OPTIONS,
+            **options,
+        }
+    )
+    return Authenticator(NamespaceConfig(namespace), name="porkbun")
+
+
+def create_achall(
+    domain: str, token: bytes = b"a" * 16
+) -> achallenges.KeyAuthorizationAnnotatedChallenge:
+    """
+    Create an annotated DNS-01 challenge for the provided domain.
+    """
+
+    challb = messages.ChallengeBody(
+        chall=challenges.DNS01(token=token),
+        uri="https://ca.example/chall",
+        status=messages.STATUS_PENDING,
+    )
+    return achallenges.KeyAuthorizationAnnotatedChallenge(
+        challb=challb,
+        identifier=messages.Identifier(typ=messages.IDENTIFIER_FQDN, value=domain),
+        account_key=ACCOUNT_KEY,
+    )
+
+
+def split_challenge_domain(domain: str, *_) -> tuple[str, str]:
+    """
+    Split a domain like resolve_challenge_domain without DNS lookups, assuming two label root domains.
+    """
+
+    labels = ["_acme-challenge"] + domain.replace("*.", "").split(".")
+    return ".".join(labels[-2:]), ".".join(labels[:-2])
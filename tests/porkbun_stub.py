@@ -0,0 +1,211 @@
+"""
+Local stand-in server for the Porkbun v3 JSON API used by the plugin.
+"""
+
+import itertools
+import json
+import random
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import TYPE_CHECKING
+from urllib.parse import urlsplit
+
+if TYPE_CHECKING:
+    from typing import Self
+
+API_PATH = "/api/json/v3/"
+
+
+class _Server(ThreadingHTTPServer):
+    request_queue_size = 128
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # the headers and the body are written separately, which would be delayed by Nagle's algorithm otherwise
+    disable_nagle_algorithm = True
+
+    def setup(self):
+        super().setup()
+        with self.server.api.lock:
+            self.server.api.connections += 1
+
+    def do_POST(self):  # pylint: disable=invalid-name
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        # the absolute URL of a request through a proxy is handled like its path
+        status, response = self.server.api.handle(
+            urlsplit(self.path).path.removeprefix(API_PATH), json.loads(body or b"{}")
+        )
+        data = json.dumps(response).encode()
+        self.send_response(status)
+        if status == 429:
+            self.send_header("Retry-After", "1")
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
+
+
+class FakePorkbunAPI:
+    """
+    In-memory Porkbun API with the ping, DNS create, retrieve and delete endpoints.
+    Records are stored with their fully qualified name like the real API returns them.
+    Optionally, each API call is delayed, fails randomly with a server error or is throttled with HTTP 429 if more
+    than rate_limit calls are made within one second. During an outage, all API calls fail with a server error after
+    the latency. Additional accounts can be added with their secrets, the
+    domains owned by a single account are rejected for the other accounts. The next lost_creates create calls are
+    applied, but answered with a server error as if their response was lost.
+    """
+
+    def __init__(  # pylint: disable=too-many-arguments
+        self,
+        api_key: str = "key",
+        secret_api_key: str = "secret",
+        latency: float = 0.0,
+        error_rate: float = 0.0,
+        rate_limit: int = 0,
+        seed: int = 0,
+        accounts: dict[str, str] | None = None,
+        owners: dict[str, str] | None = None,
+    ) -> None:
+        self.api_key = api_key
+        self.secret_api_key = secret_api_key
+        self.accounts = dict(accounts or {})
+        self.owners = dict(owners or {})
+        self.calls_by_key = Counter()
+        self.latency = latency
+        self.error_rate = error_rate
+        self.rate_limit = rate_limit
+        self.outage = False
+        self.lost_creates = 0
+        self._random = random.Random(seed)
+        self._window = (0, 0)
+        self.zones = {}
+        self.calls = Counter()
+        self.connections = 0
+        self.lock = threading.Lock()
+        self._ids = itertools.count(1)
+        self._server = _Server(("127.0.0.1", 0), _Handler)
+        self._server.daemon_threads = True
+        self._server.api = self
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def endpoint(self) -> str:
+        host, port = self._server.server_address
+        return f"http://{host}:{port}{API_PATH}"
+
+    def add_record(
+        self, domain: str, name: str, record_type: str, content: str, ttl: int = 600
+    ) -> str:
+        record_id = str(next(self._ids))
+        fqdn = f"{name}.{domain}" if name else domain
+        self.zones.setdefault(domain, {})[record_id] = {
+            "id": record_id,
+            "name": fqdn,
+            "type": record_type,
+            "content": content,
+            "ttl": str(ttl),
+            "prio": "0",
+            "notes": "",
+        }
+        return record_id
+
+    def records(self, domain: str, record_type: str = "TXT") -> list[dict]:
+        return [
+            record
+            for record in self.zones.get(domain, {}).values()
+            if record["type"] == record_type
+        ]
+
+    def handle(self, path: str, body: dict) -> tuple[int, dict]:
+        """
+        Handle a single API call.
+
+        :param path: the path of the API method relative to the API endpoint
+        :param body: the request json
+        :return: tuple of the HTTP status and the response json
+        """
+
+        parts = path.split("/")
+        with self.lock:
+            self.calls["/".join(parts[:2]) if parts[0] == "dns" else parts[0]] += 1
+            second = int(time.monotonic())
+            window_calls = self._window[1] + 1 if self._window[0] == second else 1
+            self._window = (second, window_calls)
+            failed = self._random.random() < self.error_rate or self.outage
+
+        if self.latency:
+            time.sleep(self.latency)
+
+        if self.rate_limit and window_calls > self.rate_limit:
+            with self.lock:
+                self.calls["throttled"] += 1
+            return 429, {"status": "ERROR", "message": "Rate limit exceeded."}
+
+        if failed:
+            with self.lock:
+                self.calls["failed"] += 1
+            return 503, {"status": "ERROR", "message": "Service unavailable."}
+
+        api_key = body.get("apikey")
+        secrets = {self.api_key: self.secret_api_key, **self.accounts}
+        if api_key not in secrets or body.get("secretapikey") != secrets[api_key]:
+            return 400, {"status": "ERROR", "message": "Invalid API key."}
+        with self.lock:
+            self.calls_by_key[api_key] += 1
+
+        if path == "ping":
+            return 200, {"status": "SUCCESS", "yourIp": "127.0.0.1"}
+
+        action, domain, *rest = path.removeprefix("dns/").split("/")
+        if self.owners.get(domain, api_key) != api_key:
+            return 400, {
+                "status": "ERROR",
+                "message": "Domain is not opted in to API access.",
+            }
+        with self.lock:
+            zone = self.zones.setdefault(domain, {})
+            if action == "create":
+                record_id = self.add_record(
+                    domain, body["name"], body["type"], body["content"], body["ttl"]
+                )
+                if self.lost_creates > 0:
+                    self.lost_creates -= 1
+                    self.calls["lost"] += 1
+                    return 502, {"status": "ERROR", "message": "Bad gateway."}
+                return 200, {"status": "SUCCESS", "id": int(record_id)}
+            if action == "retrieve":
+                records = [zone[rest[0]]] if rest and rest[0] in zone else []
+                return 200, {
+                    "status": "SUCCESS",
+                    "records": records if rest else list(zone.values()),
+                }
+            if action == "retrieveByNameType":
+                record_type, name = rest[0], rest[1] if len(rest) > 1 else ""
+                fqdn = f"{name}.{domain}" if name else domain
+                return 200, {
+                    "status": "SUCCESS",
+                    "records": [
+                        record
+                        for record in zone.values()
+                        if record["type"] == record_type and record["name"] == fqdn
+                    ],
+                }
+            if action == "delete" and rest and zone.pop(rest[0], None):
+                return 200, {"status": "SUCCESS"}
+
+        return 400, {"status": "ERROR", "message": f"Invalid request {path}."}
+
+    def __enter__(self) -> "Self":
+        self._thread.start()
+        return self
+
+    def __exit__(self, *args) -> None:
+        self._server.shutdown()
+        self._server.server_close()
@@ -0,0 +1,78 @@
+import io
+import json
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from certbot_dns_porkbun import resolve
+from tests.dns_stub import StubDNSServer
+
+ZONE_RECORDS = {
+    ("_acme-challenge.www.example.com", "CNAME"): ["_acme-challenge.example.net."],
+}
+
+
+class TestResolveCommand(unittest.TestCase):
+    def setUp(self):
+        self.dns = StubDNSServer({}, dict(ZONE_RECORDS)).__enter__()
+
+    def tearDown(self):
+        self.dns.__exit__()
+
+    def run_command(self, *args: str) -> tuple[int, list[dict]]:
+        stdout = io.StringIO()
+        status = resolve.main(
+            ["--resolver", "{}:{}".format(*self.dns.address), *args], stdout
+        )
+        return status, [json.loads(line) for line in stdout.getvalue().splitlines()]
+
+    def test_input_file(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "domains.txt")
+            with open(path, "w", encoding="utf-8") as f:
+                f.write("# fleet\nwww.example.com\n\n*.example.org\nexample.org\n")
+
+            status, results = self.run_command("--input", path, "example.com")
+
+        self.assertEqual(status, 0)
+        self.assertEqual(
+            [
+                (result["domain"], result["root_domain"], result["name"])
+                for result in results
+            ],
+            [
+                ("example.com", "example.com", "_acme-challenge"),
+                ("www.example.com", "example.net", "_acme-challenge"),
+                ("*.example.org", "example.org", "_acme-challenge"),
+                ("example.org", "example.org", "_acme-challenge"),
+            ],
+        )
+        self.assertEqual(
+            [result["delegated"] for result in results], [False, True, False, False]
+        )
+        self.assertEqual(
+            [result["cached"] for result in results], [False, False, False, True]
+        )
+        self.assertTrue(all(result["error"] is None for result in results))
+
+    def test_failed_lookup(self):
+        status, results = self.run_command("example.com", "www..example.com")
+
+        self.assertEqual(status, 1)
+        self.assertEqual(results[0]["root_domain"], "example.com")
+        self.assertIsNone(results[1]["root_domain"])
+        self.assertEqual(results[1]["error_type"], "EmptyLabel")
+        self.assertEqual(results[1]["error"], "A DNS label is empty.")
+
+    def test_invalid_resolver(self):
+        with (
+            mock.patch("sys.stderr", io.StringIO()) as stderr,
+            self.assertRaises(SystemExit),
+        ):
+            resolve.main(["--resolver", "dns.example.com", "example.com"])
+        self.assertIn("Invalid nameserver dns.example.com", stderr.getvalue())
+
+
+if __name__ == "__main__":
+    unittest.main()